@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class AssetsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'assets'
+
+    def ready(self):
+        from . import checks  # noqa: F401
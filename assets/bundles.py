@@ -0,0 +1,43 @@
+"""
+Third-party CSS and JavaScript used by the templates, grouped into bundles.
+
+``manage.py vendor_assets`` downloads the pinned sources below and writes
+each bundle, and the fonts its CSS refers to, to ``static/vendor/``, so pages
+load nothing from other sites. Commit what it writes. Until then
+``{% bundle %}`` links the CDN sources, and a system check reports the missing
+bundles at startup: as an error, or only a warning when
+``ASSETS_CDN_FALLBACK`` is set. collectstatic always fails without the
+bundles, so a deployment cannot ship pages that load from CDNs.
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+VENDOR_DIR = 'vendor'
+
+BOOTSTRAP = 'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist'
+FONT_AWESOME = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0'
+CODEMIRROR = 'https://cdnjs.cloudflare.com/ajax/libs/codemirror/5.65.13'
+INTER = 'https://cdn.jsdelivr.net/npm/@fontsource/inter@5.0.16'
+
+BUNDLES = {
+    # Every page
+    'site.css': [
+        f'{BOOTSTRAP}/css/bootstrap.min.css',
+        f'{FONT_AWESOME}/css/all.min.css',
+        *(f'{INTER}/latin-{weight}.css' for weight in (300, 400, 500, 600, 700)),
+    ],
+    'site.js': [f'{BOOTSTRAP}/js/bootstrap.bundle.min.js'],
+    # Only pages with a code editor
+    'editor.css': [f'{CODEMIRROR}/codemirror.min.css', f'{CODEMIRROR}/theme/eclipse.min.css'],
+    'editor.js': [f'{CODEMIRROR}/codemirror.min.js', f'{CODEMIRROR}/mode/python/python.min.js'],
+}
+
+
+def bundle_path(name):
+    return f'{VENDOR_DIR}/{name}'
+
+
+def missing_bundles_error(names):
+    return ImproperlyConfigured(
+        f'Static bundles missing from static/{VENDOR_DIR}/: {", ".join(names)}. '
+        'Run manage.py vendor_assets and commit its output.'
+    )
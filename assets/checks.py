@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.checks import Error, Tags, Warning, register
+
+from .bundles import BUNDLES, VENDOR_DIR, bundle_path
+
+
+@register(Tags.staticfiles)
+def check_bundles(app_configs, **kwargs):
+    """Report bundles missing from static/vendor/ at startup rather than when a page renders"""
+    missing = [bundle_path(name) for name in BUNDLES if finders.find(bundle_path(name)) is None]
+    if not missing:
+        return []
+    msg = f'Static bundles missing from static/{VENDOR_DIR}/: {", ".join(missing)}.'
+    hint = 'Run manage.py vendor_assets and commit its output.'
+    if getattr(settings, 'ASSETS_CDN_FALLBACK', False):
+        return [Warning(msg, hint=hint + ' Until then pages link the CDN sources.', id='assets.W001')]
+    return [Error(msg, hint=hint + ' Or set ASSETS_CDN_FALLBACK to link the CDN sources meanwhile.', id='assets.E001')]
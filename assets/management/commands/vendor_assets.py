@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import posixpath
+import re
+import urllib.request
+from urllib.parse import urljoin, urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from assets.bundles import BUNDLES, VENDOR_DIR
+
+# Fonts and images referenced from the vendored CSS, relative to the bundles
+FILES_DIR = 'files'
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+# Maps are not vendored, and the manifest storage fails on references to missing files
+SOURCE_MAP = re.compile(r'^\s*(//[#@] sourceMappingURL=.*|/\*[#@] sourceMappingURL=.*?\*/)\s*$', re.MULTILINE)
+
+
+def is_external(reference):
+    return reference.startswith(('data:', '#', '/')) or bool(urlsplit(reference).scheme)
+
+
+def rebase_css(css, source_url, fetch):
+    """Point every relative url() in css at a local copy under FILES_DIR; fetch(url, name) stores the copy"""
+    def replace(match):
+        quote, reference = match.groups()
+        if is_external(reference):
+            return match.group(0)
+        parts = urlsplit(urljoin(source_url, reference))
+        name = posixpath.basename(parts.path)
+        fetch(parts._replace(query='', fragment='').geturl(), name)
+        local = f'{FILES_DIR}/{name}'
+        if parts.fragment:
+            local += f'#{parts.fragment}'
+        return f'url({quote}{local}{quote})'
+    return CSS_URL.sub(replace, css)
+
+
+class Command(BaseCommand):
+    help = (
+        'Download the pinned third-party CSS, JavaScript and fonts, and write the bundles from assets/bundles.py '
+        'to static/vendor/ so that pages load nothing from CDNs. Commit the files it writes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help='Directory to write to (default: static/vendor in the first STATICFILES_DIRS entry)')
+
+    def handle(self, *args, **options):
+        output = options['output'] or os.path.join(settings.STATICFILES_DIRS[0], VENDOR_DIR)
+        os.makedirs(os.path.join(output, FILES_DIR), exist_ok=True)
+        written = {}
+
+        def store(name, content):
+            with open(os.path.join(output, name), 'wb') as f:
+                f.write(content)
+            written[name] = hashlib.sha256(content).hexdigest()
+
+        def fetch_file(url, name):
+            if f'{FILES_DIR}/{name}' not in written:
+                store(f'{FILES_DIR}/{name}', self.download(url))
+
+        for bundle, sources in BUNDLES.items():
+            parts = []
+            for url in sources:
+                text = SOURCE_MAP.sub('', self.download(url).decode('utf-8'))
+                if bundle.endswith('.css'):
+                    text = rebase_css(text, url, fetch_file)
+                parts.append(f'/* {url} */\n{text.strip()}\n')
+            # The semicolon keeps concatenated scripts from running into each other
+            separator = '\n' if bundle.endswith('.css') else ';\n'
+            store(bundle, separator.join(parts).encode('utf-8'))
+            self.stdout.write(f'{bundle}: {len(sources)} sources')
+
+        with open(os.path.join(output, 'sources.json'), 'w') as f:
+            json.dump({'bundles': BUNDLES, 'sha256': written}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(written)} files to {output}'))
+
+    def download(self, url):
+        request = urllib.request.Request(url, headers={'User-Agent': 'vendor_assets'})
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.read()
+        except OSError as e:
+            raise CommandError(f'Could not download {url}: {e}')
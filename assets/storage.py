@@ -0,0 +1,84 @@
+"""
+Static files storage that fingerprints and precompresses at collectstatic time.
+
+File names get a hash of their content (``style.3b2f9e1c4d5a.css``) through
+Django's manifest storage, so a changed file always has a new URL and every
+URL can be cached for good. Text files are also written gzipped next to
+the original, and brotli-compressed when the ``brotli`` package is
+installed, so the server never compresses them per request. nginx serves
+these copies with::
+
+    location /static/ {
+        alias /path/to/staticfiles/;
+        gzip_static on;
+        brotli_static on;  # with ngx_brotli
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+
+Without a web server in front, set ``SERVE_STATIC_FILES`` and
+``assets.views.serve`` does the same.
+"""
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+from .bundles import BUNDLES, bundle_path, missing_bundles_error
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.map', '.svg', '.txt', '.xml', '.html', '.ttf', '.eot', '.ico')
+# Smaller files gain nothing worth an extra file and lookup
+MIN_COMPRESS_SIZE = 256
+
+
+def compressed_variants(content):
+    """Return {suffix: bytes} for the encodings that make content smaller"""
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content, quality=11)
+    # Not worth it unless it saves at least 5%
+    return {suffix: data for suffix, data in variants.items() if len(data) < len(content) * 0.95}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        # Until collectstatic has written a manifest (development, tests) files keep their names
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        # Even with ASSETS_CDN_FALLBACK on, nothing is deployed that links the CDNs
+        missing = [bundle_path(name) for name in BUNDLES if bundle_path(name) not in paths]
+        if missing:
+            raise missing_bundles_error(missing)
+
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        # Pages only ever link the final hashed names
+        for name in sorted(set(self.hashed_files.values())):
+            for compressed_name in self.compress(name):
+                yield compressed_name, compressed_name, True
+
+    def compress(self, name):
+        """Write the compressed copies of one collected file; return their names"""
+        if not name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+            return []
+        path = self.path(name)
+        if os.path.getsize(path) < MIN_COMPRESS_SIZE:
+            return []
+        with open(path, 'rb') as f:
+            content = f.read()
+
+        written = []
+        for suffix, data in compressed_variants(content).items():
+            with open(path + suffix, 'wb') as f:
+                f.write(data)
+            written.append(name + suffix)
+        return written
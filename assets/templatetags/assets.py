@@ -0,0 +1,25 @@
+from functools import lru_cache
+
+from django import template
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+from ..bundles import BUNDLES, bundle_path
+
+register = template.Library()
+
+STYLESHEET = '<link rel="stylesheet" href="{}">'
+SCRIPT = '<script src="{}"></script>'
+
+
+@lru_cache(maxsize=None)
+def is_vendored(name):
+    return finders.find(bundle_path(name)) is not None
+
+
+@register.simple_tag
+def bundle(name):
+    """Load a bundle from this site, or from its CDN sources until it is vendored (see assets.checks)"""
+    urls = [static(bundle_path(name))] if is_vendored(name) else BUNDLES[name]
+    return format_html_join('\n', STYLESHEET if name.endswith('.css') else SCRIPT, ((url,) for url in urls))
@@ -0,0 +1,134 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from authentication.models import CustomUser
+from challenges.models import Challenge, Week
+from .bundles import BUNDLES, bundle_path
+from .checks import check_bundles
+from .management.commands.vendor_assets import rebase_css
+from .templatetags.assets import is_vendored
+from .views import serve
+
+STYLESHEET = 'body { background: url("../img/bg.png"); }\n' + '.rule { color: #123456; }\n' * 100
+
+
+class CollectStaticTests(SimpleTestCase):
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, self.root)
+        os.makedirs(os.path.join(self.source, 'css'))
+        os.makedirs(os.path.join(self.source, 'img'))
+        with open(os.path.join(self.source, 'css', 'site.css'), 'w') as f:
+            f.write(STYLESHEET)
+        with open(os.path.join(self.source, 'img', 'bg.png'), 'wb') as f:
+            f.write(b'\x89PNG' + bytes(1000))
+        os.makedirs(os.path.join(self.source, 'vendor'))
+        for name in BUNDLES:
+            with open(os.path.join(self.source, bundle_path(name)), 'w') as f:
+                f.write('')
+
+        settings = override_settings(STATICFILES_DIRS=[self.source], STATIC_ROOT=self.root, INSTALLED_APPS=['django.contrib.staticfiles'])
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        staticfiles_storage.load_manifest()
+
+    def test_names_are_hashed_and_text_is_precompressed(self):
+        name = staticfiles_storage.stored_name('css/site.css')
+        self.assertRegex(name, r'^css/site\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.root, name), 'rb') as f:
+            content = f.read()
+        # References inside CSS point at hashed names too
+        self.assertIn(staticfiles_storage.stored_name('img/bg.png').encode().split(b'/')[-1], content)
+        with gzip.open(os.path.join(self.root, name + '.gz')) as f:
+            self.assertEqual(f.read(), content)
+        # Already-compressed formats are left alone
+        self.assertFalse(os.path.exists(os.path.join(self.root, staticfiles_storage.stored_name('img/bg.png') + '.gz')))
+
+    def test_serve_prefers_precompressed_copies(self):
+        name = staticfiles_storage.stored_name('css/site.css')
+        response = serve(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, deflate'), name)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        with open(os.path.join(self.root, name), 'rb') as f:
+            self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), f.read())
+
+        response = serve(RequestFactory().get('/'), 'css/site.css')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+
+    def test_collectstatic_fails_without_the_bundles(self):
+        os.remove(os.path.join(self.source, bundle_path('editor.js')))
+        with self.assertRaisesMessage(ImproperlyConfigured, 'vendor/editor.js'):
+            call_command('collectstatic', interactive=False, verbosity=0)
+
+
+class VendorTests(SimpleTestCase):
+    def test_css_references_are_rebased_onto_local_copies(self):
+        fetched = []
+        css = rebase_css(
+            '@font-face{src:url(../webfonts/fa-solid-900.woff2) format("woff2"),url("../webfonts/fa-solid-900.ttf?v=6")}'
+            '.x{background:url("data:image/svg+xml,%3csvg%3e")}',
+            'https://cdn.example.com/fa/6.0.0/css/all.min.css',
+            lambda url, name: fetched.append((url, name)),
+        )
+        self.assertIn('url(files/fa-solid-900.woff2)', css)
+        self.assertIn('url("files/fa-solid-900.ttf")', css)
+        self.assertIn('url("data:image/svg+xml,%3csvg%3e")', css)
+        self.assertEqual(fetched, [
+            ('https://cdn.example.com/fa/6.0.0/webfonts/fa-solid-900.woff2', 'fa-solid-900.woff2'),
+            ('https://cdn.example.com/fa/6.0.0/webfonts/fa-solid-900.ttf', 'fa-solid-900.ttf'),
+        ])
+
+    def test_bundle_tag_prefers_vendored_files(self):
+        template = Template("{% load assets %}{% bundle 'editor.js' %}")
+        vendored = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, vendored)
+        os.makedirs(os.path.join(vendored, 'vendor'))
+        with open(os.path.join(vendored, 'vendor', 'editor.js'), 'w') as f:
+            f.write('')
+
+        for directories, expected in (([], BUNDLES['editor.js'][0]), ([vendored], '/static/vendor/editor.js')):
+            with self.settings(STATICFILES_DIRS=directories, STATIC_URL='/static/'):
+                is_vendored.cache_clear()
+                self.assertIn(f'<script src="{expected}"></script>', template.render(Context()))
+        is_vendored.cache_clear()
+
+    def test_missing_bundles_fail_the_startup_checks(self):
+        vendored = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, vendored)
+        os.makedirs(os.path.join(vendored, 'vendor'))
+        for name in BUNDLES:
+            with open(os.path.join(vendored, bundle_path(name)), 'w') as f:
+                f.write('')
+        with self.settings(STATICFILES_DIRS=[vendored], ASSETS_CDN_FALLBACK=False):
+            self.assertEqual(check_bundles(None), [])
+
+        os.remove(os.path.join(vendored, bundle_path('editor.js')))
+        for fallback, expected in ((False, 'assets.E001'), (True, 'assets.W001')):
+            with self.settings(STATICFILES_DIRS=[vendored], ASSETS_CDN_FALLBACK=fallback):
+                [message] = check_bundles(None)
+                self.assertEqual(message.id, expected)
+                self.assertIn('vendor/editor.js', message.msg)
+
+class EditorAssetTests(TestCase):
+    def test_code_editor_loads_only_on_pages_with_an_editor(self):
+        user = CustomUser.objects.create_user('student', 'student@example.com', 'pass')
+        week = Week.objects.create(week_number=1, title='Week 1', description='d', start_date='2024-01-01', end_date='2024-01-07')
+        challenge = Challenge.objects.create(week=week, title='Add', description='d', buggy_code='print(1)', expected_output='1', created_by=user)
+        self.client.force_login(user)
+        self.assertNotContains(self.client.get(reverse('dashboard:user_dashboard')), 'codemirror')
+        self.assertContains(self.client.get(reverse('challenges:challenge_detail', args=[challenge.id])), 'codemirror')
@@ -0,0 +1,56 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+# style.3b2f9e1c4d5a.css: the name changes whenever the content does
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Files linked without a hash, such as the favicon, may change at any deploy
+DEFAULT_MAX_AGE = 3600
+
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def accepted_encodings(request):
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    return {part.split(';')[0].strip().lower() for part in header.split(',')}
+
+
+def serve(request, path):
+    """Serve a collected static file, preferring a precompressed copy the client accepts"""
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except ValueError:
+        raise Http404('Not found')
+    if not os.path.isfile(fullpath):
+        raise Http404('Not found')
+
+    accepted = accepted_encodings(request)
+    encoding = None
+    for name, suffix in ENCODINGS:
+        if name in accepted and os.path.isfile(fullpath + suffix):
+            encoding = name
+            break
+    served = fullpath + suffix if encoding else fullpath
+
+    stat = os.stat(served)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    content_type, _ = mimetypes.guess_type(fullpath)
+    response = FileResponse(open(served, 'rb'), content_type=content_type or 'application/octet-stream')
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if HASHED_NAME.search(path):
+        response['Cache-Control'] = IMMUTABLE
+    else:
+        response['Cache-Control'] = f'public, max-age={getattr(settings, "STATIC_MAX_AGE", DEFAULT_MAX_AGE)}'
+    return response
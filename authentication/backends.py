@@ -0,0 +1,74 @@
+"""
+Authentication backend that keeps recently loaded users in process memory.
+
+``AuthenticationMiddleware`` loads the logged-in user on every request. This
+backend answers from a small per-process LRU for ``AUTH_USER_CACHE_TTL``
+seconds instead. Each entry is tagged with the user's version token from the
+default cache, which saving or deleting a user (see ``authentication.signals``)
+and ``forget_user``, for queryset updates such as score changes, replace. A
+password change or deactivation therefore applies on the next request in
+every process sharing that cache; with a per-process cache such as the
+default LocMemCache, other processes see it once their copy expires.
+"""
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+DEFAULT_TTL = 30
+DEFAULT_SIZE = 1000
+
+_users = OrderedDict()
+_lock = threading.Lock()
+
+
+def user_version_key(user_id):
+    return f'authentication:user-version:{user_id}'
+
+
+def user_version(user_id):
+    """The user's version token, created if missing"""
+    key = user_version_key(user_id)
+    # add() keeps a token another process just set, so it is never overwritten
+    cache.add(key, uuid.uuid4().hex, timeout=None)
+    return cache.get(key)
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        ttl = getattr(settings, 'AUTH_USER_CACHE_TTL', DEFAULT_TTL)
+        if ttl <= 0:
+            return super().get_user(user_id)
+        now = time.monotonic()
+        version = user_version(user_id)
+        with _lock:
+            entry = _users.get(user_id)
+            if entry is not None and entry[0] > now and entry[1] == version:
+                _users.move_to_end(user_id)
+                # Views may change request.user; never hand out the cached object
+                return copy.copy(entry[2])
+
+        user = super().get_user(user_id)
+        if user is not None:
+            with _lock:
+                _users[user_id] = (now + ttl, version, copy.copy(user))
+                while len(_users) > getattr(settings, 'AUTH_USER_CACHE_SIZE', DEFAULT_SIZE):
+                    _users.popitem(last=False)
+        return user
+
+
+def forget_user(user_id):
+    """Make every process reload the user on their next request"""
+    cache.set(user_version_key(user_id), uuid.uuid4().hex, timeout=None)
+    with _lock:
+        _users.pop(user_id, None)
+
+
+def clear_user_cache():
+    with _lock:
+        _users.clear()
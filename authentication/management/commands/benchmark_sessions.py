@@ -0,0 +1,104 @@
+import os
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from authentication.backends import clear_user_cache
+from challenges import loadtest
+
+# The stock setup every request paid for before: sessions and users from the database
+LAYERS = [
+    ('database', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+    }),
+    ('cached', {}),
+]
+
+SCENARIOS = ['execute_code', 'user_dashboard']
+
+
+def auth_query(sql):
+    """'session' or 'user' for queries made by the session and auth layer, else None"""
+    if 'django_session' in sql:
+        return 'session'
+    if 'authentication_customuser' in sql:
+        return 'user'
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare database queries and latency per request with database-backed and cached '
+        'sessions and user lookups, on a fresh SQLite database. '
+        'Run with --settings=code_debugging_app.bench_settings'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario and setup')
+        parser.add_argument('--users', type=int, default=20, help='Students to seed, each with their own session')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The benchmark recreates its database; run it with --settings=code_debugging_app.bench_settings')
+
+        database = connection.settings_dict['NAME']
+        connection.close()
+        if os.path.exists(database):
+            os.remove(database)
+        call_command('migrate', verbosity=0)
+        admin, students = loadtest.seed(options['users'], 1, 5)
+        scenarios = loadtest.build_scenarios(admin, students)
+
+        self.stdout.write(
+            f'{"scenario":<16} {"setup":<10} {"queries":>8} {"session":>8} {"user":>6} '
+            f'{"session writes":>15} {"mean ms":>8}'
+        )
+        for name in SCENARIOS:
+            for layer, overrides in LAYERS:
+                with override_settings(**overrides):
+                    self.stdout.write(self.measure(name, layer, scenarios[name], students, options['requests']))
+
+    def measure(self, name, layer, factory, students, requests):
+        cache.clear()
+        clear_user_cache()
+        clients = {}
+        for user in students:
+            clients[user.pk] = Client(HTTP_HOST='localhost')
+            clients[user.pk].force_login(user)
+
+        counts = {'total': 0, 'session': 0, 'user': 0, 'writes': 0}
+        timings = []
+        # One unmeasured round loads every session and user once
+        for i in range(len(students) + requests):
+            method, path, body, user = factory(i)
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                if method == 'POST':
+                    response = clients[user.pk].post(path, data=body, content_type='application/json')
+                else:
+                    response = clients[user.pk].get(path)
+            elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code != 200:
+                raise CommandError(f'{name} returned {response.status_code} with {layer} sessions')
+            if i < len(students):
+                continue
+            timings.append(elapsed)
+            counts['total'] += len(queries)
+            for query in queries.captured_queries:
+                kind = auth_query(query['sql'])
+                if kind:
+                    counts[kind] += 1
+                if kind == 'session' and not query['sql'].lstrip().upper().startswith('SELECT'):
+                    counts['writes'] += 1
+
+        return (
+            f'{name:<16} {layer:<10} {counts["total"] / requests:8.2f} {counts["session"] / requests:8.2f} '
+            f'{counts["user"] / requests:6.2f} {counts["writes"] / requests:15.2f} {statistics.mean(timings):8.2f}'
+        )
@@ -7,7 +7,7 @@ class CustomUser(AbstractUser):
         ('user', 'User'),
     )
     
-    user_type = models.CharField(max_length=10, choices=USER_TYPE_CHOICES, default='user')
+    user_type = models.CharField(max_length=10, choices=USER_TYPE_CHOICES, default='user', db_index=True)
     total_score = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -1,3 +1,67 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from challenges.grading import update_scores
+from .backends import clear_user_cache, user_version_key
+from .models import CustomUser
+
+
+class CachedSessionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('student', 'student@example.com', 'pass')
+
+    def setUp(self):
+        cache.clear()
+        clear_user_cache()
+        self.client.force_login(self.user)
+        self.url = reverse('dashboard:user_dashboard')
+
+    def test_repeat_requests_skip_session_and_user_queries(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        tables = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('django_session', tables)
+        self.assertNotIn('authentication_customuser', tables)
+
+    def test_read_only_requests_do_not_write_the_session(self):
+        # Sessions not in the cache are read from the database, never written back
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        session_queries = [query['sql'] for query in queries.captured_queries if 'django_session' in query['sql']]
+        self.assertEqual(len(session_queries), 1)
+        self.assertTrue(session_queries[0].startswith('SELECT'))
+
+    def test_saved_user_is_reloaded(self):
+        self.client.get(self.url)
+        self.user.first_name = 'Ada'
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).wsgi_request.user.first_name, 'Ada')
+
+    def test_score_updates_are_seen(self):
+        self.client.get(self.url)
+        update_scores(self.user.pk, {}, 5)
+        self.assertEqual(self.client.get(self.url).context['total_score'], 5)
+
+    def test_saves_in_other_processes_are_seen(self):
+        self.client.get(self.url)
+        # Another process deactivates the user: the row changes and the
+        # shared version token is replaced, but this process's copy stays
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        cache.set(user_version_key(self.user.pk), 'changed elsewhere', timeout=None)
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_request_user_is_a_copy(self):
+        self.client.get(self.url).wsgi_request.user.total_score = 99
+        self.assertEqual(self.client.get(self.url).context['total_score'], 0)
+
+    @override_settings(AUTH_USER_CACHE_TTL=0)
+    def test_ttl_zero_disables_the_cache(self):
+        self.client.get(self.url)
+        CustomUser.objects.filter(pk=self.user.pk).update(first_name='Grace')
+        self.assertEqual(self.client.get(self.url).wsgi_request.user.first_name, 'Grace')
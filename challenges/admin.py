@@ -1,5 +1,13 @@
 from django.contrib import admin
-from .models import Week, Challenge, Submission, UserProgress
+from .models import Week, Challenge, Submission, UserProgress, GradingJob, RegradeRun, Attempt
+
+
+def _queue_regrades(modeladmin, request, runs):
+    runs = RegradeRun.objects.bulk_create(runs)
+    modeladmin.message_user(
+        request,
+        f'Queued {len(runs)} regrade run(s). Run "manage.py regrade --queued" to process them.'
+    )
 
 @admin.register(Week)
 class WeekAdmin(admin.ModelAdmin):
@@ -7,18 +15,28 @@ class WeekAdmin(admin.ModelAdmin):
     list_filter = ['is_active', 'start_date']
     search_fields = ['title', 'description']
     ordering = ['-week_number']
+    actions = ['regrade']
+
+    @admin.action(description='Regrade all submissions of the selected weeks')
+    def regrade(self, request, queryset):
+        _queue_regrades(self, request, [RegradeRun(week=week) for week in queryset])
 
 @admin.register(Challenge)
 class ChallengeAdmin(admin.ModelAdmin):
-    list_display = ['title', 'week', 'difficulty', 'points', 'order', 'created_by']
-    list_filter = ['week', 'difficulty', 'created_by']
+    list_display = ['title', 'week', 'difficulty', 'points', 'order', 'comparison_mode', 'created_by']
+    list_filter = ['week', 'difficulty', 'comparison_mode', 'created_by']
     search_fields = ['title', 'description']
     ordering = ['week', 'order']
+    actions = ['regrade']
+
+    @admin.action(description='Regrade all submissions of the selected challenges')
+    def regrade(self, request, queryset):
+        _queue_regrades(self, request, [RegradeRun(challenge=challenge) for challenge in queryset])
 
 @admin.register(Submission)
 class SubmissionAdmin(admin.ModelAdmin):
     list_display = ['user', 'challenge', 'status', 'points_earned', 'submitted_at']
-    list_filter = ['status', 'challenge__week', 'submitted_at']
+    list_filter = ['status', 'error_kind', 'challenge__week', 'submitted_at']
     search_fields = ['user__username', 'challenge__title']
     readonly_fields = ['submitted_at']
     ordering = ['-submitted_at']
@@ -29,3 +47,24 @@ class UserProgressAdmin(admin.ModelAdmin):
     list_filter = ['week', 'last_updated']
     search_fields = ['user__username']
     readonly_fields = ['last_updated']
+
+@admin.register(GradingJob)
+class GradingJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'submission', 'state', 'attempts', 'worker', 'created_at', 'finished_at']
+    list_filter = ['state', 'created_at']
+    search_fields = ['submission__user__username', 'submission__challenge__title']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
+
+@admin.register(RegradeRun)
+class RegradeRunAdmin(admin.ModelAdmin):
+    list_display = ['id', 'challenge', 'week', 'state', 'processed', 'total', 'changed', 'skipped', 'created_at', 'finished_at']
+    list_filter = ['state', 'created_at']
+    readonly_fields = ['state', 'total', 'processed', 'changed', 'skipped', 'last_submission_id', 'error', 'created_at', 'started_at', 'finished_at']
+
+@admin.register(Attempt)
+class AttemptAdmin(admin.ModelAdmin):
+    list_display = ['user', 'challenge', 'status', 'points_earned', 'error_kind', 'created_at']
+    list_filter = ['status', 'error_kind']
+    search_fields = ['user__username', 'challenge__title']
+    raw_id_fields = ['user', 'challenge', 'code', 'output']
+    readonly_fields = ['created_at']
@@ -0,0 +1,309 @@
+"""
+Admission control for the endpoints that run code.
+
+Every request that would start a program first has to take a token from its
+user's (or, for anonymous callers, its IP's) token bucket and then claim one
+of ``EXECUTION_MAX_IN_FLIGHT`` execution slots. When all slots are busy up to
+``EXECUTION_MAX_QUEUED`` requests may wait ``EXECUTION_QUEUE_TIMEOUT``
+seconds for one to free up. Everything else gets an immediate 429 with a
+``Retry-After`` header and never starts a process. A batch submission takes
+one token per program and runs in parallel on as many slots as are free.
+
+State lives in the cache named by ``EXECUTION_ADMISSION_CACHE`` so that all
+web worker processes share it; use a shared backend (Memcached, Redis or the
+database cache) when running more than one process. Only ``add``, ``get``,
+``set`` and ``delete`` are used, so any Django cache backend works. Slots
+expire on their own, so a worker that dies mid-run cannot leak capacity, and
+each holds a token that release() checks, so a request whose slot expired
+cannot free the slot of the request that took it over.
+
+Async views use ``alimit_executions``, which applies the same limits but
+waits in the queue on the event loop rather than on a sleeping thread.
+"""
+import asyncio
+import math
+import random
+import time
+import uuid
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+KEY_PREFIX = 'execution-admission'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def client_key(request):
+    """Identify who a request counts against"""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'ip:{request.META.get("REMOTE_ADDR", "unknown")}'
+
+
+def update_bucket(cache, client, count):
+    """Take count runs from the client's bucket, or give them back when count is negative
+
+    Returns 0 or the seconds to wait before count runs would be available;
+    nothing is taken then.
+    """
+    burst = _setting('EXECUTION_RATE_BURST', 10)
+    rate = _setting('EXECUTION_RATE_PER_MINUTE', 30) / 60.0
+    if burst <= 0 or rate <= 0:
+        return 0
+    # A batch never has to wait for more than a full bucket
+    count = min(count, burst)
+
+    key = f'{KEY_PREFIX}:bucket:{client}'
+    lock = f'{key}:lock'
+    # add() is atomic on every backend, so it serialises updates to one bucket
+    for _ in range(20):
+        if cache.add(lock, 1, timeout=2):
+            break
+        time.sleep(0.005)
+    else:
+        # Only happens when one client floods us with parallel requests
+        return 1
+
+    try:
+        now = time.time()
+        tokens, updated_at = cache.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        wait = 0 if tokens >= count else (count - tokens) / rate
+        if not wait:
+            tokens = min(burst, tokens - count)
+        # Once the bucket would be full again the entry can simply expire
+        cache.set(key, (tokens, now), timeout=math.ceil(burst / rate) + 60)
+        return wait
+    finally:
+        cache.delete(lock)
+
+
+def take_token(cache, client, count=1):
+    """Take count runs from the client's bucket; return 0 or the seconds to wait"""
+    return update_bucket(cache, client, count)
+
+
+def refund_token(cache, client, count=1):
+    """Give back runs taken for a request that was then turned away"""
+    update_bucket(cache, client, -count)
+
+
+def acquire_slot(cache, kind, count, ttl):
+    """Claim one of count shared slots
+
+    Returns (key, token) to pass to release(), or None if all are taken.
+    """
+    start = random.randrange(count)
+    token = uuid.uuid4().hex
+    for offset in range(count):
+        key = f'{KEY_PREFIX}:{kind}:{(start + offset) % count}'
+        if cache.add(key, token, timeout=ttl):
+            return key, token
+    return None
+
+
+def extend_slot(cache, slot, ttl):
+    """Keep a slot for ttl seconds from now, if it is still ours"""
+    key, token = slot
+    if cache.get(key) == token:
+        cache.set(key, token, timeout=ttl)
+
+
+def free_slot(cache, slot):
+    """Delete a slot's key, unless it expired and another request has taken it since"""
+    key, token = slot
+    if cache.get(key) == token:
+        cache.delete(key)
+
+
+def acquire_execution_slot(cache):
+    """Claim an execution slot, waiting in the bounded queue if necessary
+
+    Returns the slot, None when the server is busy, or () when concurrency is unlimited.
+    """
+    max_in_flight = _setting('EXECUTION_MAX_IN_FLIGHT', 8)
+    if max_in_flight <= 0:
+        return ()
+    # A slot outlives the longest possible run, plus some slack
+    run_ttl = _setting('CODE_EXECUTION_TIMEOUT', 10) + 30
+
+    slot = acquire_slot(cache, 'running', max_in_flight, run_ttl)
+    if slot:
+        return slot
+
+    max_queued = _setting('EXECUTION_MAX_QUEUED', 16)
+    queue_timeout = _setting('EXECUTION_QUEUE_TIMEOUT', 5)
+    if max_queued <= 0 or queue_timeout <= 0:
+        return None
+    place = acquire_slot(cache, 'queued', max_queued, math.ceil(queue_timeout) + 5)
+    if not place:
+        return None
+
+    try:
+        deadline = time.monotonic() + queue_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            slot = acquire_slot(cache, 'running', max_in_flight, run_ttl)
+            if slot:
+                return slot
+        return None
+    finally:
+        free_slot(cache, place)
+
+
+async def aacquire_execution_slot(cache):
+    """acquire_execution_slot() for the event loop"""
+    max_in_flight = _setting('EXECUTION_MAX_IN_FLIGHT', 8)
+    if max_in_flight <= 0:
+        return ()
+    run_ttl = _setting('CODE_EXECUTION_TIMEOUT', 10) + 30
+    # Cache calls may block on the network, so they run off the loop
+    acquire = sync_to_async(acquire_slot, thread_sensitive=False)
+
+    slot = await acquire(cache, 'running', max_in_flight, run_ttl)
+    if slot:
+        return slot
+
+    max_queued = _setting('EXECUTION_MAX_QUEUED', 16)
+    queue_timeout = _setting('EXECUTION_QUEUE_TIMEOUT', 5)
+    if max_queued <= 0 or queue_timeout <= 0:
+        return None
+    place = await acquire(cache, 'queued', max_queued, math.ceil(queue_timeout) + 5)
+    if not place:
+        return None
+
+    try:
+        deadline = time.monotonic() + queue_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            slot = await acquire(cache, 'running', max_in_flight, run_ttl)
+            if slot:
+                return slot
+        return None
+    finally:
+        await sync_to_async(free_slot, thread_sensitive=False)(cache, place)
+
+
+def _reject(message, retry_after):
+    response = JsonResponse({'error': message}, status=429)
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def charge(request, runs=1):
+    """Take runs from the client's bucket without claiming a slot; return a 429 response or None
+
+    For requests that only queue programs for the graders.
+    """
+    cache = caches[_setting('EXECUTION_ADMISSION_CACHE', 'default')]
+    wait = take_token(cache, client_key(request), runs)
+    if wait:
+        return _reject('Too many runs. Please wait a moment before running code again.', wait)
+    return None
+
+
+async def acharge(request, runs=1):
+    """charge() for async views"""
+    cache = caches[_setting('EXECUTION_ADMISSION_CACHE', 'default')]
+    client = await sync_to_async(client_key)(request)
+    wait = await sync_to_async(take_token, thread_sensitive=False)(cache, client, runs)
+    if wait:
+        return _reject('Too many runs. Please wait a moment before running code again.', wait)
+    return None
+
+
+def admit(request, runs=1):
+    """Admit a request that runs up to runs programs
+
+    Returns (rejection, slots): rejection is a 429 response or None, and slots
+    holds at least one execution slot (more if free ones were available, up
+    to runs) to pass to release() afterwards.
+    """
+    cache = caches[_setting('EXECUTION_ADMISSION_CACHE', 'default')]
+    client = client_key(request)
+
+    wait = take_token(cache, client, runs)
+    if wait:
+        return _reject('Too many runs. Please wait a moment before running code again.', wait), []
+
+    slot = acquire_execution_slot(cache)
+    if slot is None:
+        # Nothing ran, so the client keeps its runs
+        refund_token(cache, client, runs)
+        return _reject('The server is busy running other programs. Please try again shortly.', 1), []
+    if not slot:
+        # Concurrency is unlimited
+        return None, [()] * runs
+
+    slots = [slot]
+    run_ttl = _setting('CODE_EXECUTION_TIMEOUT', 10) + 30
+    while len(slots) < runs:
+        # Extra slots are only taken if free right now; a batch never queues for them
+        extra = acquire_slot(cache, 'running', _setting('EXECUTION_MAX_IN_FLIGHT', 8), run_ttl)
+        if not extra:
+            break
+        slots.append(extra)
+    if len(slots) < runs:
+        # Runs share the slots, so each slot is held for several runs in a row
+        rounds = math.ceil(runs / len(slots))
+        for slot in slots:
+            extend_slot(cache, slot, rounds * _setting('CODE_EXECUTION_TIMEOUT', 10) + 30)
+    return None, slots
+
+
+async def aadmit(request):
+    """admit() for an async view that runs one program"""
+    cache = caches[_setting('EXECUTION_ADMISSION_CACHE', 'default')]
+
+    # Reading request.user may load the session and user from the database
+    client = await sync_to_async(client_key)(request)
+    wait = await sync_to_async(take_token, thread_sensitive=False)(cache, client)
+    if wait:
+        return _reject('Too many runs. Please wait a moment before running code again.', wait), []
+
+    slot = await aacquire_execution_slot(cache)
+    if slot is None:
+        await sync_to_async(refund_token, thread_sensitive=False)(cache, client)
+        return _reject('The server is busy running other programs. Please try again shortly.', 1), []
+    return None, [slot]
+
+
+def release(slots):
+    cache = caches[_setting('EXECUTION_ADMISSION_CACHE', 'default')]
+    for slot in slots:
+        if slot:
+            free_slot(cache, slot)
+
+
+def limit_executions(view_func):
+    """Rate limit and cap concurrent runs for a view that executes code"""
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        rejection, slots = admit(request)
+        if rejection:
+            return rejection
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            release(slots)
+    return _wrapped_view
+
+
+def alimit_executions(view_func):
+    """limit_executions for async views"""
+    @wraps(view_func)
+    async def _wrapped_view(request, *args, **kwargs):
+        rejection, slots = await aadmit(request)
+        if rejection:
+            return rejection
+        try:
+            return await view_func(request, *args, **kwargs)
+        finally:
+            await sync_to_async(release, thread_sensitive=False)(slots)
+    return _wrapped_view
@@ -0,0 +1,175 @@
+"""
+Async versions of the views that run code, used when ``ASYNC_EXECUTION_VIEWS`` is on.
+
+Served by an ASGI server (``uvicorn code_debugging_app.asgi:application``)
+a Run or Submit waiting for its program ties up no worker thread: the child
+process and the admission queue are awaited on the event loop, and only short
+database and cache calls hop to a thread. ``manage.py benchmark_async``
+compares this with the sync views under WSGI, which remain the better fit
+there.
+
+The streaming endpoints have async versions too: Django consumes a sync
+streaming body in full before sending any of it under ASGI.
+
+Django 4.2's ``login_required``, ``require_POST`` and ``csrf_exempt`` turn a
+coroutine view into a sync one, so the equivalents below are used instead.
+"""
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
+from django.urls import reverse
+
+from monitoring.query_budget import query_budget
+from . import grading
+from .admission import aadmit, acharge, alimit_executions, release
+from .executor import aexecute_python_code, astream_python_code
+from .models import Challenge
+from .streaming import AsyncEventStream, event_stream_response
+
+
+def async_login_required(view_func):
+    @wraps(view_func)
+    async def _wrapped_view(request, *args, **kwargs):
+        # Loads the session and user once; later reads of request.user are free
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return _wrapped_view
+
+
+def async_require_POST(view_func):
+    @wraps(view_func)
+    async def _wrapped_view(request, *args, **kwargs):
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+        return await view_func(request, *args, **kwargs)
+    return _wrapped_view
+
+
+def async_csrf_exempt(view_func):
+    view_func.csrf_exempt = True
+    return view_func
+
+
+@async_login_required
+@async_require_POST
+@query_budget(30)
+async def submit_solution(request, challenge_id):
+    if request.user.is_superuser:
+        return JsonResponse({'error': 'Admins cannot submit solutions'}, status=403)
+
+    try:
+        challenge = await Challenge.objects.aget(id=challenge_id)
+    except Challenge.DoesNotExist:
+        raise Http404('No Challenge matches the given query.')
+
+    try:
+        data = json.loads(request.body)
+        submitted_code = data.get('code', '').strip()
+
+        if not submitted_code:
+            return JsonResponse({'error': 'Code cannot be empty'}, status=400)
+
+        if getattr(settings, 'GRADING_MODE', 'sync') == 'queue':
+            rejection = await acharge(request)
+            if rejection:
+                return rejection
+            job = await sync_to_async(grading.enqueue_submission)(request.user, challenge, submitted_code)
+            return JsonResponse({
+                'job_id': job.id,
+                'status': 'pending',
+                'status_url': reverse('challenges:job_status', args=[job.id]),
+            }, status=202)
+
+        rejection, slots = await aadmit(request)
+        if rejection:
+            return rejection
+        try:
+            return JsonResponse(await grading.agrade_submission(request.user, challenge, submitted_code))
+        finally:
+            await sync_to_async(release, thread_sensitive=False)(slots)
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@async_csrf_exempt
+@async_require_POST
+@alimit_executions
+@query_budget(2)
+async def execute_code(request):
+    """Execute Python code and return output"""
+    try:
+        data = json.loads(request.body)
+        code = data.get('code', '').strip()
+
+        if not code:
+            return JsonResponse({'error': 'Code cannot be empty'}, status=400)
+
+        return JsonResponse(await aexecute_python_code(code))
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@async_login_required
+@async_require_POST
+@query_budget(30)
+async def stream_submission(request, challenge_id):
+    if request.user.is_superuser:
+        return JsonResponse({'error': 'Admins cannot submit solutions'}, status=403)
+
+    try:
+        challenge = await Challenge.objects.aget(id=challenge_id)
+    except Challenge.DoesNotExist:
+        raise Http404('No Challenge matches the given query.')
+
+    try:
+        submitted_code = json.loads(request.body).get('code', '').strip()
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    if not submitted_code:
+        return JsonResponse({'error': 'Code cannot be empty'}, status=400)
+
+    if getattr(settings, 'GRADING_MODE', 'sync') == 'queue':
+        rejection = await acharge(request)
+        if rejection:
+            return rejection
+        job = await sync_to_async(grading.enqueue_submission)(request.user, challenge, submitted_code)
+        return JsonResponse({
+            'job_id': job.id,
+            'status': 'pending',
+            'status_url': reverse('challenges:job_status', args=[job.id]),
+        }, status=202)
+
+    rejection, slots = await aadmit(request)
+    if rejection:
+        return rejection
+    events = grading.astream_submission(request.user, challenge, submitted_code)
+    return event_stream_response(AsyncEventStream(events, slots))
+
+
+@async_csrf_exempt
+@async_require_POST
+@query_budget(2)
+async def stream_code(request):
+    """Execute Python code, streaming its output as server-sent events"""
+    try:
+        code = json.loads(request.body).get('code', '').strip()
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    if not code:
+        return JsonResponse({'error': 'Code cannot be empty'}, status=400)
+
+    rejection, slots = await aadmit(request)
+    if rejection:
+        return rejection
+    return event_stream_response(AsyncEventStream(astream_python_code(code), slots))
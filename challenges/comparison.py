@@ -0,0 +1,143 @@
+"""
+Comparison of a program's output with a challenge's expected output.
+
+Each Challenge picks a ``comparison_mode``:
+
+* ``exact``: identical text once leading and trailing whitespace of the
+  whole output is ignored (the original behaviour).
+* ``whitespace``: lines match after collapsing runs of spaces and tabs;
+  blank lines are ignored.
+* ``lines``: the same non-blank lines, whitespace-normalized, in any order.
+* ``numeric``: like ``whitespace``, but tokens that are both numbers match
+  when they differ by at most the challenge's ``tolerance`` (relative or
+  absolute).
+
+The expected output is normalized once per distinct challenge text and kept
+in memory. Program output is walked line by line and the comparison stops at
+the first line that cannot match, without copying the whole output.
+"""
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+MODES = ('exact', 'whitespace', 'lines', 'numeric')
+
+_NON_SPACE = re.compile(r'\S')
+
+
+def _bounds(text):
+    """Start and end of text without its leading and trailing whitespace"""
+    match = _NON_SPACE.search(text)
+    if match is None:
+        return 0, 0
+    end = len(text)
+    while text[end - 1].isspace():
+        end -= 1
+    return match.start(), end
+
+
+def iter_lines(text):
+    """Lines of text between its first and last non-blank character, one at a time"""
+    position, end = _bounds(text)
+    if position == end:
+        return
+    while True:
+        newline = text.find('\n', position, end)
+        if newline < 0:
+            yield text[position:end]
+            return
+        yield text[position:newline]
+        position = newline + 1
+
+
+def normalize_line(line):
+    return ' '.join(line.split())
+
+
+def _normalized_lines(text):
+    for line in iter_lines(text):
+        line = normalize_line(line)
+        if line:
+            yield line
+
+
+def _number(token):
+    try:
+        value = float(token)
+    except ValueError:
+        return None
+    # 'nan' and 'inf' are words to a student, not numbers
+    return value if math.isfinite(value) else None
+
+
+class ExpectedOutput:
+    """A challenge's expected output, normalized for one comparison mode"""
+
+    def __init__(self, mode, text, tolerance=0.0):
+        if mode not in MODES:
+            raise ValueError(f'Unknown comparison mode {mode!r}')
+        self.mode = mode
+        self.tolerance = tolerance
+        if mode == 'exact':
+            self.lines = list(iter_lines(text))
+        elif mode == 'lines':
+            self.counts = Counter(_normalized_lines(text))
+        elif mode == 'numeric':
+            self.lines = [
+                [(token, _number(token)) for token in line.split()]
+                for line in _normalized_lines(text)
+            ]
+        else:
+            self.lines = list(_normalized_lines(text))
+
+    def matches(self, output):
+        if self.mode == 'exact':
+            return self._match_sequence(iter_lines(output), str.__eq__)
+        if self.mode == 'whitespace':
+            return self._match_sequence(_normalized_lines(output), str.__eq__)
+        if self.mode == 'numeric':
+            return self._match_sequence(_normalized_lines(output), self._numeric_line_matches)
+        return self._match_multiset(_normalized_lines(output))
+
+    def _match_sequence(self, lines, line_matches):
+        expected = iter(self.lines)
+        for line in lines:
+            want = next(expected, None)
+            if want is None or not line_matches(line, want):
+                return False
+        return next(expected, None) is None
+
+    def _match_multiset(self, lines):
+        remaining = Counter(self.counts)
+        for line in lines:
+            if not remaining[line]:
+                return False
+            remaining[line] -= 1
+        return not +remaining
+
+    def _numeric_line_matches(self, line, expected_tokens):
+        tokens = line.split()
+        if len(tokens) != len(expected_tokens):
+            return False
+        for token, (expected, expected_number) in zip(tokens, expected_tokens):
+            if token == expected:
+                continue
+            number = _number(token) if expected_number is not None else None
+            if number is None or not math.isclose(
+                number, expected_number, rel_tol=self.tolerance, abs_tol=self.tolerance
+            ):
+                return False
+        return True
+
+
+@lru_cache(maxsize=512)
+def compile_expected(mode, text, tolerance=0.0):
+    """Normalized expected output, built once per (mode, text, tolerance)"""
+    return ExpectedOutput(mode, text, tolerance)
+
+
+def outputs_match(challenge, output):
+    """Whether a program's output solves the challenge"""
+    expected = compile_expected(challenge.comparison_mode, challenge.expected_output, challenge.tolerance)
+    return expected.matches(output)
@@ -0,0 +1,852 @@
+"""
+Backends that run submitted Python code.
+
+``execute_python_code`` hands every Run and Submit to the backend selected by
+``CODE_EXECUTION_BACKEND``:
+
+* ``subprocess`` starts a brand-new interpreter for each run.
+* ``pool`` keeps ``CODE_EXECUTION_POOL_SIZE`` warm interpreters (see
+  ``executor_worker.py``) that fork a fresh child per run and are recycled
+  after ``CODE_EXECUTION_POOL_MAX_RUNS`` runs.
+
+Both return the same ``{'output': ..., 'error': ..., 'error_kind': ...}``
+dict. ``error_kind`` is None for a clean exit and otherwise one of
+``timeout``, ``cpu_limit``, ``memory_limit``, ``process_limit``,
+``open_files_limit``, ``file_size_limit``, ``output_limit``, ``syntax_error``,
+``runtime_error`` or ``internal`` (the sandbox itself failed). Code that does
+not parse is caught in-process by ``precheck.py`` and never reaches a
+backend. Output is read as it is produced, and a program that prints more
+than the output limit is stopped with its output truncated, so memory per
+run stays bounded. When ``CODE_EXECUTION_CACHE_SIZE`` is set the backend is
+wrapped in the result cache from ``result_cache.py``.
+
+Every run gets the resource limits from the ``CODE_EXECUTION_*_LIMIT``
+settings, which a challenge can override (``Challenge.execution_limits``).
+
+``stream_python_code`` yields the program's output as it is written,
+followed by the same result dict; the streaming views send it on as
+server-sent events. The pool backend only yields the result.
+
+Async views call ``aexecute_python_code``, which uses each backend's
+``aexecute``: the subprocess backend awaits its child on the event loop
+instead of blocking a thread for the length of the run.
+"""
+import asyncio
+import atexit
+import codecs
+import json
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from monitoring import metrics
+from .precheck import check_syntax
+
+WORKER_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKER_SCRIPT = os.path.join(WORKER_DIR, 'executor_worker.py')
+# Importing the worker instead of running it as a script lets Python reuse its
+# cached bytecode on every spawn
+RUN_ONCE = [
+    sys.executable, '-c',
+    f'import sys; sys.path.insert(0, {WORKER_DIR!r}); import executor_worker; '
+    f'del sys.path[0]; executor_worker.run_once()'
+]
+
+EXECUTIONS = metrics.counter('execution_runs_total', 'Programs executed, by outcome', ['outcome'])
+EXECUTION_SECONDS = metrics.histogram('execution_duration_seconds', 'Time to execute one program, end to end')
+EXECUTIONS_IN_FLIGHT = metrics.gauge('executions_in_flight', 'Programs currently executing')
+OUTPUT_BYTES = metrics.histogram(
+    'execution_output_bytes', 'Captured stdout plus stderr of one program',
+    buckets=(0, 64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+)
+SPAWNS_AVOIDED = metrics.counter(
+    'execution_spawns_avoided_total', 'Runs answered without starting a program, by reason', ['reason']
+)
+LIMITS_EXCEEDED = metrics.counter('execution_limits_exceeded_total', 'Programs stopped by a resource limit', ['kind'])
+SPAWN_FAILURES = metrics.counter('execution_worker_spawn_failures_total', 'Pool workers that could not be started')
+EXIT_CODES = metrics.counter('execution_exit_codes_total', 'Exit codes of programs that finished', ['backend', 'code'])
+PHASE_SECONDS = metrics.histogram(
+    'execution_phase_seconds', 'Time spent starting, running and cleaning up after a program',
+    ['backend', 'phase']
+)
+
+
+def observe_phases(backend, spawn, run, teardown):
+    PHASE_SECONDS.observe(spawn, backend=backend, phase='spawn')
+    PHASE_SECONDS.observe(run, backend=backend, phase='run')
+    PHASE_SECONDS.observe(teardown, backend=backend, phase='teardown')
+
+
+# Resource limit name -> setting holding its default
+LIMIT_SETTINGS = {
+    'cpu_seconds': 'CODE_EXECUTION_CPU_LIMIT',
+    'memory_mb': 'CODE_EXECUTION_MEMORY_LIMIT',
+    'open_files': 'CODE_EXECUTION_OPEN_FILES_LIMIT',
+    'file_size_mb': 'CODE_EXECUTION_FILE_SIZE_LIMIT',
+}
+
+# A limit shows up either as the signal that killed the program...
+LIMIT_SIGNALS = {
+    getattr(signal, 'SIGXCPU', None): 'cpu_limit',
+    getattr(signal, 'SIGXFSZ', None): 'file_size_limit',
+}
+# ...or as the exception the program died of, from the last line of stderr
+LIMIT_EXCEPTIONS = (
+    ('MemoryError', 'memory_limit'),
+    ('[Errno 24]', 'open_files_limit'),  # EMFILE
+    ('[Errno 27]', 'file_size_limit'),  # EFBIG; Python ignores SIGXFSZ
+    # Processes are not limited per run, but the host's limits may still stop a fork()
+    ('[Errno 11]', 'process_limit'),  # EAGAIN from fork()
+    ("can't start new thread", 'process_limit'),
+    ('SyntaxError', 'syntax_error'),
+    ('IndentationError', 'syntax_error'),
+    ('TabError', 'syntax_error'),
+)
+# Bytes of stdout plus stderr kept from one run; the program is stopped beyond it
+DEFAULT_OUTPUT_LIMIT = 64 * 1024
+
+LIMIT_MESSAGES = {
+    'cpu_limit': 'CPU time limit exceeded',
+    'memory_limit': 'Memory limit exceeded',
+    'process_limit': 'Process limit exceeded',
+    'open_files_limit': 'Open file limit exceeded',
+    'file_size_limit': 'File size limit exceeded',
+    'output_limit': 'Output limit exceeded',
+}
+
+
+def execution_limits(overrides=None):
+    """Resource limits for one run: the settings, with non-empty overrides on top"""
+    limits = {name: getattr(settings, setting, None) for name, setting in LIMIT_SETTINGS.items()}
+    limits.update({name: value for name, value in (overrides or {}).items() if value is not None})
+    return {name: value for name, value in limits.items() if value is not None}
+
+
+def classify_failure(stderr, returncode):
+    """Name the reason a program exited with a non-zero status"""
+    if returncode < 0 and -returncode in LIMIT_SIGNALS:
+        return LIMIT_SIGNALS[-returncode]
+    lines = stderr.strip().splitlines()
+    if lines:
+        for marker, kind in LIMIT_EXCEPTIONS:
+            if marker in lines[-1]:
+                return kind
+    return 'runtime_error'
+
+
+def build_result(stdout, stderr, returncode):
+    """Shape raw process output into the result dict the views return"""
+    if returncode == 0:
+        return {
+            'output': stdout,
+            'error': stderr if stderr else None,
+            'error_kind': None
+        }
+    kind = classify_failure(stderr, returncode)
+    return {
+        'output': stdout,
+        'error': stderr or LIMIT_MESSAGES.get(kind, 'Code execution failed'),
+        'error_kind': kind
+    }
+
+
+def timeout_result(timeout):
+    return {
+        'output': '',
+        'error': f'Code execution timed out ({timeout} seconds limit)',
+        'error_kind': 'timeout'
+    }
+
+
+def truncated_result(stdout, stderr, limit):
+    """Result for a program stopped because it printed more than limit bytes"""
+    return {
+        'output': f'{stdout}\n[Output truncated: more than {limit} bytes]\n',
+        'error': stderr or f'Output limit exceeded ({limit} bytes)',
+        'error_kind': 'output_limit'
+    }
+
+
+def error_result(error):
+    """Result for a run the sandbox itself failed to carry out"""
+    return {
+        'output': '',
+        'error': f'Execution error: {str(error)}',
+        'error_kind': 'internal'
+    }
+
+
+def default_scratch_root():
+    """Directory that holds per-run working directories, preferring tmpfs"""
+    root = getattr(settings, 'CODE_EXECUTION_SCRATCH_ROOT', None)
+    if root:
+        return root
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def decode_output(data):
+    """Decode captured bytes the way text-mode pipes would"""
+    return data.decode('utf-8', 'replace').replace('\r\n', '\n')
+
+
+STREAM_NAMES = ('stdout', 'stderr')
+
+
+class BoundedCapture:
+    """Drain a process's stdout and stderr on background threads, keeping at most limit bytes in all
+
+    With live set, every kept chunk is also queued for follow().
+    """
+
+    def __init__(self, process, limit, live=False):
+        self.remaining = limit
+        self.truncated = False
+        self.chunks = ([], [])
+        # Set once both pipes have closed or the limit is reached
+        self.finished = threading.Event()
+        self.pending = queue.SimpleQueue() if live else None
+        self._open = 2
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._drain, args=(stream, index), daemon=True)
+            for index, stream in enumerate((process.stdout, process.stderr))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _drain(self, stream, index):
+        while True:
+            data = os.read(stream.fileno(), 65536)
+            if not data:
+                break
+            with self._lock:
+                if self.truncated:
+                    # Keep reading so the child never blocks on a full pipe
+                    continue
+                if len(data) > self.remaining:
+                    data = data[:self.remaining]
+                    self.truncated = True
+                self.remaining -= len(data)
+                self.chunks[index].append(data)
+                if self.pending is not None:
+                    self.pending.put((index, data))
+                if self.truncated:
+                    self._finish()
+        with self._lock:
+            self._open -= 1
+            if not self._open:
+                self._finish()
+
+    def _finish(self):
+        if not self.finished.is_set():
+            self.finished.set()
+            if self.pending is not None:
+                self.pending.put(None)
+
+    def follow(self, deadline):
+        """Yield (stream name, text) as output arrives, until capture finishes or the deadline passes"""
+        decoders = [codecs.getincrementaldecoder('utf-8')('replace') for _ in STREAM_NAMES]
+        while True:
+            try:
+                item = self.pending.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return
+            if item is None:
+                return
+            index, data = item
+            text = decoders[index].decode(data).replace('\r\n', '\n')
+            if text:
+                yield STREAM_NAMES[index], text
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def contents(self):
+        with self._lock:
+            return [b''.join(chunks) for chunks in self.chunks]
+
+
+class AsyncBoundedCapture:
+    """BoundedCapture for an asyncio subprocess, draining its pipes as tasks on the running loop"""
+
+    def __init__(self, process, limit, live=False):
+        self.remaining = limit
+        self.truncated = False
+        self.chunks = ([], [])
+        self.finished = asyncio.Event()
+        self.pending = asyncio.Queue() if live else None
+        self._open = 2
+        self._tasks = [
+            asyncio.ensure_future(self._drain(stream, index))
+            for index, stream in enumerate((process.stdout, process.stderr))
+        ]
+
+    async def _drain(self, stream, index):
+        while True:
+            data = await stream.read(65536)
+            if not data:
+                break
+            if self.truncated:
+                continue
+            if len(data) > self.remaining:
+                data = data[:self.remaining]
+                self.truncated = True
+            self.remaining -= len(data)
+            self.chunks[index].append(data)
+            if self.pending is not None:
+                self.pending.put_nowait((index, data))
+            if self.truncated:
+                self._finish()
+        self._open -= 1
+        if not self._open:
+            self._finish()
+
+    def _finish(self):
+        if not self.finished.is_set():
+            self.finished.set()
+            if self.pending is not None:
+                self.pending.put_nowait(None)
+
+    async def follow(self, deadline):
+        decoders = [codecs.getincrementaldecoder('utf-8')('replace') for _ in STREAM_NAMES]
+        while True:
+            try:
+                item = await asyncio.wait_for(self.pending.get(), max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                return
+            if item is None:
+                return
+            index, data = item
+            text = decoders[index].decode(data).replace('\r\n', '\n')
+            if text:
+                yield STREAM_NAMES[index], text
+
+    async def join(self, timeout=None):
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+    def contents(self):
+        return [b''.join(chunks) for chunks in self.chunks]
+
+
+# One semaphore per event loop: asyncio primitives cannot be shared between loops
+_child_limiters = weakref.WeakKeyDictionary()
+
+
+def child_limiter():
+    """Bound the programs one event loop supervises at once"""
+    loop = asyncio.get_running_loop()
+    limiter = _child_limiters.get(loop)
+    if limiter is None:
+        limiter = _child_limiters[loop] = asyncio.Semaphore(getattr(settings, 'CODE_EXECUTION_ASYNC_MAX_CHILDREN', 256))
+    return limiter
+
+
+def run_once_command(scratch, limits):
+    return RUN_ONCE + [scratch] + [f'{name}={value}' for name, value in (limits or {}).items()]
+
+
+# Streamed runs write straight through, so output shows up as it is printed
+STREAMING_ENV = dict(os.environ, PYTHONUNBUFFERED='1')
+
+
+def kill_process_group(process):
+    """Kill a program together with every process it started, as the pool does"""
+    if not hasattr(os, 'killpg'):
+        # No process groups on Windows
+        process.kill()
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+class SubprocessExecutor:
+    """Run every program in a freshly started interpreter"""
+
+    def __init__(self, timeout=10, scratch_root=None, output_limit=DEFAULT_OUTPUT_LIMIT):
+        self.timeout = timeout
+        self.scratch_root = scratch_root
+        self.output_limit = output_limit
+
+    def execute(self, code, limits=None):
+        for _, result in self.stream(code, limits, live=False):
+            pass
+        return result
+
+    def stream(self, code, limits=None, live=True):
+        """Run a program, yielding (stream name, text) as it writes and finally ('result', result dict)"""
+        # The code is piped to the child, which creates and removes its own
+        # scratch directory, so a successful run never touches the disk here
+        scratch = os.path.join(self.scratch_root or default_scratch_root(), f'run-{uuid.uuid4().hex}')
+        started = time.perf_counter()
+        try:
+            process = subprocess.Popen(
+                run_once_command(scratch, limits),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=os.path.dirname(scratch),
+                env=STREAMING_ENV if live else None,
+                start_new_session=True
+            )
+        except Exception as e:
+            yield 'result', error_result(e)
+            return
+
+        spawned = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        try:
+            capture = BoundedCapture(process, self.output_limit, live)
+            try:
+                process.stdin.write(code.encode('utf-8', 'surrogatepass'))
+                process.stdin.close()
+            except BrokenPipeError:
+                # The child died before reading its program; its stderr says why
+                pass
+
+            if live:
+                yield from capture.follow(deadline)
+            timed_out = not capture.finished.wait(max(deadline - time.monotonic(), 0))
+            if not timed_out and not capture.truncated:
+                try:
+                    process.wait(max(deadline - time.monotonic(), 0))
+                except subprocess.TimeoutExpired:
+                    timed_out = True
+            if timed_out or capture.truncated:
+                kill_process_group(process)
+            process.wait()
+            # A process the program started may still hold the pipes open
+            capture.join(1)
+        except Exception as e:
+            error = error_result(e)
+        else:
+            error = None
+        finally:
+            # Also reached when a streaming client goes away mid-run
+            if process.poll() is None:
+                kill_process_group(process)
+                process.wait()
+        if error:
+            yield 'result', error
+            return
+
+        ran = time.perf_counter()
+        stdout, stderr = capture.contents()
+        result = self._result(scratch, timed_out, capture.truncated, process.returncode, stdout, stderr)
+        observe_phases('subprocess', spawned - started, ran - spawned, time.perf_counter() - ran)
+        yield 'result', result
+
+    async def aexecute(self, code, limits=None):
+        """execute() for the event loop: the child and its pipes are awaited, not waited on by a thread"""
+        async for _, result in self.astream(code, limits, live=False):
+            pass
+        return result
+
+    async def astream(self, code, limits=None, live=True):
+        """stream() for the event loop"""
+        async with child_limiter():
+            scratch = os.path.join(self.scratch_root or default_scratch_root(), f'run-{uuid.uuid4().hex}')
+            started = time.perf_counter()
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *run_once_command(scratch, limits),
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    cwd=os.path.dirname(scratch),
+                    env=STREAMING_ENV if live else None,
+                    start_new_session=True
+                )
+            except Exception as e:
+                yield 'result', error_result(e)
+                return
+
+            spawned = time.perf_counter()
+            deadline = time.monotonic() + self.timeout
+            try:
+                capture = AsyncBoundedCapture(process, self.output_limit, live)
+                try:
+                    process.stdin.write(code.encode('utf-8', 'surrogatepass'))
+                    await asyncio.wait_for(process.stdin.drain(), self.timeout)
+                    process.stdin.close()
+                except (BrokenPipeError, ConnectionResetError, asyncio.TimeoutError):
+                    pass
+
+                if live:
+                    async for chunk in capture.follow(deadline):
+                        yield chunk
+                try:
+                    await asyncio.wait_for(capture.finished.wait(), max(deadline - time.monotonic(), 0))
+                    timed_out = False
+                except asyncio.TimeoutError:
+                    timed_out = True
+                if not timed_out and not capture.truncated:
+                    try:
+                        await asyncio.wait_for(process.wait(), max(deadline - time.monotonic(), 0))
+                    except asyncio.TimeoutError:
+                        timed_out = True
+                if timed_out or capture.truncated:
+                    kill_process_group(process)
+                await process.wait()
+                await capture.join(1)
+            except Exception as e:
+                error = error_result(e)
+            else:
+                error = None
+            finally:
+                # Also reached when the request is cancelled mid-run
+                if process.returncode is None:
+                    kill_process_group(process)
+            if error:
+                yield 'result', error
+                return
+
+            ran = time.perf_counter()
+            stdout, stderr = capture.contents()
+            result = self._result(scratch, timed_out, capture.truncated, process.returncode, stdout, stderr)
+            observe_phases('subprocess', spawned - started, ran - spawned, time.perf_counter() - ran)
+            yield 'result', result
+
+    def _result(self, scratch, timed_out, truncated, returncode, stdout, stderr):
+        if timed_out or truncated or returncode != 0:
+            # The child may have died before cleaning up
+            shutil.rmtree(scratch, ignore_errors=True)
+        if timed_out:
+            return timeout_result(self.timeout)
+        if truncated:
+            return truncated_result(decode_output(stdout), decode_output(stderr), self.output_limit)
+        EXIT_CODES.inc(backend='subprocess', code=returncode)
+        return build_result(decode_output(stdout), decode_output(stderr), returncode)
+
+    def close(self):
+        pass
+
+
+class PoolWorker:
+    """One warm interpreter process owned by a WorkerPoolExecutor"""
+
+    def __init__(self, scratch_root):
+        self.scratch_root = scratch_root
+        self.process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            cwd=scratch_root,
+        )
+        self.runs = 0
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def run(self, code, timeout, output_limit, limits=None):
+        """Send one job and wait for its result"""
+        self.runs += 1
+        job = {
+            'code': code,
+            'timeout': timeout,
+            'output_limit': output_limit,
+            'scratch_root': self.scratch_root,
+            'limits': limits or {},
+        }
+
+        # The worker enforces the run timeout itself; this only catches a
+        # worker that has hung or died
+        watchdog = threading.Timer(timeout + 5, self.process.kill)
+        watchdog.start()
+        try:
+            self.process.stdin.write(json.dumps(job) + '\n')
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        finally:
+            watchdog.cancel()
+
+        if not line:
+            raise RuntimeError('Execution worker exited unexpectedly')
+        return json.loads(line)
+
+    def stop(self):
+        if self.is_alive():
+            self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+class WorkerPoolExecutor:
+    """Run programs on a pool of pre-started, pre-imported interpreters"""
+
+    def __init__(self, size=4, max_runs=100, timeout=10, scratch_root=None, output_limit=DEFAULT_OUTPUT_LIMIT):
+        self.size = size
+        self.max_runs = max_runs
+        self.timeout = timeout
+        self.scratch_root = scratch_root
+        self.output_limit = output_limit
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_started(self):
+        # Pools do not survive a fork of the web process, so each process
+        # (e.g. every gunicorn worker) starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._idle = queue.Queue()
+            self._workers = []
+            for _ in range(self.size):
+                self._add_worker()
+            self._pid = os.getpid()
+
+    def _add_worker(self):
+        worker = PoolWorker(self.scratch_root or default_scratch_root())
+        self._workers.append(worker)
+        self._idle.put(worker)
+
+    def _retire(self, worker):
+        worker.stop()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        self._replenish()
+
+    def _replenish(self):
+        """Start workers for the places left empty by failed spawns; retried on every run"""
+        if len(self._workers) >= self.size:
+            return
+        with self._lock:
+            while len(self._workers) < self.size:
+                try:
+                    self._add_worker()
+                except Exception:
+                    SPAWN_FAILURES.inc()
+                    return
+
+    def _take_worker(self):
+        self._replenish()
+        if not self._workers:
+            return None
+        try:
+            # A busy worker is back within its run's watchdog time
+            return self._idle.get(timeout=self.timeout + 5)
+        except queue.Empty:
+            return None
+
+    def execute(self, code, limits=None):
+        try:
+            self._ensure_started()
+        except Exception as e:
+            return error_result(e)
+
+        worker = self._take_worker()
+        if worker is None:
+            # No worker could be started: run in a one-off interpreter instead
+            fallback = SubprocessExecutor(timeout=self.timeout, scratch_root=self.scratch_root, output_limit=self.output_limit)
+            return fallback.execute(code, limits)
+        try:
+            result = worker.run(code, self.timeout, self.output_limit, limits)
+        except Exception as e:
+            self._retire(worker)
+            return error_result(e)
+
+        if worker.runs >= self.max_runs or not worker.is_alive():
+            self._retire(worker)
+        else:
+            self._idle.put(worker)
+
+        observe_phases('pool', **result['timings'])
+        if result['timed_out']:
+            return timeout_result(self.timeout)
+        if result['truncated']:
+            return truncated_result(result['stdout'], result['stderr'], self.output_limit)
+        EXIT_CODES.inc(backend='pool', code=result['returncode'])
+        return build_result(result['stdout'], result['stderr'], result['returncode'])
+
+    def stream(self, code, limits=None, live=True):
+        # Workers hand back a run's output in one piece, so only the result is streamed
+        yield 'result', self.execute(code, limits)
+
+    async def astream(self, code, limits=None, live=True):
+        yield 'result', await self.aexecute(code, limits)
+
+    async def aexecute(self, code, limits=None):
+        # Workers are driven over blocking pipes, so each run holds a thread
+        return await sync_to_async(self.execute, thread_sensitive=False)(code, limits)
+
+    def close(self):
+        with self._lock:
+            for worker in self._workers:
+                worker.stop()
+            self._workers = []
+            self._idle = queue.Queue()
+            self._pid = None
+
+
+def create_executor():
+    """Build the backend configured in settings"""
+    backend = getattr(settings, 'CODE_EXECUTION_BACKEND', 'subprocess')
+    timeout = getattr(settings, 'CODE_EXECUTION_TIMEOUT', 10)
+    scratch_root = default_scratch_root()
+    output_limit = getattr(settings, 'CODE_EXECUTION_OUTPUT_LIMIT', DEFAULT_OUTPUT_LIMIT)
+
+    if backend == 'pool' and hasattr(os, 'fork'):
+        executor = WorkerPoolExecutor(
+            size=getattr(settings, 'CODE_EXECUTION_POOL_SIZE', 4),
+            max_runs=getattr(settings, 'CODE_EXECUTION_POOL_MAX_RUNS', 100),
+            timeout=timeout,
+            scratch_root=scratch_root,
+            output_limit=output_limit,
+        )
+    else:
+        # The pool relies on fork(), so platforms without it use the spawn path
+        executor = SubprocessExecutor(timeout=timeout, scratch_root=scratch_root, output_limit=output_limit)
+
+    cache_size = getattr(settings, 'CODE_EXECUTION_CACHE_SIZE', 0)
+    if cache_size > 0:
+        from .result_cache import CachedExecutor
+        executor = CachedExecutor(
+            executor,
+            max_entries=cache_size,
+            ttl=getattr(settings, 'CODE_EXECUTION_CACHE_TTL', 300),
+            cache_nondeterministic=getattr(settings, 'CODE_EXECUTION_CACHE_NONDETERMINISTIC', False),
+        )
+    return executor
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = create_executor()
+    return _executor
+
+
+def reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.close()
+        _executor = None
+
+
+def observe_execution(result, seconds):
+    EXECUTION_SECONDS.observe(seconds)
+    kind = result.get('error_kind')
+    EXECUTIONS.inc(outcome={'timeout': 'timeout', 'internal': 'error'}.get(kind, 'completed'))
+    if kind in LIMIT_MESSAGES:
+        LIMITS_EXCEEDED.inc(kind=kind)
+    error = result.get('error') or ''
+    OUTPUT_BYTES.observe(len(result['output'].encode('utf-8', 'replace')) + len(error.encode('utf-8', 'replace')))
+
+
+def execute_python_code(code, limits=None):
+    """Safely execute Python code and return output
+
+    limits overrides the default resource limits, as Challenge.execution_limits() returns them.
+    """
+    result = check_syntax(code)
+    if result is not None:
+        SPAWNS_AVOIDED.inc(reason='syntax_error')
+        metrics.flush()
+        return result
+
+    started = time.perf_counter()
+    with EXECUTIONS_IN_FLIGHT.track():
+        result = get_executor().execute(code, execution_limits(limits))
+    observe_execution(result, time.perf_counter() - started)
+    # Graders have no request cycle to flush their numbers for them
+    metrics.flush()
+    return result
+
+
+async def aexecute_python_code(code, limits=None):
+    """execute_python_code() for async views
+
+    With the subprocess backend the program is awaited on the event loop, so
+    one ASGI process can supervise up to CODE_EXECUTION_ASYNC_MAX_CHILDREN
+    runs at once; the pool backend still runs each program on a thread.
+    """
+    result = check_syntax(code)
+    if result is not None:
+        SPAWNS_AVOIDED.inc(reason='syntax_error')
+        return result
+
+    started = time.perf_counter()
+    with EXECUTIONS_IN_FLIGHT.track():
+        result = await get_executor().aexecute(code, execution_limits(limits))
+    observe_execution(result, time.perf_counter() - started)
+    return result
+
+
+def stream_python_code(code, limits=None):
+    """execute_python_code() that yields (stream name, text) as the program writes, then ('result', result)"""
+    result = check_syntax(code)
+    if result is not None:
+        SPAWNS_AVOIDED.inc(reason='syntax_error')
+        metrics.flush()
+        yield 'result', result
+        return
+
+    started = time.perf_counter()
+    with EXECUTIONS_IN_FLIGHT.track():
+        for event, payload in get_executor().stream(code, execution_limits(limits)):
+            if event == 'result':
+                observe_execution(payload, time.perf_counter() - started)
+            yield event, payload
+    metrics.flush()
+
+
+async def astream_python_code(code, limits=None):
+    """stream_python_code() for async views"""
+    result = check_syntax(code)
+    if result is not None:
+        SPAWNS_AVOIDED.inc(reason='syntax_error')
+        yield 'result', result
+        return
+
+    started = time.perf_counter()
+    with EXECUTIONS_IN_FLIGHT.track():
+        async for event, payload in get_executor().astream(code, execution_limits(limits)):
+            if event == 'result':
+                observe_execution(payload, time.perf_counter() - started)
+            yield event, payload
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(sender, setting, **kwargs):
+    if setting.startswith('CODE_EXECUTION_'):
+        reset_executor()
+
+
+atexit.register(reset_executor)
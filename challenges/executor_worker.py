@@ -0,0 +1,269 @@
+"""
+Bootstrap for running submitted programs without writing them to disk.
+
+``executor_worker.run_once()`` reads one program from stdin and runs it in a
+scratch directory it creates and removes itself; the ``subprocess`` backend
+starts one interpreter doing this per run. Either way the resource limits of
+the job are applied just before the program starts.
+
+``python executor_worker.py`` is the warm interpreter used by the ``pool``
+backend: it pre-imports the modules student programs commonly use, then reads
+one JSON job per line on stdin and answers with one JSON result per line.
+Every job runs in a freshly forked child, so programs never see each other's
+state and the warm parent stays clean between runs.
+
+This script must not import Django.
+"""
+import builtins
+import os
+import sys
+
+SCRIPT_NAME = 'solution.py'
+
+# Pre-imported by the warm pool so student programs do not pay for them
+WARM_MODULES = ['collections', 'datetime', 'functools', 'itertools', 'math', 'random', 're', 'string']
+
+# Resource limit name -> (RLIMIT_* constant name, unit in bytes or 1). There is
+# no RLIMIT_NPROC: it counts every process and thread of the real user, and
+# programs run as the same user as the web, pool and grader processes
+LIMITS = {
+    'cpu_seconds': ('RLIMIT_CPU', 1),
+    'memory_mb': ('RLIMIT_AS', 1024 * 1024),
+    'open_files': ('RLIMIT_NOFILE', 1),
+    'file_size_mb': ('RLIMIT_FSIZE', 1024 * 1024),
+}
+
+
+def apply_limits(limits):
+    """Lower this process's resource limits before it runs a program"""
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows; only the wall-clock timeout applies there
+        return
+
+    for name, value in limits.items():
+        if value is None or name not in LIMITS:
+            continue
+        constant, unit = LIMITS[name]
+        soft = hard = int(value) * unit
+        if name == 'cpu_seconds':
+            # SIGXCPU at the soft limit, SIGKILL a second later if it is caught
+            hard = soft + 1
+        current_soft, current_hard = resource.getrlimit(getattr(resource, constant))
+        if current_hard != resource.RLIM_INFINITY:
+            soft, hard = min(soft, current_hard), min(hard, current_hard)
+        resource.setrlimit(getattr(resource, constant), (soft, hard))
+
+
+def run_source(source, filename=SCRIPT_NAME):
+    """Run source as ``__main__`` and return the exit status the interpreter would use"""
+    sys.argv = [filename]
+    sys.path[0] = os.getcwd()
+    namespace = {'__name__': '__main__', '__file__': filename, '__builtins__': builtins}
+    try:
+        # exec() of a string avoids the AST setup that the compile() builtin
+        # does on first use, a noticeable share of a short run
+        exec(source, namespace)
+        status = 0
+    except SystemExit as e:
+        if e.code is None:
+            status = 0
+        elif isinstance(e.code, int):
+            status = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            status = 1
+    except BaseException as e:
+        print_exception(e, source, filename)
+        status = 1
+
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    return status
+
+
+def print_exception(exc, source, filename):
+    """Print a traceback that starts at, and is named after, the student's file"""
+    import linecache
+    import traceback
+
+    # Tracebacks show the student's lines even though no file exists
+    lines = source.splitlines(True)
+    for name in ('<string>', filename):
+        linecache.cache[name] = (len(source), None, lines, name)
+
+    # Drop this frame so the traceback starts at the student's code
+    tb = exc.__traceback__.tb_next if exc.__traceback__ else None
+    report = traceback.TracebackException(type(exc), exc, tb)
+
+    pending = [report]
+    while pending:
+        current = pending.pop()
+        for frame in current.stack:
+            if frame.filename == '<string>':
+                frame.filename = filename
+        if getattr(current, 'filename', None) == '<string>':
+            current.filename = filename
+        pending.extend(e for e in (current.__cause__, current.__context__) if e is not None)
+        pending.extend(getattr(current, 'exceptions', None) or [])
+
+    sys.stderr.write(''.join(report.format()))
+
+
+# The pool-only helpers below import lazily so that ``run_once`` starts as fast
+# as a bare interpreter
+
+
+def _collect(pipes, deadline, limit):
+    """Drain the child's pipes until they close, limit bytes arrive or the deadline passes
+
+    Returns (contents, timed_out, truncated); at most limit bytes are kept.
+    """
+    import selectors
+    import time
+
+    chunks = {fd: [] for fd in pipes}
+    selector = selectors.DefaultSelector()
+    for fd in pipes:
+        selector.register(fd, selectors.EVENT_READ)
+
+    timed_out = truncated = False
+    remaining_bytes = limit
+    while selector.get_map() and not truncated:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        for key, _ in selector.select(remaining):
+            data = os.read(key.fd, 65536)
+            if not data:
+                selector.unregister(key.fd)
+                continue
+            if len(data) > remaining_bytes:
+                data = data[:remaining_bytes]
+                truncated = True
+            remaining_bytes -= len(data)
+            chunks[key.fd].append(data)
+            if truncated:
+                break
+
+    selector.close()
+    return [b''.join(chunks[fd]) for fd in pipes], timed_out, truncated
+
+
+def _max_fd():
+    try:
+        return os.sysconf('SC_OPEN_MAX')
+    except (AttributeError, ValueError, OSError):
+        return 65536
+
+
+def run_job(job):
+    """Fork a child for one job and report its output and exit status"""
+    import shutil
+    import signal
+    import tempfile
+    import time
+
+    started = time.perf_counter()
+    scratch = tempfile.mkdtemp(prefix='run-', dir=job.get('scratch_root'))
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            os.setpgid(0, 0)
+            os.close(out_r)
+            os.close(err_r)
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, 0)
+            os.dup2(out_w, 1)
+            os.dup2(err_w, 2)
+            # Every other descriptor, above all the protocol channel, stays out of the program's reach
+            os.closerange(3, _max_fd())
+            os.chdir(scratch)
+            apply_limits(job.get('limits') or {})
+            status = run_source(job['code'])
+        finally:
+            os._exit(status)
+
+    os.close(out_w)
+    os.close(err_w)
+    spawned = time.perf_counter()
+    deadline = time.monotonic() + job['timeout']
+    (stdout, stderr), timed_out, truncated = _collect([out_r, err_r], deadline, job['output_limit'])
+    ran = time.perf_counter()
+    if timed_out or truncated:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    os.close(out_r)
+    os.close(err_r)
+
+    _, wait_status = os.waitpid(pid, 0)
+    shutil.rmtree(scratch, ignore_errors=True)
+    return {
+        'stdout': stdout.decode('utf-8', 'replace'),
+        'stderr': stderr.decode('utf-8', 'replace'),
+        'returncode': os.waitstatus_to_exitcode(wait_status),
+        'timed_out': timed_out,
+        'truncated': truncated,
+        'timings': {'spawn': spawned - started, 'run': ran - spawned, 'teardown': time.perf_counter() - ran},
+    }
+
+
+def run_once():
+    """Run the program piped in on stdin inside a new scratch directory, then exit
+
+    Arguments after the scratch directory are resource limits as name=value.
+    """
+    scratch = sys.argv[1]
+    limits = dict(argument.split('=', 1) for argument in sys.argv[2:])
+    # The parent encodes with surrogatepass so lone surrogates survive the pipe
+    source = sys.stdin.buffer.read().decode('utf-8', 'surrogatepass')
+    # The program itself sees an empty stdin
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+
+    os.mkdir(scratch, 0o700)
+    os.chdir(scratch)
+    try:
+        apply_limits(limits)
+        status = run_source(source)
+    finally:
+        os.chdir(os.path.dirname(scratch))
+        try:
+            os.rmdir(scratch)
+        except OSError:
+            # The program left files behind
+            import shutil
+            shutil.rmtree(scratch, ignore_errors=True)
+    sys.exit(status)
+
+
+def main():
+    import json
+
+    for name in WARM_MODULES:
+        __import__(name)
+
+    # Keep the protocol channel private so nothing else can write to it
+    channel = os.fdopen(os.dup(1), 'w')
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+
+    for line in sys.stdin:
+        result = run_job(json.loads(line))
+        channel.write(json.dumps(result) + '\n')
+        channel.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -25,7 +25,7 @@ class WeekForm(forms.ModelForm):
 class ChallengeForm(forms.ModelForm):
     class Meta:
         model = Challenge
-        fields = ['week', 'title', 'description', 'buggy_code', 'expected_output', 'difficulty', 'points', 'order']
+        fields = ['week', 'title', 'description', 'buggy_code', 'expected_output', 'comparison_mode', 'tolerance', 'difficulty', 'points', 'order']
         widgets = {
             'description': forms.Textarea(attrs={'rows': 4}),
             'buggy_code': forms.Textarea(attrs={'rows': 10, 'class': 'code-editor'}),
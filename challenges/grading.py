@@ -0,0 +1,345 @@
+"""
+Grading of submitted solutions.
+
+With ``GRADING_MODE = 'sync'`` the submit view runs and grades the code
+itself. With ``GRADING_MODE = 'queue'`` the view only stores a pending
+Submission plus a GradingJob row and returns straight away; grader
+processes started with ``manage.py run_graders`` claim the jobs from the
+database, run them and record the result. No broker is involved.
+
+``Submission.points_earned`` always holds the points currently counted in
+the user's ``total_score``, so a regrade only ever applies the difference.
+``total_score`` is the sum of the user's currently correct submissions: a
+correct solution that is resubmitted and fails gives its points back, as it
+does in the weekly progress. Every graded run is also appended to the
+attempt history (``history.py``). The same differences move the user on the
+materialized leaderboards.
+
+A resubmission that does not change the grade writes only the submission
+and its attempt. One that does adds a conditional UPDATE of the week's
+progress, one of the total score and three queries for the leaderboards.
+"""
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from authentication.backends import forget_user
+from authentication.models import CustomUser
+from leaderboard import ranking
+from .comparison import outputs_match
+from .executor import aexecute_python_code, astream_python_code, execute_python_code, stream_python_code
+from .history import record_attempts
+from .models import Submission, UserProgress, GradingJob
+from .signals import submissions_bulk_updated
+
+FINISHED_STATES = ('done', 'superseded', 'failed')
+GRADED_FIELDS = ['submitted_code', 'output', 'status', 'points_earned', 'error_kind']
+
+
+def check_output(challenge, output):
+    """Return the submission status for a program's output"""
+    return 'correct' if outputs_match(challenge, output) else 'incorrect'
+
+
+def apply_grade(submission, execution_result):
+    """Grade a run onto an unsaved submission; return its (completed, week points, score) deltas"""
+    challenge = submission.challenge
+    output = execution_result['output']
+    status = check_output(challenge, output)
+    points_earned = challenge.points if status == 'correct' else 0
+    was_correct = submission.status == 'correct'
+    previous_points = submission.points_earned
+
+    submission.output = output
+    submission.status = status
+    submission.points_earned = points_earned
+    submission.error_kind = execution_result.get('error_kind') or ''
+
+    # Progress counts correct submissions only
+    completed_delta = (status == 'correct') - was_correct
+    progress_points_delta = points_earned - (previous_points if was_correct else 0)
+    return completed_delta, progress_points_delta, points_earned - previous_points
+
+
+def update_scores(user_id, week_deltas, score_delta):
+    """Apply graded changes to the user's progress, total score and leaderboards
+
+    week_deltas maps week ids to (completed delta, points delta).
+    """
+    board_deltas = {}
+    for week_id, (completed_delta, points_delta) in week_deltas.items():
+        # A recounted row is saved, and saving moves the weekly board itself
+        if (completed_delta or points_delta) and UserProgress.apply_delta(user_id, week_id, completed_delta, points_delta):
+            board_deltas[ranking.week_board(week_id)] = points_delta
+    if score_delta:
+        CustomUser.objects.filter(pk=user_id).update(total_score=F('total_score') + score_delta)
+        forget_user(user_id)
+        board_deltas[ranking.GLOBAL_BOARD] = score_delta
+    ranking.apply_score_deltas(user_id, board_deltas)
+
+
+def record_result(submission, execution_result):
+    """Store a graded run on the submission and update progress and score"""
+    deltas = apply_grade(submission, execution_result)
+    submission.save()
+    return record_graded(submission, deltas)
+
+
+def record_graded(submission, deltas):
+    """Update progress and score for a submission saved with its grade"""
+    completed_delta, progress_points_delta, score_delta = deltas
+    record_attempts([submission])
+    update_scores(
+        submission.user_id,
+        {submission.challenge.week_id: (completed_delta, progress_points_delta)},
+        score_delta
+    )
+    return submission.status, submission.points_earned
+
+
+def grade_submission(user, challenge, code):
+    """Run and grade a solution in the calling process"""
+    execution_result = execute_python_code(code, challenge.execution_limits())
+    return save_graded_submission(user, challenge, code, execution_result)
+
+
+async def agrade_submission(user, challenge, code):
+    """grade_submission() for async views: the run is awaited, the bookkeeping runs on a thread"""
+    execution_result = await aexecute_python_code(code, challenge.execution_limits())
+    # Row locks and transactions have no async ORM API
+    return await sync_to_async(save_graded_submission)(user, challenge, code, execution_result)
+
+
+def stream_submission(user, challenge, code):
+    """grade_submission() that yields the program's output as it runs and then ('result', submit response data)"""
+    for event, payload in stream_python_code(code, challenge.execution_limits()):
+        if event == 'result':
+            payload = save_graded_submission(user, challenge, code, payload)
+        yield event, payload
+
+
+async def astream_submission(user, challenge, code):
+    """stream_submission() for async views"""
+    async for event, payload in astream_python_code(code, challenge.execution_limits()):
+        if event == 'result':
+            payload = await sync_to_async(save_graded_submission)(user, challenge, code, payload)
+        yield event, payload
+
+
+def save_graded_submission(user, challenge, code, execution_result):
+    """Record a finished run as the user's submission; return the submit response data"""
+    # A first submission is inserted with its grade rather than updated after
+    graded = Submission(user=user, challenge=challenge, submitted_code=code)
+    deltas = apply_grade(graded, execution_result)
+    with transaction.atomic():
+        submission, created = Submission.objects.select_for_update().get_or_create(
+            user=user,
+            challenge=challenge,
+            defaults={field: getattr(graded, field) for field in GRADED_FIELDS}
+        )
+        submission.challenge = challenge
+        if created:
+            status, points_earned = record_graded(submission, deltas)
+        else:
+            submission.submitted_code = code
+            status, points_earned = record_result(submission, execution_result)
+
+    return {
+        'status': status,
+        'output': execution_result['output'],
+        'points_earned': points_earned,
+        'error': execution_result.get('error', ''),
+        'error_kind': execution_result.get('error_kind'),
+    }
+
+
+def grade_batch(user, entries, parallelism=4):
+    """Run several (challenge, code) solutions at once and record them in one transaction
+
+    Progress is updated once per week and the total score once, however many
+    challenges the batch covers.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(parallelism, len(entries)))) as pool:
+        execution_results = list(pool.map(
+            execute_python_code,
+            [code for _, code in entries],
+            [challenge.execution_limits() for challenge, _ in entries]
+        ))
+
+    with transaction.atomic():
+        # Create the missing rows first, so that every row can be locked. A
+        # row another request created meanwhile is kept and graded on top of,
+        # as get_or_create() does for a single submission
+        Submission.objects.bulk_create(
+            [Submission(user=user, challenge=challenge, submitted_code=code) for challenge, code in entries],
+            ignore_conflicts=True
+        )
+        existing = {
+            submission.challenge_id: submission
+            for submission in Submission.objects.select_for_update().filter(
+                user=user,
+                challenge_id__in=[challenge.id for challenge, _ in entries]
+            )
+        }
+        submissions, results = [], []
+        week_deltas = defaultdict(lambda: [0, 0])
+        score_delta = 0
+        for (challenge, code), execution_result in zip(entries, execution_results):
+            submission = existing[challenge.id]
+            submission.challenge = challenge
+            submissions.append(submission)
+            submission.submitted_code = code
+            completed_delta, progress_points_delta, points_delta = apply_grade(submission, execution_result)
+            week_deltas[challenge.week_id][0] += completed_delta
+            week_deltas[challenge.week_id][1] += progress_points_delta
+            score_delta += points_delta
+            results.append({
+                'challenge_id': challenge.id,
+                'status': submission.status,
+                'output': execution_result['output'],
+                'points_earned': submission.points_earned,
+                'error': execution_result.get('error', ''),
+                'error_kind': execution_result.get('error_kind'),
+            })
+
+        Submission.objects.bulk_update(submissions, GRADED_FIELDS)
+        record_attempts(submissions)
+        update_scores(user.pk, week_deltas, score_delta)
+        submissions_bulk_updated.send(sender=Submission, user_ids=[user.pk])
+
+    return results
+
+
+def enqueue_submission(user, challenge, code):
+    """Store a pending submission and queue a job to grade it"""
+    with transaction.atomic():
+        submission, _ = Submission.objects.select_for_update().get_or_create(
+            user=user,
+            challenge=challenge,
+            defaults={'submitted_code': code}
+        )
+        if submission.status == 'correct':
+            # A pending submission no longer counts towards progress
+            update_scores(user.pk, {challenge.week_id: (-1, -submission.points_earned)}, 0)
+        submission.submitted_code = code
+        submission.output = ''
+        submission.status = 'pending'
+        submission.error_kind = ''
+        submission.save(update_fields=['submitted_code', 'output', 'status', 'error_kind'])
+
+        # Only the newest attempt is worth grading
+        submission.grading_jobs.filter(state='queued').update(
+            state='superseded',
+            finished_at=timezone.now()
+        )
+        return GradingJob.objects.create(submission=submission, code=code)
+
+
+def claim_job(worker_name):
+    """Take the oldest queued job, or return None if the queue is empty"""
+    candidates = list(
+        GradingJob.objects.filter(state='queued').values_list('id', flat=True)[:10]
+    )
+    for job_id in candidates:
+        # The conditional UPDATE is the lock: only one grader can move a job
+        # out of 'queued', on every database backend
+        claimed = GradingJob.objects.filter(id=job_id, state='queued').update(
+            state='running',
+            worker=worker_name,
+            started_at=timezone.now(),
+            attempts=F('attempts') + 1
+        )
+        if claimed:
+            return GradingJob.objects.select_related('submission__challenge').get(id=job_id)
+    return None
+
+
+def run_job(job):
+    """Execute a claimed job and record its result"""
+    execution_result = execute_python_code(job.code, job.submission.challenge.execution_limits())
+
+    with transaction.atomic():
+        submission = Submission.objects.select_for_update().select_related('challenge').get(
+            pk=job.submission_id
+        )
+        if submission.grading_jobs.filter(id__gt=job.id).exists():
+            # The student submitted again while this job was running
+            job.state = 'superseded'
+        else:
+            record_result(submission, execution_result)
+            job.state = 'done'
+        job.error = execution_result.get('error') or ''
+        job.finished_at = timezone.now()
+        job.save(update_fields=['state', 'error', 'finished_at'])
+
+
+def requeue_stale_jobs():
+    """Give jobs from graders that died mid-run back to the queue"""
+    lease = getattr(settings, 'GRADING_JOB_LEASE', 60)
+    max_attempts = getattr(settings, 'GRADING_JOB_MAX_ATTEMPTS', 3)
+    stale = GradingJob.objects.filter(
+        state='running',
+        started_at__lt=timezone.now() - timedelta(seconds=lease)
+    )
+
+    exhausted = stale.filter(attempts__gte=max_attempts)
+    Submission.objects.filter(
+        grading_jobs__in=exhausted,
+        status='pending'
+    ).update(status='error', output='Grading failed, please submit again.')
+    exhausted.update(
+        state='failed',
+        error='Grading was abandoned too many times',
+        finished_at=timezone.now()
+    )
+    return stale.update(state='queued', worker='')
+
+
+def run_grader(worker_name, poll_interval=1.0, once=False):
+    """Process jobs until stopped, or until the queue is empty if once is set"""
+    processed = 0
+    while True:
+        job = claim_job(worker_name)
+        if job is None:
+            if requeue_stale_jobs():
+                continue
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        try:
+            run_job(job)
+        except Exception as e:
+            GradingJob.objects.filter(pk=job.pk).update(
+                state='failed',
+                error=str(e),
+                finished_at=timezone.now()
+            )
+            Submission.objects.filter(pk=job.submission_id, status='pending').update(status='error')
+        processed += 1
+
+
+def job_status(job):
+    """Describe a job in the shape the submit endpoint returns"""
+    data = {
+        'job_id': job.id,
+        'state': job.state,
+    }
+    if job.state in FINISHED_STATES:
+        submission = job.submission
+        data.update({
+            'status': submission.status,
+            'output': submission.output or '',
+            'points_earned': submission.points_earned if submission.status == 'correct' else 0,
+            'error': job.error or '',
+            'error_kind': submission.error_kind or None,
+        })
+    return data
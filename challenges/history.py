@@ -0,0 +1,84 @@
+"""
+Append-only history of graded attempts.
+
+``Submission`` holds only a user's latest attempt at a challenge. Every graded
+run also adds an Attempt row, whose code and output are ContentBlob rows
+keyed by SHA-256, so the many identical programs students submit are stored
+once. The history queries below read only the Attempt indexes and never
+touch the blobs.
+"""
+import hashlib
+import zlib
+
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import Attempt, ContentBlob
+
+
+def digest_of(text):
+    return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def store_blobs(texts):
+    """Store texts that are not stored yet; return their digests in order"""
+    digests = [digest_of(text) for text in texts]
+    unique = dict(zip(digests, texts))
+    ContentBlob.objects.bulk_create(
+        [
+            ContentBlob(
+                digest=digest,
+                data=zlib.compress(text.encode('utf-8', 'surrogatepass')),
+                size=len(text.encode('utf-8', 'surrogatepass'))
+            )
+            for digest, text in unique.items()
+        ],
+        ignore_conflicts=True
+    )
+    return digests
+
+
+def record_attempts(submissions):
+    """Add an Attempt for each freshly graded submission, in two queries"""
+    if not submissions:
+        return
+    texts = []
+    for submission in submissions:
+        texts += [submission.submitted_code, submission.output or '']
+    digests = store_blobs(texts)
+    now = timezone.now()
+    Attempt.objects.bulk_create([
+        Attempt(
+            user_id=submission.user_id,
+            challenge_id=submission.challenge_id,
+            created_at=now,
+            status=submission.status,
+            points_earned=submission.points_earned,
+            error_kind=submission.error_kind,
+            code_id=digests[2 * i],
+            output_id=digests[2 * i + 1]
+        )
+        for i, submission in enumerate(submissions)
+    ])
+
+
+def attempts_of(user, challenge):
+    """A user's attempts at a challenge, newest first, with code and output loaded"""
+    return Attempt.objects.filter(user=user, challenge=challenge).select_related('code', 'output')
+
+
+def attempt_counts(challenge_ids):
+    """{challenge id: (attempts, distinct users)} for the given challenges"""
+    rows = Attempt.objects.filter(challenge_id__in=challenge_ids).order_by().values('challenge_id').annotate(
+        attempts=Count('id'),
+        users=Count('user_id', distinct=True)
+    )
+    return {row['challenge_id']: (row['attempts'], row['users']) for row in rows}
+
+
+def time_to_solve(challenge):
+    """{user id: time from first attempt to first correct one} for users who solved the challenge"""
+    attempts = Attempt.objects.filter(challenge=challenge).order_by()
+    first = dict(attempts.values('user_id').annotate(at=Min('created_at')).values_list('user_id', 'at'))
+    solved = attempts.filter(status='correct').values('user_id').annotate(at=Min('created_at')).values_list('user_id', 'at')
+    return {user_id: solved_at - first[user_id] for user_id, solved_at in solved}
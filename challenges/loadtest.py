@@ -0,0 +1,236 @@
+"""
+HTTP load test for the grading paths, used by ``manage.py loadtest``.
+
+The project is served in-process by a threaded WSGI server on a free local
+port and driven over real HTTP by a pool of client threads. The server side
+counts the database queries of every request, the client side times it, and
+each scenario is summarised as throughput, latency percentiles and queries
+per request. Results are plain dicts so they can be written as JSON and
+compared against an earlier run.
+"""
+import http.client
+import json
+import math
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from authentication.models import CustomUser
+from challenges.models import Week, Challenge
+
+SCENARIO_HEADER = 'HTTP_X_LOADTEST_SCENARIO'
+
+SAMPLE_PROGRAM = 'print(sum(n * n for n in range(100)))'
+
+
+def seed(users=50, weeks=4, challenges_per_week=5):
+    """Create an admin, students and current/past weeks of challenges"""
+    admin = CustomUser.objects.create_superuser('loadtest-admin', 'admin@example.com', get_random_string(20))
+    students = CustomUser.objects.bulk_create([
+        CustomUser(username=f'loadtest-{i}', email=f'loadtest-{i}@example.com') for i in range(users)
+    ])
+    today = date.today()
+    challenges = []
+    for number in range(1, weeks + 1):
+        start = today - timedelta(days=7 * (weeks - number))
+        week = Week.objects.create(
+            week_number=number,
+            title=f'Week {number}',
+            description='Load test week',
+            start_date=start - timedelta(days=1),
+            end_date=start + timedelta(days=5)
+        )
+        for order in range(1, challenges_per_week + 1):
+            challenges.append(Challenge(
+                week=week,
+                title=f'Challenge {number}.{order}',
+                description='Print the number',
+                buggy_code=f'print({number * 100 + order} + 1)',
+                expected_output=str(number * 100 + order),
+                points=order,
+                order=order,
+                created_by=admin
+            ))
+    Challenge.objects.bulk_create(challenges)
+    return admin, students
+
+
+def session_cookie(user):
+    """Log a user in without going through the login form"""
+    client = Client()
+    client.force_login(user)
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class CountingApp:
+    """WSGI wrapper recording how many queries each scenario's requests run"""
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.queries = {}
+
+    def __call__(self, environ, start_response):
+        count = [0]
+
+        def counter(execute, sql, params, many, context):
+            count[0] += 1
+            return execute(sql, params, many, context)
+
+        # Each request runs in its own server thread with its own connection
+        with connection.execute_wrapper(counter):
+            response = self.app(environ, start_response)
+        scenario = environ.get(SCENARIO_HEADER)
+        if scenario:
+            with self.lock:
+                self.queries.setdefault(scenario, []).append(count[0])
+        return response
+
+
+class Server:
+    """The project served on 127.0.0.1 from a background thread"""
+
+    def __init__(self):
+        self.app = CountingApp(WSGIHandler())
+        self.httpd = ThreadedWSGIServer(('127.0.0.1', 0), _QuietHandler, allow_reuse_address=True)
+        self.httpd.daemon_threads = True
+        self.httpd.set_app(self.app)
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def build_scenarios(admin, students):
+    """Return {name: request factory}; a factory takes a request index and returns (method, path, body, user)"""
+    week = Week.objects.order_by('-week_number').first()
+    challenges = list(week.challenges.order_by('order'))
+
+    def execute(i):
+        return 'POST', reverse('challenges:execute_code'), {'code': SAMPLE_PROGRAM}, students[i % len(students)]
+
+    def submit(i):
+        challenge = challenges[i % len(challenges)]
+        # Alternate correct and wrong answers so grades keep changing
+        answer = challenge.expected_output if i % 2 else 'wrong'
+        return 'POST', reverse('challenges:submit_solution', args=[challenge.id]), {'code': f'print({answer!r})'}, students[i % len(students)]
+
+    def week_page(i):
+        return 'GET', reverse('challenges:week_challenges', args=[week.week_number]), None, students[i % len(students)]
+
+    def challenge_page(i):
+        challenge = challenges[i % len(challenges)]
+        return 'GET', reverse('challenges:challenge_detail', args=[challenge.id]), None, students[i % len(students)]
+
+    def user_dashboard(i):
+        return 'GET', reverse('dashboard:user_dashboard'), None, students[i % len(students)]
+
+    def admin_dashboard(i):
+        return 'GET', reverse('dashboard:admin_dashboard'), None, admin
+
+    return {
+        'execute_code': execute,
+        'submit_solution': submit,
+        'week_challenges': week_page,
+        'challenge_detail': challenge_page,
+        'user_dashboard': user_dashboard,
+        'admin_dashboard': admin_dashboard,
+    }
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, math.ceil(fraction * len(samples)) - 1))
+    return samples[index]
+
+
+def run_scenario(server, name, factory, requests, concurrency, cookies):
+    """Send requests for one scenario and summarise them"""
+    csrf_token = get_random_string(32)
+
+    def send(i):
+        method, path, body, user = factory(i)
+        headers = {
+            'Cookie': f'{settings.SESSION_COOKIE_NAME}={cookies[user.pk]}; {settings.CSRF_COOKIE_NAME}={csrf_token}',
+            'X-CSRFToken': csrf_token,
+            'X-Loadtest-Scenario': name,
+        }
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        started = time.perf_counter()
+        client = http.client.HTTPConnection('127.0.0.1', server.port, timeout=60)
+        try:
+            client.request(method, path, body=payload, headers=headers)
+            response = client.getresponse()
+            response.read()
+            status = response.status
+        except OSError:
+            status = 0
+        finally:
+            client.close()
+        return (time.perf_counter() - started) * 1000, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    queries = server.app.queries.pop(name, [])
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': sum(1 for _, status in results if not 200 <= status < 400),
+        'throughput': requests / elapsed if elapsed else 0.0,
+        'mean_ms': statistics.mean(latencies),
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'queries_per_request': statistics.mean(queries) if queries else 0.0,
+        'max_queries': max(queries, default=0),
+    }
+
+
+def find_regressions(results, baseline, tolerance=0.2):
+    """Compare scenario results against a baseline run; return descriptions of what got worse"""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        if current['queries_per_request'] > previous['queries_per_request'] + 0.5:
+            regressions.append(
+                f"{name}: {current['queries_per_request']:.1f} queries/request, was {previous['queries_per_request']:.1f}"
+            )
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']:.1f} ms, was {previous['p95_ms']:.1f} ms")
+        if current['throughput'] < previous['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: {current['throughput']:.1f} req/s, was {previous['throughput']:.1f} req/s")
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{name}: {current['errors']} errors, was {previous['errors']}")
+    return regressions
@@ -0,0 +1,150 @@
+import asyncio
+import importlib
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import clear_url_caches, reverse
+
+from challenges import loadtest, urls as challenge_urls
+from challenges.executor import reset_executor
+from challenges.models import Challenge
+
+# Spends its time waiting, like most programs students run, so the test
+# measures how many runs a process can supervise rather than CPU
+WAITING_PROGRAM = 'import time\ntime.sleep({seconds})\nprint("done")'
+
+
+def use_views(async_views):
+    """Point the Run and Submit URLs at the sync or async views"""
+    with override_settings(ASYNC_EXECUTION_VIEWS=async_views):
+        importlib.reload(challenge_urls)
+    clear_url_caches()
+
+
+class Command(BaseCommand):
+    help = (
+        'Run and Submit the same waiting program at high concurrency through the WSGI handler with '
+        'sync views on a thread pool and through the ASGI handler with async views on one event loop. '
+        'Run with --settings=code_debugging_app.bench_settings'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario and mode')
+        parser.add_argument('--concurrency', type=int, default=100, help='Requests in flight at once')
+        parser.add_argument('--threads', type=int, default=32, help='WSGI worker threads, as in gunicorn --threads')
+        parser.add_argument('--seconds', type=float, default=0.5, help='How long each program waits')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The benchmark recreates its database; run it with --settings=code_debugging_app.bench_settings')
+
+        database = connection.settings_dict['NAME']
+        connection.close()
+        if os.path.exists(database):
+            os.remove(database)
+        call_command('migrate', verbosity=0)
+        _, students = loadtest.seed(options['concurrency'], 1, 5)
+        challenge = Challenge.objects.order_by('id').first()
+
+        code = WAITING_PROGRAM.format(seconds=options['seconds'])
+        scenarios = {
+            'execute_code': (reverse('challenges:execute_code'), {'code': code}),
+            'submit_solution': (reverse('challenges:submit_solution', args=[challenge.id]), {'code': code}),
+        }
+        overrides = {
+            # The host name the test clients send
+            'ALLOWED_HOSTS': ['testserver'],
+            'CODE_EXECUTION_BACKEND': 'subprocess',
+            'EXECUTION_MAX_IN_FLIGHT': options['concurrency'],
+            'CODE_EXECUTION_ASYNC_MAX_CHILDREN': options['concurrency'],
+        }
+
+        self.stdout.write(
+            f'{"scenario":<16} {"mode":<5} {"req/s":>7} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"in flight":>9} {"peak threads":>12} {"errors":>6}'
+        )
+        try:
+            with override_settings(**overrides):
+                for name, (path, body) in scenarios.items():
+                    for mode in ('wsgi', 'asgi'):
+                        reset_executor()
+                        use_views(mode == 'asgi')
+                        run = self.run_asgi if mode == 'asgi' else self.run_wsgi
+                        self.stdout.write(self.report(name, mode, run(path, body, students, options)))
+        finally:
+            use_views(False)
+
+    def run_wsgi(self, path, body, students, options):
+        clients = {}
+        for user in students:
+            clients[user.pk] = Client()
+            clients[user.pk].force_login(user)
+
+        def request(i):
+            started = time.perf_counter()
+            response = clients[students[i % len(students)].pk].post(path, data=body, content_type='application/json')
+            return time.perf_counter() - started, response.status_code
+
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            return self.measure(lambda: list(pool.map(request, range(options['requests']))))
+
+    def run_asgi(self, path, body, students, options):
+        clients = {}
+        for user in students:
+            client = Client()
+            client.force_login(user)
+            clients[user.pk] = AsyncClient()
+            clients[user.pk].cookies = client.cookies
+
+        async def request(i, gate):
+            async with gate:
+                started = time.perf_counter()
+                # As the ASGI handler does, so each request's ORM calls share a thread
+                async with ThreadSensitiveContext():
+                    response = await clients[students[i % len(students)].pk].post(
+                        path, data=body, content_type='application/json'
+                    )
+                return time.perf_counter() - started, response.status_code
+
+        async def run_all():
+            gate = asyncio.Semaphore(options['concurrency'])
+            return await asyncio.gather(*(request(i, gate) for i in range(options['requests'])))
+
+        return self.measure(lambda: asyncio.run(run_all()))
+
+    def measure(self, run):
+        peak = [threading.active_count()]
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(0.01):
+                peak[0] = max(peak[0], threading.active_count())
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            results = run()
+        finally:
+            done.set()
+            sampler.join()
+        return time.perf_counter() - started, results, peak[0]
+
+    def report(self, name, mode, measured):
+        elapsed, results, peak_threads = measured
+        latencies = sorted(seconds * 1000 for seconds, _ in results)
+        errors = sum(1 for _, status in results if status != 200)
+        return (
+            f'{name:<16} {mode:<5} {len(results) / elapsed:7.1f} {statistics.median(latencies):8.1f} '
+            f'{latencies[int(len(latencies) * 0.95) - 1]:8.1f} {sum(latencies) / 1000 / elapsed:9.1f} '
+            f'{peak_threads:>12} {errors:>6}'
+        )
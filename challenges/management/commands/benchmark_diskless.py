@@ -0,0 +1,93 @@
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from challenges.executor import SubprocessExecutor, build_result, timeout_result
+from .benchmark_executor import SAMPLE_PROGRAM
+
+# Audit events that touch the filesystem from the web process
+FILESYSTEM_EVENTS = {
+    'open', 'os.remove', 'os.mkdir', 'os.rmdir', 'os.scandir', 'os.listdir',
+    'os.chmod', 'os.rename', 'shutil.rmtree', 'tempfile.mkstemp', 'tempfile.mkdtemp',
+}
+
+
+class TempFileExecutor:
+    """The previous write/run/unlink path, kept only as a baseline"""
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+
+    def execute(self, code):
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
+            f.write(code)
+            temp_file = f.name
+        try:
+            result = subprocess.run(
+                [sys.executable, temp_file],
+                capture_output=True,
+                text=True,
+                timeout=self.timeout,
+                cwd=tempfile.gettempdir()
+            )
+            return build_result(result.stdout, result.stderr, result.returncode)
+        except subprocess.TimeoutExpired:
+            return timeout_result(self.timeout)
+        finally:
+            os.unlink(temp_file)
+
+
+class Command(BaseCommand):
+    help = 'Compare latency and filesystem operations of the temp-file and piped execution paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=100, help='Programs to run per path')
+
+    def handle(self, *args, **options):
+        runs = options['runs']
+        paths = [('temp file', TempFileExecutor()), ('piped', SubprocessExecutor())]
+        self.events = {name: Counter() for name, _ in paths}
+        self.current = None
+        sys.addaudithook(self._audit)
+
+        timings = {name: [] for name, _ in paths}
+        for name, executor in paths:
+            executor.execute(SAMPLE_PROGRAM)
+        # Alternate the paths so load changes on the machine hit both equally
+        for _ in range(runs):
+            for name, executor in paths:
+                self.current = name
+                started = time.perf_counter()
+                executor.execute(SAMPLE_PROGRAM)
+                timings[name].append((time.perf_counter() - started) * 1000)
+                self.current = None
+
+        for name, _ in paths:
+            samples = sorted(timings[name])
+            events = self.events[name]
+            breakdown = ', '.join(f'{event} {count / runs:g}' for event, count in sorted(events.items()))
+            self.stdout.write(
+                f'{name:<10} mean {statistics.mean(samples):7.2f} ms  '
+                f'p50 {samples[len(samples) // 2]:7.2f} ms  '
+                f'p95 {samples[int(len(samples) * 0.95) - 1]:7.2f} ms  '
+                f'fs ops/run {sum(events.values()) / runs:4.1f} ({breakdown or "none"})'
+            )
+
+        self.stdout.write(
+            'fs ops are counted in the web process only; the temp-file path also '
+            'makes the child open and read the script from disk.'
+        )
+
+    def _audit(self, event, args):
+        if self.current is None or event not in FILESYSTEM_EVENTS:
+            return
+        if event == 'open' and not isinstance(args[0], (str, bytes)):
+            # Wrapping an existing descriptor (e.g. a pipe) is not disk I/O
+            return
+        self.events[self.current][event] += 1
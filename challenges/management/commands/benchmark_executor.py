@@ -0,0 +1,52 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from challenges.executor import SubprocessExecutor, WorkerPoolExecutor
+
+SAMPLE_PROGRAM = '''
+def total(numbers):
+    return sum(n * n for n in numbers)
+
+print(total(range(100)))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Compare runs/sec of the spawn-per-run and warm pool execution backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=200, help='Programs to run per backend')
+        parser.add_argument('--concurrency', type=int, default=4, help='Parallel callers')
+        parser.add_argument('--pool-size', type=int, default=4, help='Warm interpreters in the pool')
+        parser.add_argument('--max-runs', type=int, default=100, help='Runs before a warm interpreter is recycled')
+
+    def handle(self, *args, **options):
+        backends = [
+            ('subprocess', SubprocessExecutor()),
+            ('pool', WorkerPoolExecutor(size=options['pool_size'], max_runs=options['max_runs'])),
+        ]
+        rates = {}
+        for name, executor in backends:
+            # One warm-up run so pool start-up is not counted
+            executor.execute(SAMPLE_PROGRAM)
+            rates[name] = self._measure(executor, options['runs'], options['concurrency'])
+            executor.close()
+            self.stdout.write(f'{name:<12} {rates[name]:8.1f} runs/sec')
+
+        if rates['subprocess']:
+            self.stdout.write(self.style.SUCCESS(
+                f"pool speed-up: {rates['pool'] / rates['subprocess']:.1f}x"
+            ))
+
+    def _measure(self, executor, runs, concurrency):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as threads:
+            results = list(threads.map(lambda _: executor.execute(SAMPLE_PROGRAM), range(runs)))
+        elapsed = time.perf_counter() - started
+
+        failures = [r for r in results if r['error']]
+        if failures:
+            self.stderr.write(f'{len(failures)} runs failed, e.g. {failures[0]["error"]}')
+        return runs / elapsed if elapsed else 0.0
@@ -0,0 +1,88 @@
+import json
+import os
+import platform
+import sys
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from challenges import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test the main pages and grading endpoints over HTTP on a fresh SQLite database. '
+        'Run with --settings=code_debugging_app.bench_settings'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+        parser.add_argument('--concurrency', type=int, default=8, help='Parallel clients')
+        parser.add_argument('--users', type=int, default=50, help='Students to seed')
+        parser.add_argument('--weeks', type=int, default=4, help='Weeks to seed')
+        parser.add_argument('--challenges', type=int, default=5, help='Challenges per week')
+        parser.add_argument('--scenario', action='append', help='Only run these scenarios (repeatable)')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--baseline', help='Fail if results regress against this earlier JSON result')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed latency/throughput change vs the baseline')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The load test recreates its database; run it with --settings=code_debugging_app.bench_settings')
+
+        # Start from an empty database every time so runs are comparable
+        database = connection.settings_dict['NAME']
+        connection.close()
+        if os.path.exists(database):
+            os.remove(database)
+        call_command('migrate', verbosity=0)
+        admin, students = loadtest.seed(options['users'], options['weeks'], options['challenges'])
+        cookies = {user.pk: loadtest.session_cookie(user) for user in [admin] + students}
+
+        scenarios = loadtest.build_scenarios(admin, students)
+        selected = options['scenario'] or list(scenarios)
+        unknown = set(selected) - set(scenarios)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}; choose from {", ".join(scenarios)}')
+
+        results = {
+            'created_at': timezone.now().isoformat(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'options': dict(
+                {name: options[name] for name in ('requests', 'concurrency', 'users', 'weeks', 'challenges')},
+                scenarios=selected
+            ),
+            'scenarios': {},
+        }
+        self.stdout.write(f'{"scenario":<18} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8} {"errors":>7}')
+        with loadtest.Server() as server:
+            for name in selected:
+                # A few unmeasured requests warm caches and the executor
+                loadtest.run_scenario(server, name, scenarios[name], min(10, options['requests']), options['concurrency'], cookies)
+                summary = loadtest.run_scenario(
+                    server, name, scenarios[name], options['requests'], options['concurrency'], cookies
+                )
+                results['scenarios'][name] = summary
+                self.stdout.write(
+                    f'{name:<18} {summary["throughput"]:8.1f} {summary["p50_ms"]:8.1f} {summary["p95_ms"]:8.1f} '
+                    f'{summary["p99_ms"]:8.1f} {summary["queries_per_request"]:8.1f} {summary["errors"]:7d}'
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            if baseline.get('options') != results['options']:
+                # Seeding and first visits depend on these, so numbers may not line up
+                self.stderr.write('Warning: the baseline was run with different options')
+            regressions = loadtest.find_regressions(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
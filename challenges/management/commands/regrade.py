@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from challenges.models import Challenge, Week, RegradeRun
+from challenges.regrade import regrade, claim_queued_run
+
+
+class Command(BaseCommand):
+    help = 'Re-run stored submissions and update grades, progress and scores'
+
+    def add_arguments(self, parser):
+        scope = parser.add_mutually_exclusive_group(required=True)
+        scope.add_argument('--challenge', type=int, help='Regrade one challenge by id')
+        scope.add_argument('--week', type=int, help='Regrade every challenge of a week number')
+        scope.add_argument('--all', action='store_true', help='Regrade every submission')
+        scope.add_argument('--resume', type=int, metavar='RUN_ID', help='Continue an interrupted run')
+        scope.add_argument('--queued', action='store_true', help='Process runs queued from the admin')
+        parser.add_argument('--processes', type=int, default=4, help='Warm interpreters to run programs in')
+        parser.add_argument('--batch-size', type=int, default=500, help='Submissions per checkpoint')
+
+    def handle(self, *args, **options):
+        if options['queued']:
+            runs = iter(claim_queued_run, None)
+        elif options['resume'] is not None:
+            try:
+                run = RegradeRun.objects.get(id=options['resume'])
+            except RegradeRun.DoesNotExist:
+                raise CommandError(f'No regrade run {options["resume"]}')
+            if run.state == 'done':
+                raise CommandError(f'Regrade run {run.id} already finished')
+            runs = [run]
+        elif options['challenge'] is not None:
+            try:
+                runs = [RegradeRun.objects.create(challenge=Challenge.objects.get(id=options['challenge']))]
+            except Challenge.DoesNotExist:
+                raise CommandError(f'No challenge {options["challenge"]}')
+        elif options['week'] is not None:
+            try:
+                runs = [RegradeRun.objects.create(week=Week.objects.get(week_number=options['week']))]
+            except Week.DoesNotExist:
+                raise CommandError(f'No week {options["week"]}')
+        else:
+            runs = [RegradeRun.objects.create()]
+
+        for run in runs:
+            self.stdout.write(f'{run}: starting after submission {run.last_submission_id}')
+            try:
+                regrade(run, processes=options['processes'], batch_size=options['batch_size'], report=self._report)
+            except KeyboardInterrupt:
+                raise CommandError(f'Interrupted; continue with --resume {run.id}')
+            self.stdout.write(self.style.SUCCESS(
+                f'{run}: {run.processed} regraded, {run.changed} changed, {run.skipped} skipped'
+            ))
+
+    def _report(self, run, rate):
+        remaining = (run.total - run.processed) / rate if rate else 0
+        self.stdout.write(
+            f'  {run.processed}/{run.total} regraded, {run.changed} changed, '
+            f'{run.skipped} skipped, {rate:.0f}/s, ~{remaining:.0f}s left'
+        )
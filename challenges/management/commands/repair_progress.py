@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from challenges.models import UserProgress
+
+
+class Command(BaseCommand):
+    help = 'Recount every UserProgress row from submissions, repairing any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--week', type=int, help='Only repair this week number')
+
+    def handle(self, *args, **options):
+        rows = UserProgress.objects.select_related('user', 'week')
+        if options['week'] is not None:
+            rows = rows.filter(week__week_number=options['week'])
+
+        repaired = 0
+        for progress in rows.iterator():
+            before = (progress.challenges_completed, progress.total_challenges, progress.points_earned)
+            progress.update_progress()
+            if before != (progress.challenges_completed, progress.total_challenges, progress.points_earned):
+                repaired += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Repaired {repaired} progress rows'))
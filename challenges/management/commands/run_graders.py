@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+import socket
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from challenges.grading import run_grader
+
+
+def _grader_process(worker_name, poll_interval, once):
+    # Each process needs its own database connection
+    connections.close_all()
+    run_grader(worker_name, poll_interval=poll_interval, once=once)
+
+
+class Command(BaseCommand):
+    help = 'Run grader processes that work through queued submissions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Number of grader processes')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        base_name = f'{socket.gethostname()}:{os.getpid()}'
+        poll_interval = options['poll_interval']
+        once = options['once']
+
+        if options['processes'] <= 1:
+            processed = run_grader(base_name, poll_interval=poll_interval, once=once)
+            self.stdout.write(self.style.SUCCESS(f'Graded {processed} submissions'))
+            return
+
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=_grader_process,
+                args=(f'{base_name}/{index}', poll_interval, once)
+            )
+            for index in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Started {len(processes)} grader processes')
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('challenges', '0003_regrade_run'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challenge',
+            name='cpu_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='CPU seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='challenge',
+            name='file_size_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Largest file written, in MB', null=True),
+        ),
+        migrations.AddField(
+            model_name='challenge',
+            name='memory_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Address space in MB', null=True),
+        ),
+        migrations.AddField(
+            model_name='challenge',
+            name='open_files_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Open file descriptors', null=True),
+        ),
+        migrations.AddField(
+            model_name='challenge',
+            name='process_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Processes and threads', null=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='error_kind',
+            field=models.CharField(blank=True, choices=[('timeout', 'Timed out'), ('cpu_limit', 'CPU time limit exceeded'), ('memory_limit', 'Memory limit exceeded'), ('process_limit', 'Process limit exceeded'), ('open_files_limit', 'Open file limit exceeded'), ('file_size_limit', 'File size limit exceeded'), ('runtime_error', 'Runtime error'), ('internal', 'Execution error')], default='', max_length=20),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:09
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('challenges', '0005_output_limit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challenge',
+            name='comparison_mode',
+            field=models.CharField(choices=[('exact', 'Exact (ignoring surrounding whitespace)'), ('whitespace', 'Whitespace-normalized'), ('lines', 'Same lines in any order'), ('numeric', 'Numbers within tolerance')], default='exact', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='challenge',
+            name='tolerance',
+            field=models.FloatField(default=1e-06, help_text='Largest relative or absolute difference in numeric mode', validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('challenges', '0006_comparison_mode'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='submission',
+            name='error_kind',
+            field=models.CharField(blank=True, choices=[('timeout', 'Timed out'), ('cpu_limit', 'CPU time limit exceeded'), ('memory_limit', 'Memory limit exceeded'), ('process_limit', 'Process limit exceeded'), ('open_files_limit', 'Open file limit exceeded'), ('file_size_limit', 'File size limit exceeded'), ('output_limit', 'Output limit exceeded'), ('syntax_error', 'Syntax error'), ('runtime_error', 'Runtime error'), ('internal', 'Execution error')], default='', max_length=20),
+        ),
+    ]
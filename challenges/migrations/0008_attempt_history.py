@@ -0,0 +1,87 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import hashlib
+import zlib
+
+
+def backfill_attempts(apps, schema_editor):
+    """Start each graded submission's history with the attempt it currently holds"""
+    Submission = apps.get_model('challenges', 'Submission')
+    ContentBlob = apps.get_model('challenges', 'ContentBlob')
+    Attempt = apps.get_model('challenges', 'Attempt')
+
+    submissions = Submission.objects.exclude(status='pending').order_by('id')
+    last_id = 0
+    while True:
+        batch = list(submissions.filter(id__gt=last_id)[:1000])
+        if not batch:
+            break
+        blobs = {}
+
+        def store(text):
+            data = text.encode('utf-8', 'surrogatepass')
+            key = hashlib.sha256(data).hexdigest()
+            blobs[key] = data
+            return key
+
+        attempts = [
+            Attempt(
+                user_id=submission.user_id,
+                challenge_id=submission.challenge_id,
+                created_at=submission.submitted_at,
+                status=submission.status,
+                points_earned=submission.points_earned,
+                error_kind=submission.error_kind,
+                code_id=store(submission.submitted_code),
+                output_id=store(submission.output or '')
+            )
+            for submission in batch
+        ]
+        ContentBlob.objects.bulk_create(
+            [ContentBlob(digest=key, data=zlib.compress(data), size=len(data)) for key, data in blobs.items()],
+            ignore_conflicts=True
+        )
+        Attempt.objects.bulk_create(attempts)
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('challenges', '0007_syntax_error_kind'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('data', models.BinaryField()),
+                ('size', models.IntegerField(help_text='Length of the uncompressed UTF-8 text in bytes')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Attempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('correct', 'Correct'), ('incorrect', 'Incorrect'), ('error', 'Error')], max_length=10)),
+                ('points_earned', models.IntegerField(default=0)),
+                ('error_kind', models.CharField(blank=True, choices=[('timeout', 'Timed out'), ('cpu_limit', 'CPU time limit exceeded'), ('memory_limit', 'Memory limit exceeded'), ('process_limit', 'Process limit exceeded'), ('open_files_limit', 'Open file limit exceeded'), ('file_size_limit', 'File size limit exceeded'), ('output_limit', 'Output limit exceeded'), ('syntax_error', 'Syntax error'), ('runtime_error', 'Runtime error'), ('internal', 'Execution error')], default='', max_length=20)),
+                ('challenge', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='challenges.challenge')),
+                ('code', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='challenges.contentblob')),
+                ('output', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='challenges.contentblob')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'challenge', 'created_at', 'status'], name='attempt_user_history_idx'), models.Index(fields=['challenge', 'status', 'user', 'created_at'], name='attempt_challenge_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_attempts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('challenges', '0008_attempt_history'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['user', 'status', 'challenge'], name='submission_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['user', '-submitted_at'], name='submission_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['-submitted_at'], name='submission_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='week',
+            index=models.Index(fields=['start_date', 'end_date'], name='week_dates_idx'),
+        ),
+    ]
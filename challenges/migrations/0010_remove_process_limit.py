@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('challenges', '0009_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='challenge',
+            name='process_limit',
+        ),
+    ]
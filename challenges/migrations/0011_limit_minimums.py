@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:07
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('challenges', '0010_remove_process_limit'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='challenge',
+            name='cpu_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='CPU seconds', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='challenge',
+            name='file_size_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Largest file written, in MB', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='challenge',
+            name='memory_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Address space in MB', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='challenge',
+            name='open_files_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Open file descriptors', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
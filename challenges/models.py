@@ -1,6 +1,11 @@
+from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import F, Case, When, Value, FloatField
+from django.db.models.functions import Cast
 from django.conf import settings
-from datetime import date, timedelta
+from django.utils import timezone
+from django.utils.functional import cached_property
+import zlib
 
 class Week(models.Model):
     week_number = models.IntegerField(unique=True)
@@ -13,22 +18,34 @@ class Week(models.Model):
     
     class Meta:
         ordering = ['-week_number']
+        indexes = [
+            # Current-week lookup
+            models.Index(fields=['start_date', 'end_date'], name='week_dates_idx'),
+        ]
     
     def __str__(self):
         return f"Week {self.week_number}: {self.title}"
     
+    @cached_property
+    def phase(self):
+        """'past', 'current' or 'future', from the cached week schedule
+
+        Weeks that come from the schedule already have it set.
+        """
+        from .schedule import week_phase
+        return week_phase(self)
+    
     @property
     def is_current_week(self):
-        today = date.today()
-        return self.start_date <= today <= self.end_date
+        return self.phase == 'current'
     
     @property
     def is_past_week(self):
-        return date.today() > self.end_date
+        return self.phase == 'past'
     
     @property
     def is_future_week(self):
-        return date.today() < self.start_date
+        return self.phase == 'future'
 
 class Challenge(models.Model):
     DIFFICULTY_CHOICES = (
@@ -36,15 +53,28 @@ class Challenge(models.Model):
         ('medium', 'Medium'),
         ('hard', 'Hard'),
     )
+    COMPARISON_MODE_CHOICES = (
+        ('exact', 'Exact (ignoring surrounding whitespace)'),
+        ('whitespace', 'Whitespace-normalized'),
+        ('lines', 'Same lines in any order'),
+        ('numeric', 'Numbers within tolerance'),
+    )
     
     week = models.ForeignKey(Week, on_delete=models.CASCADE, related_name='challenges')
     title = models.CharField(max_length=200)
     description = models.TextField()
     buggy_code = models.TextField()
     expected_output = models.TextField()
+    comparison_mode = models.CharField(max_length=10, choices=COMPARISON_MODE_CHOICES, default='exact')
+    tolerance = models.FloatField(default=1e-6, validators=[MinValueValidator(0)], help_text='Largest relative or absolute difference in numeric mode')
     difficulty = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES, default='easy')
     points = models.IntegerField(default=1)
     order = models.IntegerField(default=0)
+    # Resource limits for runs of this challenge; blank uses the CODE_EXECUTION_*_LIMIT setting
+    cpu_limit = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)], help_text='CPU seconds')
+    memory_limit = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)], help_text='Address space in MB')
+    open_files_limit = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)], help_text='Open file descriptors')
+    file_size_limit = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)], help_text='Largest file written, in MB')
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -55,6 +85,15 @@ class Challenge(models.Model):
     
     def __str__(self):
         return f"{self.week} - {self.title}"
+    
+    def execution_limits(self):
+        """Limit overrides in the shape execute_python_code takes"""
+        return {
+            'cpu_seconds': self.cpu_limit,
+            'memory_mb': self.memory_limit,
+            'open_files': self.open_files_limit,
+            'file_size_mb': self.file_size_limit,
+        }
 
 class Submission(models.Model):
     STATUS_CHOICES = (
@@ -63,18 +102,40 @@ class Submission(models.Model):
         ('incorrect', 'Incorrect'),
         ('error', 'Error'),
     )
+    # Why the last run did not exit cleanly, as reported by the executor
+    ERROR_KIND_CHOICES = (
+        ('timeout', 'Timed out'),
+        ('cpu_limit', 'CPU time limit exceeded'),
+        ('memory_limit', 'Memory limit exceeded'),
+        ('process_limit', 'Process limit exceeded'),
+        ('open_files_limit', 'Open file limit exceeded'),
+        ('file_size_limit', 'File size limit exceeded'),
+        ('output_limit', 'Output limit exceeded'),
+        ('syntax_error', 'Syntax error'),
+        ('runtime_error', 'Runtime error'),
+        ('internal', 'Execution error'),
+    )
     
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     challenge = models.ForeignKey(Challenge, on_delete=models.CASCADE)
     submitted_code = models.TextField()
     output = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    error_kind = models.CharField(max_length=20, choices=ERROR_KIND_CHOICES, blank=True, default='')
     points_earned = models.IntegerField(default=0)
     submitted_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-submitted_at']
         unique_together = ['user', 'challenge']
+        indexes = [
+            # Progress counts and the week page's per-challenge status
+            models.Index(fields=['user', 'status', 'challenge'], name='submission_user_status_idx'),
+            # A user's recent submissions on their dashboard
+            models.Index(fields=['user', '-submitted_at'], name='submission_user_recent_idx'),
+            # Recent submissions on the admin dashboard
+            models.Index(fields=['-submitted_at'], name='submission_recent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.challenge.title} ({self.status})"
@@ -94,23 +155,186 @@ class UserProgress(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.week}"
     
-    def update_progress(self):
-        """Update progress based on submissions"""
-        completed_submissions = Submission.objects.filter(
-            user=self.user,
-            challenge__week=self.week,
-            status='correct'
-        ).count()
-        
-        total_challenges = self.week.challenges.count()
-        earned_points = Submission.objects.filter(
-            user=self.user,
-            challenge__week=self.week,
+    @staticmethod
+    def percentage_after(completed_delta=0, total_delta=0):
+        """SQL expression for completion_percentage once the deltas are applied"""
+        total = F('total_challenges') + total_delta
+        return Case(
+            When(total_challenges__gt=-total_delta, then=Cast(F('challenges_completed') + completed_delta, FloatField()) / total * 100),
+            default=Value(0.0),
+            output_field=FloatField()
+        )
+    
+    @classmethod
+    def apply_delta(cls, user_id, week_id, completed_delta, points_delta):
+        """Adjust progress in place when one of the user's submissions changes state
+
+        Returns False when there was no row yet and it was recounted instead.
+        """
+        updated = cls.objects.filter(user_id=user_id, week_id=week_id).update(
+            # Keep this first: MySQL applies SET clauses left to right, so it
+            # has to read challenges_completed before that column changes
+            completion_percentage=cls.percentage_after(completed_delta=completed_delta),
+            challenges_completed=F('challenges_completed') + completed_delta,
+            points_earned=F('points_earned') + points_delta,
+            last_updated=timezone.now()
+        )
+        if not updated:
+            # First submission this week: build the row from scratch
+            progress, created = cls.objects.get_or_create(
+                user_id=user_id,
+                week_id=week_id,
+                defaults=cls.count_progress(user_id, week_id)
+            )
+            if not created:
+                progress.update_progress()
+        return bool(updated)
+    
+    @classmethod
+    def count_challenge(cls, week_id, solved, delta):
+        """Add (delta=1) or take away (delta=-1) one challenge in every progress row of a week
+
+        solved maps the users who solved the challenge to the points it earned
+        them; their completed count and points move along with the total.
+        """
+        now = timezone.now()
+        cls.objects.filter(week_id=week_id).exclude(user_id__in=list(solved)).update(
+            # Keep this first: MySQL applies SET clauses left to right
+            completion_percentage=cls.percentage_after(total_delta=delta),
+            total_challenges=F('total_challenges') + delta,
+            last_updated=now
+        )
+        by_points = {}
+        for user_id, points in solved.items():
+            by_points.setdefault(points, []).append(user_id)
+        for points, user_ids in by_points.items():
+            cls.objects.filter(week_id=week_id, user_id__in=user_ids).update(
+                completion_percentage=cls.percentage_after(completed_delta=delta, total_delta=delta),
+                challenges_completed=F('challenges_completed') + delta,
+                total_challenges=F('total_challenges') + delta,
+                points_earned=F('points_earned') + delta * points,
+                last_updated=now
+            )
+    
+    @staticmethod
+    def count_progress(user_id, week_id):
+        """Progress fields for a user's week, counted from submissions"""
+        correct = Submission.objects.filter(
+            user_id=user_id,
+            challenge__week_id=week_id,
             status='correct'
-        ).aggregate(total=models.Sum('points_earned'))['total'] or 0
-        
-        self.challenges_completed = completed_submissions
-        self.total_challenges = total_challenges
-        self.points_earned = earned_points
-        self.completion_percentage = (completed_submissions / total_challenges * 100) if total_challenges > 0 else 0
+        ).aggregate(completed=models.Count('id'), points=models.Sum('points_earned'))
+        total_challenges = Challenge.objects.filter(week_id=week_id).count()
+        return {
+            'challenges_completed': correct['completed'],
+            'total_challenges': total_challenges,
+            'points_earned': correct['points'] or 0,
+            'completion_percentage': (correct['completed'] / total_challenges * 100) if total_challenges > 0 else 0,
+        }
+    
+    def update_progress(self):
+        """Recount progress from submissions; only needed to repair drifted rows"""
+        for field, value in self.count_progress(self.user_id, self.week_id).items():
+            setattr(self, field, value)
         self.save()
+
+
+class GradingJob(models.Model):
+    """A queued grading run for a pending Submission, stored in the database"""
+    STATE_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('superseded', 'Superseded'),
+        ('failed', 'Failed'),
+    )
+    
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='grading_jobs')
+    code = models.TextField()
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='queued')
+    error = models.TextField(blank=True, null=True)
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['state', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"Job {self.id} for {self.submission} ({self.state})"
+
+class RegradeRun(models.Model):
+    """A resumable re-run of stored submissions for a challenge, a week or everything"""
+    STATE_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    
+    challenge = models.ForeignKey(Challenge, on_delete=models.CASCADE, blank=True, null=True)
+    week = models.ForeignKey(Week, on_delete=models.CASCADE, blank=True, null=True)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='queued')
+    total = models.IntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    changed = models.IntegerField(default=0)
+    skipped = models.IntegerField(default=0)
+    # Submissions are regraded in id order; everything up to here is done
+    last_submission_id = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['-id']
+    
+    def __str__(self):
+        if self.challenge_id:
+            scope = f"challenge {self.challenge}"
+        elif self.week_id:
+            scope = f"week {self.week}"
+        else:
+            scope = "all challenges"
+        return f"Regrade {self.id} of {scope} ({self.state})"
+
+class ContentBlob(models.Model):
+    """A zlib-compressed text stored once, addressed by the SHA-256 of its content"""
+    digest = models.CharField(max_length=64, primary_key=True)
+    data = models.BinaryField()
+    size = models.IntegerField(help_text='Length of the uncompressed UTF-8 text in bytes')
+    
+    def __str__(self):
+        return f"{self.digest[:12]} ({self.size} bytes)"
+    
+    @property
+    def text(self):
+        return zlib.decompress(bytes(self.data)).decode('utf-8', 'surrogatepass')
+
+class Attempt(models.Model):
+    """One graded run of a student's code; never updated once written"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='attempts')
+    challenge = models.ForeignKey(Challenge, on_delete=models.CASCADE, related_name='attempts')
+    created_at = models.DateTimeField(default=timezone.now)
+    status = models.CharField(max_length=10, choices=Submission.STATUS_CHOICES)
+    points_earned = models.IntegerField(default=0)
+    error_kind = models.CharField(max_length=20, choices=Submission.ERROR_KIND_CHOICES, blank=True, default='')
+    code = models.ForeignKey(ContentBlob, on_delete=models.PROTECT, related_name='+')
+    output = models.ForeignKey(ContentBlob, on_delete=models.PROTECT, related_name='+')
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # A user's history of one challenge, and their time to solve it
+            models.Index(fields=['user', 'challenge', 'created_at', 'status'], name='attempt_user_history_idx'),
+            # Attempt counts and solve times across a challenge
+            models.Index(fields=['challenge', 'status', 'user', 'created_at'], name='attempt_challenge_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.challenge_id} at {self.created_at} ({self.status})"
@@ -0,0 +1,97 @@
+"""
+View models and fragment cache versions for the challenge pages.
+
+The week page's challenge grid and week navigation are cached per user with
+``{% cache %}``. Their keys include two version tokens kept in the default
+cache: one for the user, bumped whenever one of their submissions or progress
+rows is saved, and one for challenge content, bumped whenever a week or
+challenge changes. A bump makes every affected fragment miss without having to
+find and delete it.
+
+The challenge page caches its challenge-wide parts once per challenge and
+version (``Challenge.updated_at``) and answers revisits with a 304 when
+nothing it would show has changed (``challenge_page_etag``).
+"""
+import hashlib
+import uuid
+from functools import cached_property
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.middleware.csrf import get_token
+
+from .models import Submission, UserProgress
+
+CONTENT_VERSION_KEY = 'challenges:content-version'
+
+
+def user_version_key(user_id):
+    return f'challenges:user-version:{user_id}'
+
+
+def bump_content_version():
+    cache.set(CONTENT_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def bump_user_version(user_id):
+    cache.set(user_version_key(user_id), uuid.uuid4().hex, timeout=None)
+
+
+def fragment_versions(user_id):
+    """Return the (content, user) version tokens, creating any that are missing"""
+    keys = [CONTENT_VERSION_KEY, user_version_key(user_id)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = uuid.uuid4().hex
+            cache.set(key, versions[key], timeout=None)
+    return tuple(versions[key] for key in keys)
+
+
+class WeekPage:
+    """What the week page shows one user; each part is a single query, run on first use"""
+
+    def __init__(self, week, user):
+        self.week = week
+        self.user = user
+
+    @cached_property
+    def challenges(self):
+        """The week's challenges, with submission_status and submission_points for the user"""
+        challenges = self.week.challenges.order_by('order')
+        if not self.user.is_superuser:
+            submission = Submission.objects.filter(user=self.user, challenge=OuterRef('pk'))
+            challenges = challenges.annotate(
+                submission_status=Subquery(submission.values('status')[:1]),
+                submission_points=Subquery(submission.values('points_earned')[:1])
+            )
+        return list(challenges)
+
+    @cached_property
+    def progress_rows(self):
+        """The user's progress rows with their weeks, for the week navigation"""
+        return list(
+            UserProgress.objects.filter(user=self.user).select_related('week').order_by('week__week_number')
+        )
+
+
+def challenge_page_etag(request, challenge, submission):
+    """ETag of the challenge page as one user sees it
+
+    Covers the challenge and its week, the navbar's user details, the user's
+    submission, the CSRF secret behind the page's token and the deployed
+    static files.
+    """
+    user = request.user
+    # Makes sure the CSRF secret the page's token is based on exists already
+    get_token(request)
+    parts = [
+        challenge.pk, challenge.updated_at.isoformat(), challenge.week.week_number,
+        user.pk, user.get_full_name() or user.username, user.total_score, user.is_superuser,
+        request.META.get('CSRF_COOKIE', ''),
+        getattr(staticfiles_storage, 'manifest_hash', ''),
+    ]
+    if submission is not None:
+        parts += [submission.pk, submission.status, submission.points_earned, submission.submitted_code]
+    return hashlib.sha256('\0'.join(map(str, parts)).encode('utf-8', 'surrogatepass')).hexdigest()[:32]
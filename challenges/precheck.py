@@ -0,0 +1,76 @@
+"""
+Syntax check run in the web process before a program is executed.
+
+Code that does not parse fails the same way in every sandbox, so
+``execute_python_code`` answers it here without starting an interpreter. The
+error text is the one the sandbox would print, so the Run panel shows it
+unchanged. Results are kept in a small LRU keyed by a hash of the code.
+Programs longer than ``CODE_EXECUTION_PRECHECK_MAX_SIZE`` characters skip the
+check and are left to the sandbox.
+"""
+import ast
+import hashlib
+import threading
+import traceback
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .executor_worker import SCRIPT_NAME
+
+DEFAULT_MAX_SIZE = 100_000
+DEFAULT_CACHE_SIZE = 1024
+
+_results = OrderedDict()
+_lock = threading.Lock()
+
+
+def syntax_error_result(exc):
+    """Result dict for a program that does not parse, matching the sandbox's output"""
+    exc.filename = SCRIPT_NAME
+    return {
+        'output': '',
+        'error': ''.join(traceback.format_exception_only(type(exc), exc)),
+        'error_kind': 'syntax_error',
+        'syntax_error': {
+            'line': exc.lineno,
+            'column': exc.offset,
+            'message': exc.msg,
+        },
+    }
+
+
+def _parse(code):
+    try:
+        ast.parse(code, filename=SCRIPT_NAME)
+    except SyntaxError as e:
+        return syntax_error_result(e)
+    except (ValueError, RecursionError, MemoryError):
+        # Null bytes or absurd nesting: let the sandbox report it
+        return None
+    return None
+
+
+def check_syntax(code):
+    """Return the result of running code if it cannot parse, otherwise None"""
+    if len(code) > getattr(settings, 'CODE_EXECUTION_PRECHECK_MAX_SIZE', DEFAULT_MAX_SIZE):
+        return None
+
+    key = hashlib.sha256(code.encode('utf-8', 'surrogatepass')).digest()
+    with _lock:
+        if key in _results:
+            _results.move_to_end(key)
+            result = _results[key]
+            return dict(result) if result else None
+
+    result = _parse(code)
+    with _lock:
+        _results[key] = result
+        while len(_results) > getattr(settings, 'CODE_EXECUTION_PRECHECK_CACHE_SIZE', DEFAULT_CACHE_SIZE):
+            _results.popitem(last=False)
+    return dict(result) if result else None
+
+
+def clear_cache():
+    with _lock:
+        _results.clear()
@@ -0,0 +1,192 @@
+"""
+Bulk regrading of stored submissions.
+
+After an admin fixes a challenge's expected output or points, a RegradeRun
+re-executes the stored ``submitted_code`` of every graded submission in its
+scope. Runs go through the warm worker pool in id-ordered batches, and
+identical programs are executed only once. Each batch is written with
+``bulk_update`` and checkpointed on the run, so an interrupted run resumes
+where it stopped. At the end, progress, total scores and leaderboards for the
+scope are recomputed with set-based queries.
+
+A submission the student replaced, or that went back to pending, while its
+batch was running is left alone. So is one whose run failed for transient
+reasons such as a timeout under load.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Count, Sum, Case, When, Value, FloatField
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from authentication.backends import clear_user_cache
+from authentication.models import CustomUser
+from leaderboard import ranking
+from .executor import (
+    DEFAULT_OUTPUT_LIMIT, SubprocessExecutor, WorkerPoolExecutor, default_scratch_root, execution_limits
+)
+from .grading import check_output
+from .models import Challenge, Submission, UserProgress, RegradeRun
+from .result_cache import CachedExecutor, is_cacheable
+from .signals import submissions_bulk_updated
+
+
+def scope_submissions(run):
+    """The graded submissions a run covers"""
+    submissions = Submission.objects.exclude(status='pending')
+    if run.challenge_id:
+        submissions = submissions.filter(challenge_id=run.challenge_id)
+    elif run.week_id:
+        submissions = submissions.filter(challenge__week_id=run.week_id)
+    return submissions
+
+
+def create_regrade_executor(processes):
+    timeout = getattr(settings, 'CODE_EXECUTION_TIMEOUT', 10)
+    output_limit = getattr(settings, 'CODE_EXECUTION_OUTPUT_LIMIT', DEFAULT_OUTPUT_LIMIT)
+    if hasattr(os, 'fork'):
+        executor = WorkerPoolExecutor(
+            size=processes, timeout=timeout, scratch_root=default_scratch_root(), output_limit=output_limit
+        )
+    else:
+        executor = SubprocessExecutor(timeout=timeout, scratch_root=default_scratch_root(), output_limit=output_limit)
+    # Many students submit the same fix; run each distinct program once
+    return CachedExecutor(executor, max_entries=4096, ttl=24 * 60 * 60)
+
+
+def apply_batch(batch, results):
+    """Write changed grades for one batch; return (changed, skipped)"""
+    with transaction.atomic():
+        current = dict(
+            Submission.objects.select_for_update().filter(
+                id__in=[submission.id for submission in batch]
+            ).exclude(status='pending').values_list('id', 'submitted_code')
+        )
+        changed = []
+        skipped = 0
+        for submission, result in zip(batch, results):
+            if current.get(submission.id) != submission.submitted_code or not is_cacheable(result):
+                skipped += 1
+                continue
+            status = check_output(submission.challenge, result['output'])
+            points_earned = submission.challenge.points if status == 'correct' else 0
+            grade = (status, points_earned, result['output'], result.get('error_kind') or '')
+            if grade != (submission.status, submission.points_earned, submission.output, submission.error_kind):
+                submission.status, submission.points_earned, submission.output, submission.error_kind = grade
+                changed.append(submission)
+        Submission.objects.bulk_update(changed, ['status', 'points_earned', 'output', 'error_kind'], batch_size=500)
+    return len(changed), skipped
+
+
+def recompute_scores(submissions):
+    """Recount progress, total scores and leaderboards for everyone a queryset touches"""
+    week_ids = set(submissions.values_list('challenge__week_id', flat=True).distinct())
+    pairs = submissions.values_list('user_id', 'challenge__week_id').distinct()
+    UserProgress.objects.bulk_create(
+        [UserProgress(user_id=user_id, week_id=week_id) for user_id, week_id in pairs.iterator()],
+        ignore_conflicts=True,
+        batch_size=1000
+    )
+
+    correct = Submission.objects.filter(
+        user_id=OuterRef('user_id'),
+        challenge__week_id=OuterRef('week_id'),
+        status='correct'
+    ).order_by().values('user_id')
+    completed = Coalesce(Subquery(correct.annotate(value=Count('id')).values('value')), 0)
+    points = Coalesce(Subquery(correct.annotate(value=Sum('points_earned')).values('value')), 0)
+    total = Coalesce(Subquery(
+        Challenge.objects.filter(week_id=OuterRef('week_id')).order_by().values('week_id').annotate(
+            value=Count('id')
+        ).values('value')
+    ), 0)
+    UserProgress.objects.filter(week_id__in=week_ids).update(
+        challenges_completed=completed,
+        points_earned=points,
+        total_challenges=total,
+        completion_percentage=Case(
+            When(GreaterThan(total, 0), then=Cast(completed, FloatField()) / total * 100),
+            default=Value(0.0),
+            output_field=FloatField()
+        ),
+        last_updated=timezone.now()
+    )
+
+    CustomUser.objects.filter(pk__in=submissions.values('user_id')).update(
+        total_score=Coalesce(Subquery(
+            Submission.objects.filter(user_id=OuterRef('pk')).order_by().values('user_id').annotate(
+                value=Sum('points_earned')
+            ).values('value')
+        ), 0)
+    )
+
+    # Everything above bypassed signals
+    clear_user_cache()
+    ranking.rebuild(ranking.GLOBAL_BOARD)
+    for week_id in week_ids:
+        ranking.rebuild(ranking.week_board(week_id))
+    submissions_bulk_updated.send(sender=Submission, user_ids=None)
+
+
+def regrade(run, processes=4, batch_size=500, report=None):
+    """Run or resume a RegradeRun; report(run, rate) is called after every batch"""
+    submissions = scope_submissions(run)
+    run.state = 'running'
+    run.error = ''
+    run.started_at = run.started_at or timezone.now()
+    run.total = run.processed + submissions.filter(id__gt=run.last_submission_id).count()
+    run.save(update_fields=['state', 'error', 'started_at', 'total'])
+
+    executor = create_regrade_executor(processes)
+    try:
+        with ThreadPoolExecutor(max_workers=processes) as threads:
+            started = time.monotonic()
+            done_here = 0
+            while True:
+                batch = list(
+                    submissions.filter(id__gt=run.last_submission_id).select_related('challenge').order_by('id')[:batch_size]
+                )
+                if not batch:
+                    break
+                results = list(threads.map(
+                    executor.execute,
+                    [submission.submitted_code for submission in batch],
+                    [execution_limits(submission.challenge.execution_limits()) for submission in batch]
+                ))
+                changed, skipped = apply_batch(batch, results)
+
+                run.processed += len(batch)
+                run.changed += changed
+                run.skipped += skipped
+                run.last_submission_id = batch[-1].id
+                run.save(update_fields=['processed', 'changed', 'skipped', 'last_submission_id'])
+                done_here += len(batch)
+                if report:
+                    report(run, done_here / max(time.monotonic() - started, 1e-6))
+
+        recompute_scores(submissions)
+    except BaseException as e:
+        run.state = 'failed'
+        run.error = str(e) or type(e).__name__
+        run.save(update_fields=['state', 'error'])
+        raise
+    finally:
+        executor.close()
+
+    run.state = 'done'
+    run.finished_at = timezone.now()
+    run.save(update_fields=['state', 'finished_at'])
+    return run
+
+
+def claim_queued_run():
+    """Take the oldest queued run, as queued by the admin action"""
+    for run_id in RegradeRun.objects.filter(state='queued').order_by('id').values_list('id', flat=True):
+        if RegradeRun.objects.filter(id=run_id, state='queued').update(state='running'):
+            return RegradeRun.objects.get(id=run_id)
+    return None
@@ -0,0 +1,230 @@
+"""
+Content-addressed cache in front of the execution backend.
+
+Results are keyed by a hash of the interpreter version, the resource limits
+and the program text, kept in a bounded LRU with a TTL, and shared by
+identical requests that are in flight at the same time: the first caller
+runs the program and every concurrent caller with the same code waits for
+that one result.
+
+Programs that can print something different on every run (randomness,
+clocks, input, files, processes, and sets, whose order of strings changes
+with each interpreter's hash seed) are not cached unless
+``CODE_EXECUTION_CACHE_NONDETERMINISTIC`` is set.
+"""
+import ast
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from .executor import SPAWNS_AVOIDED
+
+NONDETERMINISTIC_MODULES = {
+    'asyncio', 'datetime', 'glob', 'importlib', 'multiprocessing', 'os', 'pathlib',
+    'random', 'secrets', 'shutil', 'socket', 'subprocess', 'tempfile', 'threading',
+    'time', 'urllib', 'uuid',
+}
+# set() and frozenset() iterate in hash order, which PYTHONHASHSEED varies per process
+NONDETERMINISTIC_CALLS = {'__import__', 'frozenset', 'hash', 'id', 'input', 'open', 'set'}
+
+# Prefixes of errors caused by the environment rather than by the program
+TRANSIENT_ERRORS = ('Code execution timed out', 'Execution error:')
+
+INTERPRETER_TAG = f'{sys.implementation.cache_tag}\0{sys.version}'
+
+
+def is_deterministic(code):
+    """Best-effort check that a program prints the same thing on every run"""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        # Always fails the same way
+        return True
+    except (RecursionError, MemoryError):
+        # Too deeply nested to inspect here; run it without caching
+        return False
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Set, ast.SetComp)):
+            return False
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            modules = [node.module or '']
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            if node.func.id in NONDETERMINISTIC_CALLS:
+                return False
+            continue
+        else:
+            continue
+        if any(name.split('.')[0] in NONDETERMINISTIC_MODULES for name in modules):
+            return False
+    return True
+
+
+def is_cacheable(result):
+    error = result.get('error') or ''
+    return not error.startswith(TRANSIENT_ERRORS)
+
+
+class _Flight:
+    """One execution that concurrent identical requests are waiting on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class CachedExecutor:
+    """Wrap an executor with an LRU/TTL result cache and request coalescing"""
+
+    def __init__(self, executor, max_entries=1024, ttl=300, cache_nondeterministic=False):
+        self.executor = executor
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_nondeterministic = cache_nondeterministic
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key_for(code, limits=None):
+        limits = ','.join(f'{name}={value}' for name, value in sorted((limits or {}).items()))
+        return hashlib.sha256(f'{INTERPRETER_TAG}\0{limits}\0{code}'.encode('utf-8', 'surrogatepass')).hexdigest()
+
+    def execute(self, code, limits=None):
+        if not self.cache_nondeterministic and not is_deterministic(code):
+            with self._lock:
+                self.bypassed += 1
+            return self.executor.execute(code, limits)
+
+        key = self.key_for(code, limits)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    SPAWNS_AVOIDED.inc(reason='result_cache')
+                    return dict(result)
+                del self._entries[key]
+
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+                SPAWNS_AVOIDED.inc(reason='coalesced')
+
+        if not leader:
+            flight.done.wait()
+            return dict(flight.result)
+
+        result = None
+        try:
+            result = self.executor.execute(code, limits)
+        finally:
+            if result is None:
+                result = {'output': '', 'error': 'Execution error: execution was interrupted', 'error_kind': 'internal'}
+            flight.result = result
+            with self._lock:
+                del self._in_flight[key]
+                if is_cacheable(result):
+                    self._store(key, result)
+            flight.done.set()
+        return dict(result)
+
+    async def aexecute(self, code, limits=None):
+        """execute() for the event loop; results are shared but concurrent runs are not coalesced"""
+        key, result = self.cached(code, limits)
+        if result is not None:
+            return result
+        result = await self.executor.aexecute(code, limits)
+        self._keep(key, result)
+        return dict(result)
+
+    def stream(self, code, limits=None, live=True):
+        """Pass a streamed run through, keeping its result; a cached result is yielded on its own"""
+        key, result = self.cached(code, limits)
+        if result is not None:
+            yield 'result', result
+            return
+        for event, payload in self.executor.stream(code, limits, live):
+            if event == 'result':
+                self._keep(key, payload)
+                payload = dict(payload)
+            yield event, payload
+
+    async def astream(self, code, limits=None, live=True):
+        key, result = self.cached(code, limits)
+        if result is not None:
+            yield 'result', result
+            return
+        async for event, payload in self.executor.astream(code, limits, live):
+            if event == 'result':
+                self._keep(key, payload)
+                payload = dict(payload)
+            yield event, payload
+
+    def _keep(self, key, result):
+        if key is not None and is_cacheable(result):
+            with self._lock:
+                self.misses += 1
+                self._store(key, result)
+
+    def cached(self, code, limits=None):
+        """Return (key, stored result or None); key is None for programs that are never cached"""
+        if not self.cache_nondeterministic and not is_deterministic(code):
+            with self._lock:
+                self.bypassed += 1
+            return None, None
+        key = self.key_for(code, limits)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                SPAWNS_AVOIDED.inc(reason='result_cache')
+                return key, dict(entry[1])
+        return key, None
+
+    def _store(self, key, result):
+        self._entries[key] = (time.monotonic() + self.ttl, dict(result))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'bypassed': self.bypassed,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        self.clear()
+        self.executor.close()
@@ -0,0 +1,94 @@
+"""
+Which week is current, and which weeks are past or upcoming.
+
+The answer only changes on a week's start date, on the day after its end date,
+or when a Week is saved or deleted. The schedule is computed in one query and
+kept in the default cache until the next of those dates; ``challenges.signals``
+drops it when a Week changes. ``WEEK_SCHEDULE_MAX_AGE`` bounds how stale it can
+get through changes that bypass signals, such as queryset updates.
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Week
+
+CACHE_KEY = 'challenges:week-schedule'
+
+PAST = 'past'
+CURRENT = 'current'
+FUTURE = 'future'
+
+
+def phase_on(week, today):
+    if today < week.start_date:
+        return FUTURE
+    if today > week.end_date:
+        return PAST
+    return CURRENT
+
+
+def compute_schedule(today):
+    """Classify every week for today and find the first date that changes the answer"""
+    weeks = list(Week.objects.order_by('-week_number'))
+    phases = {week.pk: phase_on(week, today) for week in weeks}
+    for week in weeks:
+        # Weeks handed out by the schedule carry their phase, so listing
+        # them does not read the schedule again for each one
+        week.phase = phases[week.pk]
+    # Weeks may overlap; the one that started last is current
+    current = max(
+        (week for week in weeks if phases[week.pk] == CURRENT),
+        key=lambda week: week.start_date,
+        default=None
+    )
+    boundaries = [
+        day for week in weeks for day in (week.start_date, week.end_date + timedelta(days=1))
+        if day > today
+    ]
+    return {
+        'today': today,
+        'valid_until': min(boundaries, default=None),
+        'weeks': weeks,
+        'current': current,
+        'phases': phases,
+    }
+
+
+def get_schedule():
+    """Return the cached schedule, recomputing it once today has passed a boundary"""
+    today = date.today()
+    schedule = cache.get(CACHE_KEY)
+    if (
+        schedule is None
+        or schedule['today'] > today
+        or (schedule['valid_until'] is not None and today >= schedule['valid_until'])
+    ):
+        schedule = compute_schedule(today)
+        cache.set(CACHE_KEY, schedule, timeout=getattr(settings, 'WEEK_SCHEDULE_MAX_AGE', 3600))
+    return schedule
+
+
+def current_week():
+    """The week running today, or None"""
+    return get_schedule()['current']
+
+
+def all_weeks():
+    """Every week, newest first"""
+    return get_schedule()['weeks']
+
+
+def week_phase(week):
+    """PAST, CURRENT or FUTURE for the week today"""
+    schedule = get_schedule()
+    phase = schedule['phases'].get(week.pk)
+    if phase is None:
+        # Not saved yet, or saved since the schedule was read
+        phase = phase_on(week, schedule['today'])
+    return phase
+
+
+def clear_schedule():
+    cache.delete(CACHE_KEY)
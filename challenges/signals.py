@@ -0,0 +1,86 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from .models import Week, Challenge, Submission, UserProgress
+from .pages import bump_content_version, bump_user_version
+from .schedule import clear_schedule
+
+# Sent after Submissions were written in bulk, bypassing post_save. user_ids
+# lists whose submissions changed, or is None when it could be anyone's
+submissions_bulk_updated = Signal()
+
+
+def solvers(challenge):
+    """{user_id: points earned} for everyone with a correct submission for the challenge"""
+    return dict(
+        Submission.objects.filter(challenge=challenge, status='correct').values_list('user_id', 'points_earned')
+    )
+
+
+@receiver(pre_save, sender=Challenge)
+def remember_week(sender, instance, **kwargs):
+    """Note which week a saved challenge was in, in case it is moving"""
+    instance._previous_week_id = None
+    if instance.pk is not None:
+        instance._previous_week_id = (
+            Challenge.objects.filter(pk=instance.pk).values_list('week_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Challenge)
+def challenge_added(sender, instance, created, **kwargs):
+    """Count a new or moved challenge in every progress row for its week"""
+    if created:
+        UserProgress.count_challenge(instance.week_id, {}, 1)
+        return
+    previous_week_id = getattr(instance, '_previous_week_id', None)
+    if previous_week_id is not None and previous_week_id != instance.week_id:
+        solved = solvers(instance)
+        UserProgress.count_challenge(previous_week_id, solved, -1)
+        UserProgress.count_challenge(instance.week_id, solved, 1)
+
+
+@receiver(pre_delete, sender=Challenge)
+def remember_solvers(sender, instance, **kwargs):
+    # The submissions are deleted with the challenge, before post_delete
+    instance._solvers = solvers(instance)
+
+
+@receiver(post_delete, sender=Challenge)
+def challenge_removed(sender, instance, **kwargs):
+    """Take the challenge, and its solvers' points, out of the week's progress rows"""
+    UserProgress.count_challenge(instance.week_id, getattr(instance, '_solvers', {}), -1)
+
+
+@receiver(post_save, sender=Submission)
+@receiver(post_delete, sender=Submission)
+@receiver(post_save, sender=UserProgress)
+@receiver(post_delete, sender=UserProgress)
+def user_work_changed(sender, instance, **kwargs):
+    """Expire the user's cached week page fragments"""
+    bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=Week)
+@receiver(post_delete, sender=Week)
+@receiver(post_save, sender=Challenge)
+@receiver(post_delete, sender=Challenge)
+def content_changed(sender, **kwargs):
+    """Expire every cached week page fragment"""
+    bump_content_version()
+
+
+@receiver(post_save, sender=Week)
+@receiver(post_delete, sender=Week)
+def week_changed(sender, **kwargs):
+    """Recompute which week is current on next use"""
+    clear_schedule()
+
+
+@receiver(submissions_bulk_updated)
+def submissions_written_in_bulk(sender, user_ids, **kwargs):
+    if user_ids is None:
+        bump_content_version()
+    else:
+        for user_id in user_ids:
+            bump_user_version(user_id)
@@ -0,0 +1,85 @@
+"""
+Server-sent events for the streaming Run and Submit endpoints.
+
+A streamed run sends each piece of output as soon as the program writes it::
+
+    event: output
+    data: {"stream": "stdout", "text": "hello\\n"}
+
+and ends with one ``result`` event carrying the dict the JSON endpoints
+return. The browser reads the stream with ``fetch`` (``EventSource`` cannot
+POST), so the first line a program prints reaches the page while it is still
+running.
+
+The execution slot taken by admission control is held until the body has
+been sent: ``limit_executions`` would release it as soon as the view
+returned, before the program had even started.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+
+from . import admission
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'.encode('utf-8')
+
+
+def encode(event, payload):
+    if event == 'result':
+        return format_event('result', payload)
+    return format_event('output', {'stream': event, 'text': payload})
+
+
+def failure(error):
+    return format_event('result', {'output': '', 'error': str(error), 'error_kind': 'internal'})
+
+
+class EventStream:
+    """Response body for a streamed run; closing it stops the run and frees its slots"""
+
+    def __init__(self, events, slots):
+        self.events = events
+        self.slots = slots
+
+    def __iter__(self):
+        try:
+            for event, payload in self.events:
+                yield encode(event, payload)
+        except Exception as e:
+            yield failure(e)
+
+    def close(self):
+        try:
+            # Kills the program if the client went away before it finished
+            self.events.close()
+        finally:
+            admission.release(self.slots)
+
+
+class AsyncEventStream:
+    """EventStream for async views; slots are freed once the events are exhausted"""
+
+    def __init__(self, events, slots):
+        self.events = events
+        self.slots = slots
+
+    async def __aiter__(self):
+        try:
+            async for event, payload in self.events:
+                yield encode(event, payload)
+        except Exception as e:
+            yield failure(e)
+        finally:
+            await self.events.aclose()
+            await sync_to_async(admission.release, thread_sensitive=False)(self.slots)
+
+
+def event_stream_response(body):
+    response = StreamingHttpResponse(body, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stops nginx from buffering the events until the run is over
+    response['X-Accel-Buffering'] = 'no'
+    return response
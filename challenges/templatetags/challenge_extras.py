@@ -1,8 +0,0 @@
-from django import template
-
-register = template.Library()
-
-@register.filter
-def get_item(dictionary, key):
-    """Get an item from a dictionary using the key"""
-    return dictionary.get(key)
\ No newline at end of file
@@ -1,3 +1,1033 @@
-from django.test import TestCase
+from datetime import date, timedelta
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.urls import reverse
+
+from authentication.models import CustomUser
+from leaderboard import ranking
+from .comparison import ExpectedOutput
+from .executor import (
+    SPAWNS_AVOIDED, SubprocessExecutor, WorkerPoolExecutor, aexecute_python_code, execute_python_code, get_executor,
+    execution_limits, stream_python_code,
+)
+from .grading import grade_submission, run_grader
+from .loadtest import find_regressions, percentile
+from .regrade import regrade
+from .result_cache import CachedExecutor, is_deterministic
+from . import admission, async_views, history, schedule
+from .models import Week, Challenge, Submission, UserProgress, GradingJob, RegradeRun, ContentBlob
+
+
+class ExecutorBackendTests(SimpleTestCase):
+    """Both backends must honour the same {'output', 'error', 'error_kind'} contract"""
+
+    def setUp(self):
+        self.pool = WorkerPoolExecutor(size=2, max_runs=3, timeout=2)
+        self.addCleanup(self.pool.close)
+        self.backends = [SubprocessExecutor(timeout=2), self.pool]
+
+    def test_successful_run(self):
+        for executor in self.backends:
+            result = executor.execute('print("hello")')
+            self.assertEqual(result, {'output': 'hello\n', 'error': None, 'error_kind': None})
+
+    def test_exception_reports_traceback(self):
+        for executor in self.backends:
+            result = executor.execute('x = 1\nprint(x)\nraise ValueError("boom")')
+            self.assertEqual(result['output'], '1\n')
+            self.assertIn('ValueError: boom', result['error'])
+            self.assertIn('line 3', result['error'])
+
+    def test_exit_status(self):
+        for executor in self.backends:
+            self.assertEqual(executor.execute('import sys\nsys.exit(0)')['error'], None)
+            self.assertEqual(executor.execute('import sys\nsys.exit(3)')['error'], 'Code execution failed')
+            self.assertEqual(executor.execute('import sys\nsys.exit(3)')['error_kind'], 'runtime_error')
+
+    def test_timeout(self):
+        for executor in self.backends:
+            result = executor.execute('while True:\n    pass')
+            self.assertEqual(result['error'], 'Code execution timed out (2 seconds limit)')
+            self.assertEqual(result['error_kind'], 'timeout')
+
+    def test_output_is_bounded(self):
+        for executor in [SubprocessExecutor(timeout=5, output_limit=1000), WorkerPoolExecutor(size=1, timeout=5, output_limit=1000)]:
+            self.addCleanup(executor.close)
+            with self.subTest(executor=type(executor).__name__):
+                started = time.monotonic()
+                result = executor.execute('while True:\n    print("spam" * 100)')
+                self.assertLess(time.monotonic() - started, 4)
+                self.assertEqual(result['error_kind'], 'output_limit')
+                output, marker = result['output'].rsplit('\n[Output truncated', 1)
+                self.assertLessEqual(len(output.encode()), 1000)
+                self.assertTrue(output.startswith('spam'))
+                # Output up to the limit is kept as is
+                self.assertEqual(executor.execute('print("x" * 998)')['output'], 'x' * 998 + '\n')
+
+    def test_timeout_kills_processes_the_program_started(self):
+        marker = os.path.join(tempfile.mkdtemp(), 'alive')
+        self.addCleanup(shutil.rmtree, os.path.dirname(marker))
+        code = f'import os, time\nif os.fork() == 0:\n    time.sleep(2)\n    open({marker!r}, "w").close()\n    os._exit(0)\nwhile True:\n    pass'
+        for executor in [SubprocessExecutor(timeout=1), WorkerPoolExecutor(size=1, timeout=1)]:
+            self.addCleanup(executor.close)
+            with self.subTest(executor=type(executor).__name__):
+                self.assertEqual(executor.execute(code)['error_kind'], 'timeout')
+                time.sleep(1.5)
+                self.assertFalse(os.path.exists(marker))
+
+    def test_resource_limits(self):
+        programs = {
+            'cpu_limit': ({'cpu_seconds': 1}, 'while True:\n    pass'),
+            'memory_limit': ({'memory_mb': 256}, 'x = bytearray(512 * 1024 * 1024)'),
+            'open_files_limit': ({'open_files': 16}, "files = [open('f%d' % i, 'w') for i in range(32)]"),
+            'file_size_limit': ({'file_size_mb': 1}, "open('big', 'wb').write(b'x' * 2 * 1024 * 1024)"),
+        }
+        for executor in self.backends:
+            for kind, (limits, code) in programs.items():
+                with self.subTest(executor=type(executor).__name__, kind=kind):
+                    result = executor.execute(code, limits)
+                    self.assertEqual(result['error_kind'], kind)
+                    self.assertTrue(result['error'])
+
+    def test_threads_are_not_limited_per_run(self):
+        code = 'import threading\nthreads = [threading.Thread(target=len, args=("",)) for _ in range(100)]\n' \
+               '[t.start() for t in threads]\n[t.join() for t in threads]\nprint("ok")'
+        for executor in self.backends:
+            self.assertEqual(executor.execute(code, execution_limits())['output'], 'ok\n')
+
+    def test_failed_fork_is_a_process_limit(self):
+        # As a user other than root, which RLIMIT_NPROC does not apply to. The
+        # sandbox's own modules are loaded first: that user may not be able to
+        # read this interpreter's standard library
+        code = (
+            'import linecache, os, resource, shutil, traceback\n'
+            'if os.getuid() == 0:\n    os.setgid(65534)\n    os.setuid(65534)\n'
+            'resource.setrlimit(resource.RLIMIT_NPROC, (1, 1))\n'
+            'os.fork()'
+        )
+        for executor in self.backends:
+            with self.subTest(executor=type(executor).__name__):
+                result = executor.execute(code)
+                self.assertEqual(result['error_kind'], 'process_limit')
+                self.assertIn('[Errno 11]', result['error'])
+
+    def test_runs_use_private_scratch_directory(self):
+        for executor in self.backends:
+            result = executor.execute("import os\nopen('notes.txt', 'w').write('x')\nprint(os.getcwd())")
+            scratch = result['output'].strip()
+            self.assertIn('run-', os.path.basename(scratch))
+            self.assertFalse(os.path.exists(scratch))
+
+    def test_traceback_names_solution_file(self):
+        for executor in self.backends:
+            result = executor.execute('print(\n')
+            self.assertIn('File "solution.py", line 1', result['error'])
+            self.assertIn('SyntaxError', result['error'])
+
+    def test_runs_are_isolated(self):
+        self.pool.execute('import math\nmath.pi = 3')
+        self.assertEqual(self.pool.execute('import math\nprint(math.pi > 3)')['output'], 'True\n')
+
+    def test_programs_cannot_write_to_the_protocol_channel(self):
+        pool = WorkerPoolExecutor(size=1, max_runs=10, timeout=2)
+        self.addCleanup(pool.close)
+        forged = '{"stdout": "forged", "stderr": "", "returncode": 0, "timed_out": false, "truncated": false, "timings": {"spawn": 0, "run": 0, "teardown": 0}}\n'
+        result = pool.execute(f'import os\ntry:\n    os.write(3, {forged!r}.encode())\nexcept OSError:\n    print("closed")')
+        self.assertEqual(result['output'], 'closed\n')
+        self.assertEqual(pool.execute('print("next")')['output'], 'next\n')
+
+    def test_pool_recycles_workers(self):
+        for _ in range(4):
+            self.pool.execute('pass')
+        self.assertTrue(all(worker.runs < 3 for worker in self.pool._workers))
+        self.assertEqual(len(self.pool._workers), 2)
+
+    def test_pool_survives_failed_worker_spawns(self):
+        pool = WorkerPoolExecutor(size=1, max_runs=1, timeout=1)
+        self.addCleanup(pool.close)
+        pool.execute('pass')
+        with mock.patch('challenges.executor.PoolWorker', side_effect=OSError('fork failed')):
+            # The worker is retired and cannot be replaced, so the next run falls back to a one-off interpreter
+            self.assertEqual(pool.execute('print(1)')['output'], '1\n')
+            self.assertEqual(pool._workers, [])
+            self.assertEqual(pool.execute('print(3)')['output'], '3\n')
+        self.assertEqual(pool.execute('print(2)')['output'], '2\n')
+        self.assertEqual(len(pool._workers), 1)
+
+    def test_lone_surrogates_reach_the_program(self):
+        for executor in self.backends:
+            result = executor.execute('print(len("\\ud800"), ascii(chr(0xd800)))')
+            self.assertEqual(result['output'], "1 '\\ud800'\n")
+            result = executor.execute('x = "\ud800"')
+            self.assertEqual(result['error_kind'], 'runtime_error')
+            self.assertIn('surrogates not allowed', result['error'])
+            self.assertNotIn('run_once', result['error'])
+
+
+class AsyncExecutionTests(SimpleTestCase):
+    async def test_same_results_as_the_sync_path(self):
+        executor = SubprocessExecutor(timeout=2, output_limit=1000)
+        for code in ['print("hello")', 'raise ValueError("boom")', 'while True:\n    pass', 'print("x" * 5000)']:
+            self.assertEqual(await executor.aexecute(code), executor.execute(code))
+
+    async def test_runs_wait_concurrently_on_one_loop(self):
+        code = 'import time\ntime.sleep(1)\nprint("done")'
+        started = time.monotonic()
+        results = await asyncio.gather(*(aexecute_python_code(code) for _ in range(10)))
+        self.assertEqual([result['output'] for result in results], ['done\n'] * 10)
+        self.assertLess(time.monotonic() - started, 5)
+
+    async def test_syntax_errors_skip_the_sandbox(self):
+        result = await aexecute_python_code('print(')
+        self.assertEqual(result['error_kind'], 'syntax_error')
+
+
+class StreamingExecutionTests(SimpleTestCase):
+    def test_output_arrives_before_the_program_finishes(self):
+        code = 'import time\nprint("first")\ntime.sleep(1)\nprint("second")'
+        started = time.monotonic()
+        events = SubprocessExecutor(timeout=5).stream(code)
+        # Unbuffered prints may arrive in several pieces
+        printed = ''
+        while printed != 'first\n':
+            event, text = next(events)
+            self.assertEqual(event, 'stdout')
+            printed += text
+        self.assertLess(time.monotonic() - started, 1)
+        rest = list(events)
+        self.assertEqual(''.join(text for event, text in rest[:-1]), 'second\n')
+        self.assertEqual(rest[-1], ('result', {'output': 'first\nsecond\n', 'error': None, 'error_kind': None}))
+
+    def test_same_result_as_execute(self):
+        executor = SubprocessExecutor(timeout=2, output_limit=1000)
+        for code in ['print("hello")', 'raise ValueError("boom")', 'while True:\n    pass', 'print("x" * 5000)']:
+            self.assertEqual(list(executor.stream(code))[-1], ('result', executor.execute(code)))
+
+    def test_closing_the_stream_stops_the_program(self):
+        events = SubprocessExecutor(timeout=30).stream('import time\nprint("up", flush=True)\ntime.sleep(30)')
+        self.assertEqual(next(events)[0], 'stdout')
+        started = time.monotonic()
+        events.close()
+        self.assertLess(time.monotonic() - started, 5)
+
+    @override_settings(CODE_EXECUTION_CACHE_SIZE=8)
+    def test_cached_results_stream_only_the_result(self):
+        self.assertIn('stdout', [event for event, _ in stream_python_code('print(1)')])
+        self.assertEqual(list(stream_python_code('print(1)')), [('result', {'output': '1\n', 'error': None, 'error_kind': None})])
+
+    async def test_async_stream(self):
+        events = [event async for event in SubprocessExecutor(timeout=2).astream('print(1)\nprint(2)')]
+        self.assertEqual(''.join(text for event, text in events if event == 'stdout'), '1\n2\n')
+        self.assertEqual(events[-1][1]['output'], '1\n2\n')
+
+
+class ExecutorSettingsTests(SimpleTestCase):
+    def test_backend_is_selected_from_settings(self):
+        with override_settings(CODE_EXECUTION_BACKEND='pool', CODE_EXECUTION_POOL_SIZE=1,
+                               CODE_EXECUTION_CACHE_SIZE=0):
+            self.assertIsInstance(get_executor(), WorkerPoolExecutor)
+        with override_settings(CODE_EXECUTION_BACKEND='subprocess', CODE_EXECUTION_CACHE_SIZE=0):
+            self.assertIsInstance(get_executor(), SubprocessExecutor)
+        with override_settings(CODE_EXECUTION_BACKEND='subprocess', CODE_EXECUTION_CACHE_SIZE=8):
+            executor = get_executor()
+            self.assertIsInstance(executor, CachedExecutor)
+            self.assertIsInstance(executor.executor, SubprocessExecutor)
+
+
+class ComparisonTests(SimpleTestCase):
+    def assertMatches(self, mode, expected, output, matches=True, tolerance=1e-6):
+        self.assertEqual(ExpectedOutput(mode, expected, tolerance).matches(output), matches, (mode, expected, output))
+
+    def test_exact_ignores_only_surrounding_whitespace(self):
+        self.assertMatches('exact', '1\n2', '\n 1\n2\n\n')
+        self.assertMatches('exact', '1\n2', '1 \n2', False)
+        self.assertMatches('exact', '1\n2', '1\n2\n3', False)
+        self.assertMatches('exact', '', '  \n')
+
+    def test_whitespace_mode(self):
+        self.assertMatches('whitespace', 'a  b\nc', 'a b\t\n\n  c  ')
+        self.assertMatches('whitespace', 'a b', 'ab', False)
+
+    def test_lines_mode_ignores_order_but_not_counts(self):
+        self.assertMatches('lines', 'a\nb\nb', 'b\na\nb')
+        self.assertMatches('lines', 'a\nb\nb', 'b\na', False)
+        self.assertMatches('lines', 'a\nb', 'b\na\na', False)
+
+    def test_numeric_mode(self):
+        self.assertMatches('numeric', 'total 0.3', 'total 0.30000000000000004')
+        self.assertMatches('numeric', 'total 0.3', 'total 0.31', False)
+        self.assertMatches('numeric', 'total 0.3', 'total 0.31', tolerance=0.05)
+        self.assertMatches('numeric', 'total 0.3', 'sum 0.3', False)
+        self.assertMatches('numeric', 'nan', 'inf', False)
+
+    def test_stops_at_first_mismatch(self):
+        lines_read = []
+        expected = ExpectedOutput('whitespace', 'a\nb')
+        original = expected._match_sequence
+        expected._match_sequence = lambda lines, match: original(
+            (lines_read.append(line) or line for line in lines), match
+        )
+        self.assertFalse(expected.matches('x\n' + 'y\n' * 1000))
+        self.assertEqual(lines_read, ['x'])
+
+
+class SyntaxPrecheckTests(SimpleTestCase):
+    def test_syntax_errors_skip_the_sandbox(self):
+        code = 'x = 1\nprint(x\n'
+        sandbox = SubprocessExecutor(timeout=5).execute(code)
+        avoided = SPAWNS_AVOIDED.values.get(('syntax_error',), 0)
+        with mock.patch('challenges.executor.get_executor') as get:
+            result = execute_python_code(code)
+            execute_python_code(code)
+        get.assert_not_called()
+        self.assertEqual(SPAWNS_AVOIDED.values[('syntax_error',)], avoided + 2)
+        self.assertEqual(result['error'], sandbox['error'])
+        self.assertEqual(result['error_kind'], 'syntax_error')
+        self.assertEqual(sandbox['error_kind'], 'syntax_error')
+        self.assertEqual(result['syntax_error']['line'], 2)
+
+    @override_settings(CODE_EXECUTION_PRECHECK_MAX_SIZE=5, CODE_EXECUTION_CACHE_SIZE=0)
+    def test_long_programs_go_to_the_sandbox(self):
+        result = execute_python_code('print(\n')
+        self.assertEqual(result['error_kind'], 'syntax_error')
+        self.assertNotIn('syntax_error', result)
+
+
+class CountingExecutor:
+    def __init__(self, delay=0, error=None):
+        self.calls = 0
+        self.delay = delay
+        self.error = error
+
+    def execute(self, code, limits=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {'output': f'run {self.calls}\n', 'error': self.error}
+
+    def close(self):
+        pass
+
+
+class ResultCacheTests(SimpleTestCase):
+    def test_identical_code_runs_once(self):
+        backend = CountingExecutor()
+        cache = CachedExecutor(backend)
+        self.assertEqual(cache.execute('print(1)'), cache.execute('print(1)'))
+        self.assertEqual(backend.calls, 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_lru_and_ttl_eviction(self):
+        backend = CountingExecutor()
+        cache = CachedExecutor(backend, max_entries=2, ttl=0.05)
+        for code in ('print(1)', 'print(2)', 'print(3)'):
+            cache.execute(code)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        time.sleep(0.1)
+        cache.execute('print(3)')
+        self.assertEqual(backend.calls, 4)
+
+    def test_concurrent_requests_are_coalesced(self):
+        backend = CountingExecutor(delay=0.2)
+        cache = CachedExecutor(backend)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.execute('print(1)'))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(backend.calls, 1)
+        self.assertEqual(len(set(r['output'] for r in results)), 1)
+        self.assertEqual(cache.stats()['coalesced'], 4)
+
+    def test_nondeterministic_and_failed_runs_are_not_cached(self):
+        self.assertFalse(is_deterministic('import random\nprint(random.random())'))
+        self.assertFalse(is_deterministic('name = input()'))
+        self.assertTrue(is_deterministic('import math\nprint(math.pi)'))
+        # Set order follows the per-process hash seed
+        self.assertFalse(is_deterministic("print({'a', 'b'})"))
+        self.assertFalse(is_deterministic("print({c for c in 'ab'})"))
+        self.assertFalse(is_deterministic("print(set('ab'), frozenset('ab'))"))
+        self.assertTrue(is_deterministic("print({'a': 1, 'b': 2})"))
+        # Too deep for the parser: run, but never cached
+        self.assertFalse(is_deterministic('x' + '.y' * 49000))
+        self.assertEqual(CachedExecutor(CountingExecutor()).execute('x' + '.y' * 49000)['output'], 'run 1\n')
+
+        backend = CountingExecutor()
+        cache = CachedExecutor(backend)
+        cache.execute('from time import time\nprint(time())')
+        cache.execute('from time import time\nprint(time())')
+        self.assertEqual(backend.calls, 2)
+
+        timeouts = CachedExecutor(CountingExecutor(error='Code execution timed out (10 seconds limit)'))
+        timeouts.execute('print(1)')
+        timeouts.execute('print(1)')
+        self.assertEqual(timeouts.executor.calls, 2)
+
+
+class ChallengeTestCase(TestCase):
+    """Shared fixtures: one student, one week with two challenges"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        cls.user = CustomUser.objects.create_user('student', 'student@example.com', 'pass')
+        cls.week = Week.objects.create(
+            week_number=1,
+            title='Loops',
+            description='Week one',
+            start_date=date.today() - timedelta(days=1),
+            end_date=date.today() + timedelta(days=5)
+        )
+        cls.challenge = Challenge.objects.create(
+            week=cls.week, title='Sum', description='Fix the sum', buggy_code='print(1 + 1 + 1)',
+            expected_output='2', points=3, order=1, created_by=cls.admin
+        )
+        cls.other_challenge = Challenge.objects.create(
+            week=cls.week, title='Echo', description='Print hi', buggy_code='print("bye")',
+            expected_output='hi', points=2, order=2, created_by=cls.admin
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def submit(self, challenge, code):
+        return self.client.post(
+            reverse('challenges:submit_solution', args=[challenge.id]),
+            data=json.dumps({'code': code}),
+            content_type='application/json'
+        )
+
+
+class SubmitSolutionTests(ChallengeTestCase):
+    def test_correct_submission_awards_points_once(self):
+        response = self.submit(self.challenge, 'print(2)')
+        self.assertEqual(response.json()['status'], 'correct')
+        self.submit(self.challenge, 'print(1 + 1)')
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.total_score, 3)
+        progress = UserProgress.objects.get(user=self.user, week=self.week)
+        self.assertEqual(progress.challenges_completed, 1)
+        self.assertEqual(progress.points_earned, 3)
+
+    def test_later_correct_submission_counts(self):
+        self.assertEqual(self.submit(self.challenge, 'print(3)').json()['status'], 'incorrect')
+        self.assertEqual(self.submit(self.challenge, 'print(2)').json()['status'], 'correct')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.total_score, 3)
+
+    def test_challenge_comparison_mode(self):
+        self.assertEqual(self.submit(self.challenge, 'print(2.0000001)').json()['status'], 'incorrect')
+        self.challenge.comparison_mode = 'numeric'
+        self.challenge.save()
+        self.assertEqual(self.submit(self.challenge, 'print(2.0000001)').json()['status'], 'correct')
+
+    def test_challenge_limits_override_settings(self):
+        self.challenge.cpu_limit = 1
+        self.challenge.save()
+        data = self.submit(self.challenge, 'while True:\n    pass').json()
+        self.assertEqual((data['status'], data['error_kind']), ('incorrect', 'cpu_limit'))
+        submission = Submission.objects.get(user=self.user, challenge=self.challenge)
+        self.assertEqual(submission.error_kind, 'cpu_limit')
+
+    def test_challenge_limits_must_be_positive(self):
+        for field in ['cpu_limit', 'memory_limit', 'open_files_limit', 'file_size_limit']:
+            setattr(self.challenge, field, 0)
+            with self.assertRaisesMessage(ValidationError, field):
+                self.challenge.full_clean()
+            setattr(self.challenge, field, None)
+        self.challenge.full_clean()
+
+
+class AsyncViewTests(ChallengeTestCase):
+    def post(self, view, path, code, *args):
+        request = AsyncRequestFactory().post(path, data={'code': code}, content_type='application/json')
+        request.user = self.user
+        return view(request, *args)
+
+    async def test_submit_grades_and_records(self):
+        response = await self.post(async_views.submit_solution, '/', 'print(2)', self.challenge.id)
+        self.assertEqual(json.loads(response.content)['status'], 'correct')
+        self.assertEqual(await Submission.objects.filter(user=self.user, status='correct').acount(), 1)
+        self.assertEqual((await CustomUser.objects.aget(pk=self.user.pk)).total_score, 3)
+
+    async def test_execute_returns_output(self):
+        response = await self.post(async_views.execute_code, '/', 'print(6 * 7)')
+        self.assertEqual(json.loads(response.content)['output'], '42\n')
+
+    @override_settings(EXECUTION_RATE_BURST=1, EXECUTION_RATE_PER_MINUTE=1)
+    async def test_admission_limits_apply(self):
+        self.assertEqual((await self.post(async_views.execute_code, '/', 'print(1)')).status_code, 200)
+        self.assertEqual((await self.post(async_views.execute_code, '/', 'print(1)')).status_code, 429)
+
+    def test_async_views_are_coroutines(self):
+        # Django only awaits views that stay coroutine functions through their decorators
+        for view in (async_views.submit_solution, async_views.execute_code):
+            self.assertTrue(asyncio.iscoroutinefunction(view))
+        self.assertTrue(async_views.execute_code.csrf_exempt)
+
+
+# Cached results would be sent without any output events
+@override_settings(CODE_EXECUTION_CACHE_SIZE=0)
+class StreamingViewTests(ChallengeTestCase):
+    def read_events(self, response):
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = []
+        for message in b''.join(response.streaming_content).decode().split('\n\n')[:-1]:
+            event, data = message.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+        return events
+
+    def test_execute_streams_output_then_the_result(self):
+        response = self.client.post(reverse('challenges:stream_code'), data={'code': 'print(6 * 7)'},
+                                    content_type='application/json')
+        events = self.read_events(response)
+        self.assertEqual(''.join(data['text'] for event, data in events if event == 'output'), '42\n')
+        self.assertEqual(events[-1], ('result', {'output': '42\n', 'error': None, 'error_kind': None}))
+
+    def test_submit_streams_and_grades(self):
+        response = self.client.post(reverse('challenges:stream_submission', args=[self.challenge.id]),
+                                    data={'code': 'print(2)'}, content_type='application/json')
+        event, result = self.read_events(response)[-1]
+        self.assertEqual((event, result['status'], result['points_earned']), ('result', 'correct', 3))
+        self.assertEqual(Submission.objects.get(user=self.user, challenge=self.challenge).status, 'correct')
+
+    def test_errors_are_plain_json(self):
+        response = self.client.post(reverse('challenges:stream_code'), data={'code': ' '}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Code cannot be empty'})
+
+    @override_settings(EXECUTION_MAX_IN_FLIGHT=1, EXECUTION_MAX_QUEUED=0)
+    def test_slot_is_held_until_the_stream_is_closed(self):
+        url = reverse('challenges:stream_code')
+        response = self.client.post(url, data={'code': 'print(1)'}, content_type='application/json')
+        self.assertEqual(self.client.post(url, data={'code': 'print(1)'}, content_type='application/json').status_code, 429)
+        response.close()
+        response = self.client.post(url, data={'code': 'print(1)'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    async def test_async_stream(self):
+        request = AsyncRequestFactory().post('/', data={'code': 'print(5)'}, content_type='application/json')
+        request.user = self.user
+        response = await async_views.stream_code(request)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertIn(b'event: result\ndata: {"output": "5\\n"', body)
+
+
+class AttemptHistoryTests(ChallengeTestCase):
+    def test_every_graded_run_is_kept_and_code_is_stored_once(self):
+        for code in ('print(3)', 'print(3)', 'print(2)'):
+            self.submit(self.challenge, code)
+        self.assertEqual(Submission.objects.filter(user=self.user, challenge=self.challenge).count(), 1)
+        attempts = list(history.attempts_of(self.user, self.challenge).order_by('id'))
+        self.assertEqual([attempt.status for attempt in attempts], ['incorrect', 'incorrect', 'correct'])
+        self.assertEqual(attempts[0].code_id, attempts[1].code_id)
+        self.assertEqual(attempts[2].code.text, 'print(2)')
+        self.assertEqual(attempts[2].output.text, '2\n')
+        # print(3), print(2), and their outputs 3 and 2
+        self.assertEqual(ContentBlob.objects.count(), 4)
+
+        self.assertEqual(history.attempt_counts([self.challenge.id]), {self.challenge.id: (3, 1)})
+        self.assertIn(self.user.id, history.time_to_solve(self.challenge))
+
+        data = self.client.get(reverse('challenges:attempt_history', args=[self.challenge.id])).json()
+        self.assertEqual([attempt['code'] for attempt in data['attempts']][0], 'print(2)')
+        self.assertEqual(len(data['attempts']), 3)
+
+
+class IncrementalProgressTests(ChallengeTestCase):
+    def assertProgressMatchesRecount(self):
+        progress = UserProgress.objects.get(user=self.user, week=self.week)
+        incremental = (progress.challenges_completed, progress.points_earned, progress.completion_percentage)
+        progress.update_progress()
+        self.assertEqual(incremental, (progress.challenges_completed, progress.points_earned, progress.completion_percentage))
+        return progress
+
+    def test_deltas_match_full_recount(self):
+        grade_submission(self.user, self.challenge, 'print(2)')
+        progress = self.assertProgressMatchesRecount()
+        self.assertEqual(progress.completion_percentage, 50.0)
+
+        grade_submission(self.user, self.other_challenge, 'print("bye")')
+        grade_submission(self.user, self.other_challenge, 'print("hi")')
+        grade_submission(self.user, self.challenge, 'print(5)')
+        progress = self.assertProgressMatchesRecount()
+        self.assertEqual((progress.challenges_completed, progress.points_earned), (1, 2))
+
+    def test_new_challenge_updates_totals(self):
+        grade_submission(self.user, self.challenge, 'print(2)')
+        Challenge.objects.create(
+            week=self.week, title='New', description='New', buggy_code='', expected_output='',
+            order=3, created_by=self.admin
+        )
+        progress = self.assertProgressMatchesRecount()
+        self.assertEqual(progress.total_challenges, 3)
+
+        self.other_challenge.delete()
+        progress = self.assertProgressMatchesRecount()
+        self.assertEqual(progress.total_challenges, 2)
+
+    def test_deleting_a_solved_challenge_takes_its_points_away(self):
+        grade_submission(self.user, self.challenge, 'print(2)')
+        grade_submission(self.user, self.other_challenge, 'print("hi")')
+        self.challenge.delete()
+        progress = self.assertProgressMatchesRecount()
+        self.assertEqual((progress.challenges_completed, progress.total_challenges, progress.points_earned), (1, 1, 2))
+        self.assertEqual(progress.completion_percentage, 100.0)
+
+    def test_moving_a_challenge_updates_both_weeks(self):
+        next_week = Week.objects.create(
+            week_number=2, title='Lists', description='Week two',
+            start_date=date.today() + timedelta(days=6), end_date=date.today() + timedelta(days=12)
+        )
+        grade_submission(self.user, self.challenge, 'print(2)')
+        UserProgress.objects.create(user=self.user, week=next_week)
+
+        self.challenge.week = next_week
+        self.challenge.save()
+        progress = self.assertProgressMatchesRecount()
+        self.assertEqual((progress.challenges_completed, progress.total_challenges, progress.points_earned), (0, 1, 0))
+        moved = UserProgress.objects.get(user=self.user, week=next_week)
+        self.assertEqual((moved.challenges_completed, moved.total_challenges, moved.points_earned), (1, 1, 3))
+        self.assertEqual(moved.completion_percentage, 100.0)
+
+    def test_resubmission_write_path_queries(self):
+        grade_submission(self.user, self.challenge, 'print(3)')
+        # Savepoint, locked read and update of the submission, blobs and
+        # attempt of the history, release
+        with self.assertNumQueries(6):
+            grade_submission(self.user, self.challenge, 'print(4)')
+
+    def test_first_submission_is_inserted_graded(self):
+        # Savepoints and the insert of the graded row, history, release
+        with self.assertNumQueries(8):
+            grade_submission(self.user, self.challenge, 'print(3)')
+
+    def test_grade_change_queries(self):
+        grade_submission(self.user, self.challenge, 'print(2)')
+        grade_submission(self.user, self.challenge, 'print(3)')
+        grade_submission(self.user, self.challenge, 'print(2)')
+        # The submission and history as above, then one conditional UPDATE
+        # each of progress and total score, and the leaderboards' locked
+        # read, entries UPDATE and tree UPDATE
+        with self.assertNumQueries(11):
+            grade_submission(self.user, self.challenge, 'print(3)')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.total_score, 0)
+
+
+@override_settings(GRADING_MODE='queue')
+class GradingQueueTests(ChallengeTestCase):
+    def test_submit_returns_job_and_grader_completes_it(self):
+        response = self.submit(self.challenge, 'print(2)')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['job_id']
+        self.assertEqual(Submission.objects.get(user=self.user, challenge=self.challenge).status, 'pending')
+
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['state'], 'queued')
+
+        self.assertEqual(run_grader('test', once=True), 1)
+        status = self.client.get(reverse('challenges:job_status', args=[job_id])).json()
+        self.assertEqual(status['state'], 'done')
+        self.assertEqual(status['status'], 'correct')
+        self.assertEqual(status['points_earned'], 3)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.total_score, 3)
+
+    def test_resubmission_supersedes_queued_job(self):
+        first = self.submit(self.challenge, 'print(3)').json()['job_id']
+        second = self.submit(self.challenge, 'print(2)').json()['job_id']
+
+        self.assertEqual(run_grader('test', once=True), 1)
+        self.assertEqual(GradingJob.objects.get(id=first).state, 'superseded')
+        self.assertEqual(GradingJob.objects.get(id=second).state, 'done')
+
+    def test_jobs_are_private(self):
+        job_id = self.submit(self.challenge, 'print(2)').json()['job_id']
+        other = CustomUser.objects.create_user('other', 'other@example.com', 'pass')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('challenges:job_status', args=[job_id])).status_code, 404)
+
+
+class AdmissionControlTests(ChallengeTestCase):
+    def run_code(self, code='print(1)'):
+        return self.client.post(
+            reverse('challenges:execute_code'),
+            data=json.dumps({'code': code}),
+            content_type='application/json'
+        )
+
+    @override_settings(EXECUTION_RATE_BURST=2, EXECUTION_RATE_PER_MINUTE=6)
+    def test_rate_limit_per_user(self):
+        self.assertEqual(self.run_code().status_code, 200)
+        self.assertEqual(self.run_code().status_code, 200)
+        response = self.run_code()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '10')
+
+        # Other users have their own bucket
+        self.client.force_login(self.admin)
+        self.assertEqual(self.run_code().status_code, 200)
+
+    @override_settings(EXECUTION_MAX_IN_FLIGHT=1, EXECUTION_MAX_QUEUED=0)
+    def test_busy_server_rejects_without_running(self):
+        cache.add('execution-admission:running:0', 'other request')
+        with mock.patch('challenges.views.execute_python_code') as execute:
+            response = self.run_code()
+        self.assertEqual(response.status_code, 429)
+        execute.assert_not_called()
+        self.assertIn('Retry-After', response)
+
+        cache.delete('execution-admission:running:0')
+        self.assertEqual(self.run_code().status_code, 200)
+
+    @override_settings(EXECUTION_MAX_IN_FLIGHT=1, EXECUTION_MAX_QUEUED=0, EXECUTION_RATE_BURST=2, EXECUTION_RATE_PER_MINUTE=6)
+    def test_busy_rejections_cost_no_tokens(self):
+        cache.add('execution-admission:running:0', 'other request')
+        for _ in range(3):
+            self.assertEqual(self.run_code().status_code, 429)
+        cache.delete('execution-admission:running:0')
+        self.assertEqual(self.run_code().status_code, 200)
+        self.assertEqual(self.run_code().status_code, 200)
+
+    @override_settings(EXECUTION_MAX_IN_FLIGHT=1)
+    def test_expired_slots_are_not_freed_for_their_new_owner(self):
+        request = RequestFactory().post('/')
+        request.user = self.user
+        _, slots = admission.admit(request)
+        # The slot expires mid-run and another request takes it
+        cache.delete('execution-admission:running:0')
+        _, other = admission.admit(request)
+        admission.release(slots)
+        self.assertTrue(cache.get('execution-admission:running:0'))
+        admission.release(other)
+        self.assertIsNone(cache.get('execution-admission:running:0'))
+
+    @override_settings(GRADING_MODE='queue', EXECUTION_RATE_BURST=2, EXECUTION_RATE_PER_MINUTE=6)
+    def test_queued_submissions_use_the_same_tokens(self):
+        def post(name, args, body):
+            return self.client.post(reverse(f'challenges:{name}', args=args), data=json.dumps(body), content_type='application/json')
+
+        self.assertEqual(post('stream_submission', [self.challenge.id], {'code': 'print(2)'}).status_code, 202)
+        batch = {'submissions': [
+            {'challenge_id': self.challenge.id, 'code': 'print(2)'},
+            {'challenge_id': self.other_challenge.id, 'code': 'print("hi")'},
+        ]}
+        self.assertEqual(post('submit_batch', [], batch).status_code, 429)
+        self.assertEqual(post('stream_submission', [self.challenge.id], {'code': 'print(2)'}).status_code, 202)
+        self.assertEqual(post('stream_submission', [self.challenge.id], {'code': 'print(2)'}).status_code, 429)
+        self.assertEqual(GradingJob.objects.count(), 2)
+
+    @override_settings(EXECUTION_MAX_IN_FLIGHT=2, CODE_EXECUTION_TIMEOUT=10)
+    def test_batch_slots_outlive_the_runs_they_share(self):
+        request = RequestFactory().post('/')
+        request.user = self.user
+        with mock.patch('challenges.admission.extend_slot', wraps=admission.extend_slot) as extend:
+            _, slots = admission.admit(request, runs=5)
+        self.assertEqual(len(slots), 2)
+        # Three runs in a row on each slot
+        self.assertEqual([call.args[2] for call in extend.call_args_list], [60, 60])
+        admission.release(slots)
+
+    @override_settings(GRADING_MODE='queue', EXECUTION_MAX_IN_FLIGHT=1, EXECUTION_MAX_QUEUED=0)
+    def test_queued_submissions_take_no_execution_slot(self):
+        cache.add('execution-admission:running:0', 'other request')
+        response = self.submit(self.challenge, 'print(2)')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(cache.get('execution-admission:running:0'), 'other request')
+        cache.delete('execution-admission:running:0')
+
+
+class ChallengeDetailTests(ChallengeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('challenges:challenge_detail', args=[self.challenge.id])
+
+    def test_unchanged_page_is_not_modified(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('private', first['Cache-Control'])
+        self.assertIn('no-cache', first['Cache-Control'])
+
+        revisit = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(revisit.status_code, 304)
+        self.assertEqual(revisit.content, b'')
+        self.assertEqual(revisit['ETag'], first['ETag'])
+        # Dates cannot tell a resubmission apart, so only the ETag is a validator
+        self.assertFalse(first.has_header('Last-Modified'))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT').status_code, 200)
+
+    def test_submissions_and_edits_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.submit(self.challenge, 'print(2)')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Points Earned')
+
+        self.challenge.description = 'Fix the total'
+        self.challenge.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Fix the total')
+
+    def test_challenge_parts_are_rendered_once_per_version(self):
+        self.client.get(self.url)
+        # A stale copy in the database does not show while the cached parts are current
+        Challenge.objects.filter(pk=self.challenge.pk).update(description='Changed behind our back')
+        self.assertContains(self.client.get(self.url), 'Fix the sum')
+        # Saving moves updated_at, and with it the cache keys
+        Challenge.objects.get(pk=self.challenge.pk).save()
+        self.assertContains(self.client.get(self.url), 'Changed behind our back')
+
+
+class WeekPageTests(ChallengeTestCase):
+    def load(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('challenges:week_challenges', args=[1]))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_content(self):
+        self.load()
+        cache.clear()
+        _, small = self.load()
+
+        for order in range(3, 9):
+            Challenge.objects.create(
+                week=self.week, title=f'Extra {order}', description='More', buggy_code='pass',
+                expected_output='', points=1, order=order, created_by=self.admin
+            )
+        for number in range(2, 6):
+            week = Week.objects.create(
+                week_number=number, title=f'Week {number}', description='Later',
+                start_date=date.today() + timedelta(days=7 * number),
+                end_date=date.today() + timedelta(days=7 * number + 6)
+            )
+            UserProgress.objects.create(user=self.user, week=week)
+        Submission.objects.create(user=self.user, challenge=self.challenge, submitted_code='print(2)', status='correct')
+        cache.clear()
+
+        response, large = self.load()
+        self.assertEqual(large, small)
+        self.assertContains(response, 'Extra 8')
+        self.assertContains(response, 'Week 5')
+
+    def test_fragments_are_cached_until_the_user_submits(self):
+        # The first visit also creates the progress row
+        self.load()
+        cache.clear()
+        _, miss = self.load()
+        response, hit = self.load()
+        # Both fragments, the week schedule, the session and the user (whose
+        # version token the clear dropped) come from the cache
+        self.assertEqual(hit, miss - 5)
+        self.assertContains(response, 'Not Started', count=2)
+
+        self.submit(self.challenge, 'print(2)')
+        response, _ = self.load()
+        self.assertContains(response, 'Review Solution', count=1)
+        self.assertContains(response, 'Not Started', count=1)
+
+        # Other users' fragments are their own
+        self.client.force_login(self.admin)
+        response, _ = self.load()
+        self.assertNotContains(response, 'Review Solution')
+
+
+class FixedDate(date):
+    day = None
+
+    @classmethod
+    def today(cls):
+        return cls.day
+
+
+class WeekScheduleTests(ChallengeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.next_week = Week.objects.create(
+            week_number=2, title='Lists', description='Week two',
+            start_date=self.week.end_date + timedelta(days=1),
+            end_date=self.week.end_date + timedelta(days=7)
+        )
+
+    def on(self, day):
+        FixedDate.day = day
+        return mock.patch('challenges.schedule.date', FixedDate)
+
+    def test_cached_until_the_next_boundary(self):
+        with self.on(self.week.end_date):
+            self.assertEqual(schedule.current_week(), self.week)
+            with self.assertNumQueries(0):
+                self.assertEqual(schedule.current_week(), self.week)
+                self.assertEqual(schedule.week_phase(self.next_week), schedule.FUTURE)
+
+        with self.on(self.next_week.start_date):
+            self.assertEqual(schedule.current_week(), self.next_week)
+            self.assertEqual(schedule.week_phase(self.week), schedule.PAST)
+
+        with self.on(self.next_week.end_date + timedelta(days=1)):
+            self.assertIsNone(schedule.current_week())
+
+    def test_saving_a_week_recomputes(self):
+        self.assertEqual(schedule.current_week(), self.week)
+        self.next_week.start_date = date.today()
+        self.next_week.save()
+        self.assertEqual(schedule.current_week(), self.next_week)
+        self.assertTrue(Week.objects.get(pk=self.week.pk).is_current_week)
+
+    def test_templates_read_the_schedule(self):
+        response = self.client.get(reverse('challenges:week_challenges', args=[2]))
+        self.assertContains(response, 'Upcoming Week')
+        self.assertFalse(response.context['week'].is_current_week)
+
+    def test_dashboard_reads_the_schedule_once(self):
+        with mock.patch('challenges.schedule.get_schedule', wraps=schedule.get_schedule) as get_schedule:
+            response = self.client.get(reverse('dashboard:user_dashboard'))
+        self.assertContains(response, 'Upcoming')
+        self.assertEqual(get_schedule.call_count, 1)
+
+
+class RegradeTests(ChallengeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.others = [CustomUser.objects.create_user(f'student{i}', password='pass') for i in range(3)]
+        # Two students print 2, two print 3
+        for user, code in zip([self.user] + self.others, ['print(2)', 'print(1 + 1)', 'print(3)', 'print(3)']):
+            grade_submission(user, self.challenge, code)
+        grade_submission(self.user, self.other_challenge, 'print("hi")')
+
+    def test_fixed_expected_output_moves_grades_and_scores(self):
+        Challenge.objects.filter(pk=self.challenge.pk).update(expected_output='3', points=4)
+        call_command('regrade', '--challenge', str(self.challenge.pk), '--processes', '2', stdout=open(os.devnull, 'w'))
+
+        run = RegradeRun.objects.get()
+        self.assertEqual((run.state, run.processed, run.changed, run.skipped), ('done', 4, 4, 0))
+        statuses = dict(Submission.objects.filter(challenge=self.challenge).values_list('user__username', 'status'))
+        self.assertEqual(statuses, {'student': 'incorrect', 'student0': 'incorrect', 'student1': 'correct', 'student2': 'correct'})
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.total_score, 2)
+        progress = UserProgress.objects.get(user=self.user, week=self.week)
+        self.assertEqual((progress.challenges_completed, progress.points_earned, progress.completion_percentage), (1, 2, 50.0))
+        progress = UserProgress.objects.get(user=self.others[1], week=self.week)
+        self.assertEqual((progress.challenges_completed, progress.points_earned), (1, 4))
+
+        top = ranking.top(ranking.GLOBAL_BOARD, 2)
+        self.assertEqual([row['score'] for row in top], [4, 4])
+
+    def test_interrupted_run_resumes_after_its_checkpoint(self):
+        Challenge.objects.filter(pk=self.challenge.pk).update(expected_output='3')
+        run = RegradeRun.objects.create(week=self.week)
+
+        def interrupt(run, rate):
+            if run.processed == 2:
+                raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            regrade(run, processes=1, batch_size=2, report=interrupt)
+        run.refresh_from_db()
+        self.assertEqual((run.state, run.processed), ('failed', 2))
+
+        regrade(run, processes=1, batch_size=2)
+        self.assertEqual((run.state, run.processed, run.total, run.changed), ('done', 5, 5, 4))
+        self.assertEqual(Submission.objects.filter(status='correct').count(), 3)
+
+
+@override_settings(EXECUTION_RATE_BURST=0)
+class BatchSubmitTests(ChallengeTestCase):
+    def submit_batch(self, entries):
+        return self.client.post(
+            reverse('challenges:submit_batch'),
+            data=json.dumps({'submissions': entries}),
+            content_type='application/json'
+        )
+
+    def test_batch_grades_every_challenge(self):
+        response = self.submit_batch([
+            {'challenge_id': self.challenge.id, 'code': 'print(2)'},
+            {'challenge_id': self.other_challenge.id, 'code': 'print("bye")'},
+        ])
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], ['correct', 'incorrect'])
+        self.assertEqual([r['points_earned'] for r in results], [3, 0])
+
+        response = self.submit_batch([
+            {'challenge_id': self.other_challenge.id, 'code': 'print("hi")'},
+            {'challenge_id': self.challenge.id, 'code': 'print(5)'},
+        ])
+        self.assertEqual([r['status'] for r in response.json()['results']], ['correct', 'incorrect'])
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.total_score, 2)
+        progress = UserProgress.objects.get(user=self.user, week=self.week)
+        self.assertEqual((progress.challenges_completed, progress.points_earned, progress.completion_percentage), (1, 2, 50.0))
+        self.assertEqual(ranking.rank_of(ranking.GLOBAL_BOARD, self.user.pk)['score'], 2)
+
+    def test_batch_uses_fewer_queries_than_single_submits(self):
+        wrong = [
+            {'challenge_id': self.challenge.id, 'code': 'print(0)'},
+            {'challenge_id': self.other_challenge.id, 'code': 'print("no")'},
+        ]
+        right = [
+            {'challenge_id': self.challenge.id, 'code': 'print(2)'},
+            {'challenge_id': self.other_challenge.id, 'code': 'print("hi")'},
+        ]
+        # Both paths start from existing, incorrect submissions
+        self.submit_batch(right)
+        self.submit_batch(wrong)
+        single = 0
+        for challenge, entry in zip([self.challenge, self.other_challenge], right):
+            # Each request resets the query log, so capture them one at a time
+            with CaptureQueriesContext(connection) as queries:
+                self.submit(challenge, entry['code'])
+            single += len(queries)
+        self.submit_batch(wrong)
+        with CaptureQueriesContext(connection) as batch:
+            self.submit_batch(right)
+        self.assertLess(len(batch), single * 0.6)
+
+    def test_invalid_batches(self):
+        duplicate = {'challenge_id': self.challenge.id, 'code': 'print(2)'}
+        self.assertEqual(self.submit_batch([duplicate, duplicate]).status_code, 400)
+        self.assertEqual(self.submit_batch([]).status_code, 400)
+        response = self.submit_batch([{'challenge_id': 9999, 'code': 'print(2)'}])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['challenge_ids'], [9999])
+        self.assertFalse(Submission.objects.exists())
+
+
+class LoadTestReportTests(SimpleTestCase):
+    def result(self, **changes):
+        scenario = {'throughput': 100.0, 'p95_ms': 50.0, 'queries_per_request': 5.0, 'errors': 0}
+        scenario.update(changes)
+        return {'scenarios': {'week_challenges': scenario}}
+
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual([percentile(samples, f) for f in (0.5, 0.95, 0.99)], [50, 95, 99])
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_regressions(self):
+        baseline = self.result()
+        self.assertEqual(find_regressions(self.result(p95_ms=55.0, throughput=90.0), baseline), [])
+        regressions = find_regressions(self.result(p95_ms=70.0, queries_per_request=7.0), baseline)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn('queries/request', regressions[0])
@@ -1,16 +1,26 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'challenges'
 
+# Under ASGI, Run and Submit await their programs instead of holding a thread
+execution_views = async_views if getattr(settings, 'ASYNC_EXECUTION_VIEWS', False) else views
+
 urlpatterns = [
     path('week/<int:week_number>/', views.week_challenges, name='week_challenges'),
     path('challenge/<int:challenge_id>/', views.challenge_detail, name='challenge_detail'),
-    path('submit/<int:challenge_id>/', views.submit_solution, name='submit_solution'),
-    path('execute/', views.execute_code, name='execute_code'),
+    path('submit/<int:challenge_id>/', execution_views.submit_solution, name='submit_solution'),
+    path('submit/<int:challenge_id>/stream/', execution_views.stream_submission, name='stream_submission'),
+    path('submit/batch/', views.submit_batch, name='submit_batch'),
+    path('challenge/<int:challenge_id>/attempts/', views.attempt_history, name='attempt_history'),
+    path('execute/', execution_views.execute_code, name='execute_code'),
+    path('execute/stream/', execution_views.stream_code, name='stream_code'),
+    path('jobs/<int:job_id>/', views.job_status, name='job_status'),
     
     # Admin URLs
     path('admin/create-week/', views.create_week, name='create_week'),
     path('admin/create-challenge/', views.create_challenge, name='create_challenge'),
     path('admin/week/<int:week_id>/challenges/', views.manage_challenges, name='manage_challenges'),
+    path('admin/execution-stats/', views.execution_stats, name='execution_stats'),
 ]
\ No newline at end of file
@@ -3,21 +3,29 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.http import JsonResponse
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 import json
-import subprocess
-import sys
-import traceback
-import tempfile
-import os
-from .models import Week, Challenge, Submission, UserProgress
+from monitoring.query_budget import query_budget
+from . import grading
+from . import admission
+from . import history
+from .admission import limit_executions
+from .executor import execute_python_code, get_executor, stream_python_code
+from .models import Week, Challenge, Submission, UserProgress, GradingJob
 from .forms import WeekForm, ChallengeForm
+from .pages import WeekPage, challenge_page_etag, fragment_versions
+from .streaming import EventStream, event_stream_response
 
 @login_required
+@query_budget(21)
 def week_challenges(request, week_number):
     week = get_object_or_404(Week, week_number=week_number)
-    challenges = week.challenges.all().order_by('order')
     
     # Get user's progress for this week
     user_progress, created = UserProgress.objects.get_or_create(
@@ -25,30 +33,24 @@ def week_challenges(request, week_number):
         week=week
     )
     if created:
-        user_progress.total_challenges = challenges.count()
+        user_progress.total_challenges = week.challenges.count()
         user_progress.save()
     
-    # Get user's submissions for these challenges
-    user_submissions = {}
-    if not request.user.is_superuser:
-        submissions = Submission.objects.filter(
-            user=request.user,
-            challenge__in=challenges
-        ).select_related('challenge')
-        user_submissions = {sub.challenge.id: sub for sub in submissions}
-    
+    # Challenges and navigation are loaded only when their cached fragment misses
     context = {
         'week': week,
-        'challenges': challenges,
+        'page': WeekPage(week, request.user),
         'user_progress': user_progress,
-        'user_submissions': user_submissions,
+        'fragment_versions': fragment_versions(request.user.pk),
+        'fragment_timeout': getattr(settings, 'WEEK_PAGE_CACHE_TIMEOUT', 600),
     }
     
     return render(request, 'challenges/week_challenges.html', context)
 
 @login_required
+@query_budget(4)
 def challenge_detail(request, challenge_id):
-    challenge = get_object_or_404(Challenge, id=challenge_id)
+    challenge = get_object_or_404(Challenge.objects.select_related('week'), id=challenge_id)
     
     # Get user's submission if exists
     user_submission = None
@@ -61,15 +63,26 @@ def challenge_detail(request, challenge_id):
         except Submission.DoesNotExist:
             pass
     
-    context = {
-        'challenge': challenge,
-        'user_submission': user_submission,
-    }
+    # Revisits of an unchanged page are answered without rendering it
+    # No Last-Modified: nothing dates the user's part of the page
+    etag = quote_etag(challenge_page_etag(request, challenge, user_submission))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        context = {
+            'challenge': challenge,
+            'user_submission': user_submission,
+            'fragment_timeout': getattr(settings, 'CHALLENGE_PAGE_CACHE_TIMEOUT', 3600),
+        }
+        response = render(request, 'challenges/challenge_detail.html', context)
     
-    return render(request, 'challenges/challenge_detail.html', context)
+    response['ETag'] = etag
+    # The page is per user, and browsers must check back before reusing it
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 @login_required
 @require_POST
+@query_budget(30)
 def submit_solution(request, challenge_id):
     if request.user.is_superuser:
         return JsonResponse({'error': 'Admins cannot submit solutions'}, status=403)
@@ -83,55 +96,164 @@ def submit_solution(request, challenge_id):
         if not submitted_code:
             return JsonResponse({'error': 'Code cannot be empty'}, status=400)
         
-        # Execute the code and get output
-        execution_result = execute_python_code(submitted_code)
-        
-        # Check if output matches expected output
-        status = 'correct' if execution_result['output'].strip() == challenge.expected_output.strip() else 'incorrect'
-        points_earned = challenge.points if status == 'correct' else 0
+        if getattr(settings, 'GRADING_MODE', 'sync') == 'queue':
+            # Hand the run to a grader process and let the browser poll;
+            # nothing runs here, so no execution slot is taken
+            rejection = admission.charge(request)
+            if rejection:
+                return rejection
+            job = grading.enqueue_submission(request.user, challenge, submitted_code)
+            return JsonResponse({
+                'job_id': job.id,
+                'status': 'pending',
+                'status_url': reverse('challenges:job_status', args=[job.id]),
+            }, status=202)
         
-        # Update or create submission
-        submission, created = Submission.objects.update_or_create(
-            user=request.user,
-            challenge=challenge,
-            defaults={
-                'submitted_code': submitted_code,
-                'output': execution_result['output'],
-                'status': status,
-                'points_earned': points_earned,
-            }
-        )
-        
-        # Update user progress
-        user_progress, _ = UserProgress.objects.get_or_create(
-            user=request.user,
-            week=challenge.week
-        )
-        user_progress.update_progress()
-        
-        # Update user total score
-        if created and status == 'correct':
-            request.user.total_score += points_earned
-            request.user.save()
-        elif not created and status == 'correct' and submission.points_earned != points_earned:
-            # Handle case where challenge points changed
-            request.user.total_score += (points_earned - submission.points_earned)
-            request.user.save()
+        rejection, slots = admission.admit(request)
+        if rejection:
+            return rejection
+        try:
+            return JsonResponse(grading.grade_submission(request.user, challenge, submitted_code))
+        finally:
+            admission.release(slots)
         
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@login_required
+@require_POST
+@query_budget(30)
+def stream_submission(request, challenge_id):
+    """Submit a solution, streaming the program's output and then the grade as server-sent events"""
+    if request.user.is_superuser:
+        return JsonResponse({'error': 'Admins cannot submit solutions'}, status=403)
+    
+    challenge = get_object_or_404(Challenge, id=challenge_id)
+    
+    try:
+        submitted_code = json.loads(request.body).get('code', '').strip()
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    if not submitted_code:
+        return JsonResponse({'error': 'Code cannot be empty'}, status=400)
+    
+    if getattr(settings, 'GRADING_MODE', 'sync') == 'queue':
+        rejection = admission.charge(request)
+        if rejection:
+            return rejection
+        job = grading.enqueue_submission(request.user, challenge, submitted_code)
         return JsonResponse({
-            'status': status,
-            'output': execution_result['output'],
-            'points_earned': points_earned,
-            'error': execution_result.get('error', ''),
-        })
-        
+            'job_id': job.id,
+            'status': 'pending',
+            'status_url': reverse('challenges:job_status', args=[job.id]),
+        }, status=202)
+    
+    # The slot is released by the response body once the run is over
+    rejection, slots = admission.admit(request)
+    if rejection:
+        return rejection
+    return event_stream_response(EventStream(grading.stream_submission(request.user, challenge, submitted_code), slots))
+
+@login_required
+@require_POST
+@query_budget(47)
+def submit_batch(request):
+    """Grade solutions for several challenges in one request
+
+    Expects {"submissions": [{"challenge_id": 1, "code": "..."}, ...]} and
+    answers with one result per submission, in the same order.
+    """
+    if request.user.is_superuser:
+        return JsonResponse({'error': 'Admins cannot submit solutions'}, status=403)
+    
+    try:
+        entries = json.loads(request.body).get('submissions')
+        if not isinstance(entries, list) or not entries:
+            return JsonResponse({'error': 'Submissions must be a non-empty list'}, status=400)
+        max_size = getattr(settings, 'SUBMIT_BATCH_MAX_SIZE', 10)
+        if len(entries) > max_size:
+            return JsonResponse({'error': f'At most {max_size} submissions per batch'}, status=400)
+        codes = {int(entry['challenge_id']): str(entry.get('code', '')).strip() for entry in entries}
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return JsonResponse({'error': 'Each submission needs a challenge_id and code'}, status=400)
+    
+    if len(codes) != len(entries):
+        return JsonResponse({'error': 'Each challenge may appear only once'}, status=400)
+    empty = [challenge_id for challenge_id, code in codes.items() if not code]
+    if empty:
+        return JsonResponse({'error': 'Code cannot be empty', 'challenge_ids': empty}, status=400)
+    challenges = Challenge.objects.in_bulk(list(codes))
+    missing = [challenge_id for challenge_id in codes if challenge_id not in challenges]
+    if missing:
+        return JsonResponse({'error': 'Unknown challenges', 'challenge_ids': missing}, status=404)
+    
+    batch = [(challenges[challenge_id], code) for challenge_id, code in codes.items()]
+    if getattr(settings, 'GRADING_MODE', 'sync') == 'queue':
+        rejection = admission.charge(request, runs=len(batch))
+        if rejection:
+            return rejection
+        with transaction.atomic():
+            jobs = [grading.enqueue_submission(request.user, challenge, code) for challenge, code in batch]
+        return JsonResponse({'results': [
+            {
+                'challenge_id': job.submission.challenge_id,
+                'job_id': job.id,
+                'status': 'pending',
+                'status_url': reverse('challenges:job_status', args=[job.id]),
+            }
+            for job in jobs
+        ]}, status=202)
+    
+    rejection, slots = admission.admit(request, runs=len(batch))
+    if rejection:
+        return rejection
+    try:
+        return JsonResponse({'results': grading.grade_batch(request.user, batch, parallelism=len(slots))})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
+    finally:
+        admission.release(slots)
+
+@login_required
+@query_budget(4)
+def attempt_history(request, challenge_id):
+    """List the user's graded attempts at a challenge, newest first"""
+    challenge = get_object_or_404(Challenge, id=challenge_id)
+    limit = getattr(settings, 'ATTEMPT_HISTORY_LIMIT', 50)
+    attempts = history.attempts_of(request.user, challenge)[:limit]
+    return JsonResponse({
+        'attempts': [
+            {
+                'created_at': attempt.created_at.isoformat(),
+                'status': attempt.status,
+                'points_earned': attempt.points_earned,
+                'error_kind': attempt.error_kind or None,
+                'code': attempt.code.text,
+                'output': attempt.output.text,
+            }
+            for attempt in attempts
+        ]
+    })
+
+@login_required
+@query_budget(3)
+def job_status(request, job_id):
+    """Report the state of a queued grading job"""
+    job = get_object_or_404(
+        GradingJob.objects.select_related('submission'),
+        id=job_id,
+        submission__user=request.user
+    )
+    return JsonResponse(grading.job_status(job))
 
 @csrf_exempt
 @require_POST
+@limit_executions
+@query_budget(2)
 def execute_code(request):
     """Execute Python code and return output"""
     try:
@@ -149,51 +271,32 @@ def execute_code(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
-def execute_python_code(code):
-    """Safely execute Python code and return output"""
+@csrf_exempt
+@require_POST
+@query_budget(2)
+def stream_code(request):
+    """Execute Python code, streaming its output as server-sent events"""
     try:
-        # Create a temporary file to write the code
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            f.write(code)
-            temp_file = f.name
-        
-        try:
-            # Execute the code using subprocess for security
-            result = subprocess.run(
-                [sys.executable, temp_file],
-                capture_output=True,
-                text=True,
-                timeout=10,  # 10 second timeout
-                cwd=tempfile.gettempdir()
-            )
-            
-            if result.returncode == 0:
-                return {
-                    'output': result.stdout,
-                    'error': result.stderr if result.stderr else None
-                }
-            else:
-                return {
-                    'output': result.stdout,
-                    'error': result.stderr or 'Code execution failed'
-                }
-                
-        finally:
-            # Clean up the temporary file
-            os.unlink(temp_file)
-            
-    except subprocess.TimeoutExpired:
-        return {
-            'output': '',
-            'error': 'Code execution timed out (10 seconds limit)'
-        }
-    except Exception as e:
-        return {
-            'output': '',
-            'error': f'Execution error: {str(e)}'
-        }
+        code = json.loads(request.body).get('code', '').strip()
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    if not code:
+        return JsonResponse({'error': 'Code cannot be empty'}, status=400)
+    
+    rejection, slots = admission.admit(request)
+    if rejection:
+        return rejection
+    return event_stream_response(EventStream(stream_python_code(code), slots))
 
 # Admin views
+@login_required
+@staff_member_required
+def execution_stats(request):
+    """Report how much work the execution result cache is saving"""
+    executor = get_executor()
+    stats = executor.stats() if hasattr(executor, 'stats') else {}
+    return JsonResponse({'cache': stats})
+
 @login_required
 @staff_member_required
 def create_week(request):
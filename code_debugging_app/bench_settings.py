@@ -0,0 +1,27 @@
+"""
+Settings for ``manage.py loadtest``: the project settings on a throwaway
+SQLite database, with per-user rate limits off so the load generator is not
+throttled. Use with ``--settings=code_debugging_app.bench_settings``.
+"""
+import os
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+DEBUG = False
+# Overruns are reported by the query report, not raised mid-run
+QUERY_BUDGET_ACTION = 'log'
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'code_debugging_app.bench_sqlite',
+        'NAME': os.environ.get('BENCH_DATABASE', os.path.join(tempfile.gettempdir(), 'code-debugging-bench.sqlite3')),
+        'OPTIONS': {
+            # Concurrent submits wait for the write lock instead of failing
+            'timeout': 30,
+        },
+    }
+}
+
+EXECUTION_RATE_BURST = 0
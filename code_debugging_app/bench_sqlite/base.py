@@ -0,0 +1,19 @@
+"""
+SQLite backend for the load test.
+
+Transactions start with BEGIN IMMEDIATE so that concurrent writers wait on
+the busy timeout instead of failing with "database is locked" when a read
+lock cannot be upgraded (Django 5.1 exposes this as ``transaction_mode``),
+and the WAL journal lets page reads proceed while a submit is writing.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
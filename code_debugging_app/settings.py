@@ -42,9 +42,13 @@ INSTALLED_APPS = [
     'authentication',
     'challenges',
     'dashboard',
+    'leaderboard',
+    'monitoring',
+    'assets',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -131,6 +135,20 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# collectstatic writes content-hashed names plus .gz/.br copies (see assets/storage.py)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'assets.storage.CompressedManifestStaticFilesStorage'},
+}
+# Link Bootstrap, Font Awesome, CodeMirror and Inter from their CDNs while
+# static/vendor/ is missing (`manage.py vendor_assets` writes it); without
+# this, missing bundles fail the startup checks. collectstatic refuses to run
+# without the bundles either way. Turn off once static/vendor/ is committed.
+ASSETS_CDN_FALLBACK = True
+# Serve STATIC_ROOT from Django when no web server in front does
+SERVE_STATIC_FILES = False
+STATIC_MAX_AGE = 3600  # seconds, for the few files linked without a content hash
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -147,6 +165,97 @@ LOGOUT_REDIRECT_URL = 'authentication:login'
 # Custom User Model
 AUTH_USER_MODEL = 'authentication.CustomUser'
 
+# The logged-in user is kept in process memory between requests. Saves bump
+# a version token in the default cache, so every process sharing that cache
+# reloads the user on their next request; others reload it after the TTL
+AUTHENTICATION_BACKENDS = ['authentication.backends.CachedModelBackend']
+AUTH_USER_CACHE_TTL = 30  # seconds (0 disables the cache)
+AUTH_USER_CACHE_SIZE = 1000  # users per process
+
+# Sessions are read from the default cache and written through to the
+# database, so a cache miss or restart never logs anyone out. They are only
+# written when changed (login, logout)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_SAVE_EVERY_REQUEST = False
+
+# Code execution
+# 'subprocess' starts a new interpreter per run; 'pool' reuses warm,
+# pre-imported interpreters that fork a fresh child for every run
+CODE_EXECUTION_BACKEND = 'subprocess'
+CODE_EXECUTION_TIMEOUT = 10  # seconds
+CODE_EXECUTION_POOL_SIZE = 4
+CODE_EXECUTION_POOL_MAX_RUNS = 100  # recycle a warm interpreter after this many runs
+# Parent of the per-run working directories; None picks /dev/shm when available
+CODE_EXECUTION_SCRATCH_ROOT = None
+# Per-process cache of results for identical programs (0 disables it)
+CODE_EXECUTION_CACHE_SIZE = 1024
+CODE_EXECUTION_CACHE_TTL = 300  # seconds
+CODE_EXECUTION_CACHE_NONDETERMINISTIC = False  # also cache programs using random, time, input...
+# Per-run resource limits (None disables one); challenges can override them.
+# Processes are not limited: RLIMIT_NPROC counts every process and thread of
+# the OS user, which programs share with the web, pool and grader processes
+CODE_EXECUTION_CPU_LIMIT = 5  # CPU seconds, across all threads
+CODE_EXECUTION_MEMORY_LIMIT = 256  # MB of address space
+CODE_EXECUTION_OPEN_FILES_LIMIT = 64
+CODE_EXECUTION_FILE_SIZE_LIMIT = 10  # MB, largest file a program may write
+# Bytes of stdout plus stderr kept per run; longer output stops the program
+CODE_EXECUTION_OUTPUT_LIMIT = 64 * 1024
+# Code is parsed in the web process first so syntax errors skip the sandbox;
+# longer programs go straight to the sandbox (0 disables the check)
+CODE_EXECUTION_PRECHECK_MAX_SIZE = 100000  # characters
+CODE_EXECUTION_PRECHECK_CACHE_SIZE = 1024
+
+# Admission control for Run and Submit
+# Limits are shared between web processes through this cache alias, so point it
+# at a shared backend (Memcached, Redis, database) in multi-process deployments
+EXECUTION_ADMISSION_CACHE = 'default'
+EXECUTION_RATE_BURST = 10  # runs a user (or anonymous IP) may make back to back
+EXECUTION_RATE_PER_MINUTE = 30  # sustained runs per user/IP
+EXECUTION_MAX_IN_FLIGHT = 8  # programs running at once across all web processes
+EXECUTION_MAX_QUEUED = 16  # requests that may wait for a free slot
+EXECUTION_QUEUE_TIMEOUT = 5  # seconds a queued request waits before a 429
+
+# Serve Run and Submit from the async views in challenges/async_views.py.
+# Turn on when running under an ASGI server, e.g.
+#   uvicorn code_debugging_app.asgi:application
+# and raise EXECUTION_MAX_IN_FLIGHT to what the machine can run at once
+ASYNC_EXECUTION_VIEWS = False
+CODE_EXECUTION_ASYNC_MAX_CHILDREN = 256  # programs one ASGI process supervises at once
+
+# Grading
+# 'sync' grades inside the submit request; 'queue' stores a pending submission
+# and leaves it to `manage.py run_graders`
+GRADING_MODE = 'sync'
+GRADING_JOB_LEASE = 60  # seconds before a running job is assumed abandoned
+GRADING_JOB_MAX_ATTEMPTS = 3
+SUBMIT_BATCH_MAX_SIZE = 10  # challenges one batch submission may cover
+ATTEMPT_HISTORY_LIMIT = 50  # newest attempts returned by the attempt history endpoint
+
+# Admin dashboard statistics are cached for this long. Week, challenge and
+# user changes drop them at once; submissions only show up once they expire
+ADMIN_STATS_MAX_AGE = 30  # seconds
+
+# Per-user cached fragments of the week page; saves expire them early
+WEEK_PAGE_CACHE_TIMEOUT = 600  # seconds
+# Challenge-wide parts of the challenge page; keyed on the challenge's last edit
+CHALLENGE_PAGE_CACHE_TIMEOUT = 3600  # seconds
+
+# Which week is current is cached until the next week starts or ends and
+# dropped when a week is saved; this bounds how old it can get otherwise
+WEEK_SCHEDULE_MAX_AGE = 3600  # seconds
+
+# Metrics served on /metrics. Each process writes its numbers to METRICS_DIR,
+# created private to the server's user, so the endpoint can add them up; set
+# it to None to report the serving process only
+METRICS_DIR = BASE_DIR / 'metrics'
+METRICS_FLUSH_INTERVAL = 1.0  # seconds between snapshot writes per process
+METRICS_BEARER_TOKEN = None  # lets a scraper fetch /metrics without logging in
+
+# What a view running more queries than its @query_budget allows does:
+# 'raise' or 'log'. The test runner raises, so a test going over fails
+QUERY_BUDGET_ACTION = 'log'
+TEST_RUNNER = 'monitoring.runner.QueryBudgetTestRunner'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
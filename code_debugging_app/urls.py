@@ -15,10 +15,11 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from django.shortcuts import redirect
+from assets.views import serve as serve_static
 
 def home_redirect(request):
     return redirect('authentication:login')
@@ -29,8 +30,12 @@ urlpatterns = [
     path('auth/', include('authentication.urls')), 
     path('challenges/', include('challenges.urls')),
     path('dashboard/', include('dashboard.urls')),
+    path('leaderboard/', include('leaderboard.urls')),
+    path('metrics', include('monitoring.urls')),
 ]
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATICFILES_DIRS[0])
+elif getattr(settings, 'SERVE_STATIC_FILES', False):
+    urlpatterns += [re_path(rf'^{settings.STATIC_URL.strip("/")}/(?P<path>.*)$', serve_static)]
@@ -0,0 +1,34 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from authentication.models import CustomUser
+from challenges.models import Week, Challenge
+from challenges.signals import submissions_bulk_updated
+from .stats import invalidate_admin_stats
+
+# Fields of a user that the admin statistics show or count
+USER_STATS_FIELDS = {'username', 'user_type'}
+
+
+# Submissions are left to ADMIN_STATS_MAX_AGE; see stats.py
+@receiver(post_save, sender=Challenge)
+@receiver(post_delete, sender=Challenge)
+@receiver(post_save, sender=Week)
+@receiver(post_delete, sender=Week)
+@receiver(post_delete, sender=CustomUser)
+def content_changed(sender, **kwargs):
+    invalidate_admin_stats()
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, created, update_fields=None, **kwargs):
+    # Logins save last_login on every request that signs in; skip those
+    if created or update_fields is None or USER_STATS_FIELDS & set(update_fields):
+        invalidate_admin_stats()
+
+
+@receiver(submissions_bulk_updated)
+def submissions_regraded(sender, user_ids, **kwargs):
+    # A regrade rewrites everyone's submissions at an admin's request
+    if user_ids is None:
+        invalidate_admin_stats()
@@ -0,0 +1,73 @@
+"""
+Site-wide statistics for the admin dashboard.
+
+They are computed once and kept in the default cache for
+``ADMIN_STATS_MAX_AGE`` seconds. Saving or deleting a Challenge, Week or user
+drops the cached copy (see ``dashboard.signals``), as does a regrade.
+Submissions do not: during a contest they are saved many times a second,
+which would leave the cache almost always cold, so new ones show up when the
+copy expires or when an admin asks for a recount.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from authentication.models import CustomUser
+from challenges.models import Week, Challenge, Submission
+
+CACHE_KEY = 'dashboard:admin-stats'
+
+
+def compute_admin_stats():
+    """Run the dashboard queries and return plain, cacheable data"""
+    recent_submissions = Submission.objects.select_related(
+        'user', 'challenge', 'challenge__week'
+    ).order_by('-submitted_at')[:10]
+
+    weekly_stats = Week.objects.annotate(
+        challenge_count=Count('challenges', distinct=True),
+        submission_count=Count('challenges__submission')
+    ).order_by('-week_number')[:5]
+
+    return {
+        'total_users': CustomUser.objects.filter(user_type='user').count(),
+        'total_weeks': Week.objects.count(),
+        'total_challenges': Challenge.objects.count(),
+        'total_submissions': Submission.objects.count(),
+        'recent_submissions': [
+            {
+                'username': submission.user.username,
+                'challenge_title': submission.challenge.title,
+                'week_number': submission.challenge.week.week_number,
+                'status': submission.status,
+                'status_display': submission.get_status_display(),
+                'points_earned': submission.points_earned,
+                'submitted_at': submission.submitted_at,
+            }
+            for submission in recent_submissions
+        ],
+        'weekly_stats': [
+            {
+                'week_number': week.week_number,
+                'title': week.title,
+                'challenge_count': week.challenge_count,
+                'submission_count': week.submission_count,
+            }
+            for week in weekly_stats
+        ],
+        'computed_at': timezone.now(),
+    }
+
+
+def get_admin_stats(refresh=False):
+    """Return the cached statistics, computing them on a miss or when asked to"""
+    stats = None if refresh else cache.get(CACHE_KEY)
+    if stats is None:
+        stats = compute_admin_stats()
+        cache.set(CACHE_KEY, stats, timeout=getattr(settings, 'ADMIN_STATS_MAX_AGE', 30))
+    return stats
+
+
+def invalidate_admin_stats():
+    cache.delete(CACHE_KEY)
@@ -1,3 +1,66 @@
+from datetime import date, timedelta
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+
+from authentication.models import CustomUser
+from challenges.models import Week, Challenge, Submission
+from .stats import CACHE_KEY
+
+
+class AdminStatsCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        cls.student = CustomUser.objects.create_user('student', 'student@example.com', 'pass')
+        cls.week = Week.objects.create(
+            week_number=1, title='Loops', description='Week one',
+            start_date=date.today() - timedelta(days=1),
+            end_date=date.today() + timedelta(days=5)
+        )
+        cls.challenge = Challenge.objects.create(
+            week=cls.week, title='Sum', description='Fix the sum', buggy_code='print(3)',
+            expected_output='2', points=3, order=1, created_by=cls.admin
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+        self.url = reverse('dashboard:admin_dashboard')
+
+    def test_cache_hit_runs_no_statistics_queries(self):
+        self.client.get(self.url)
+        # The session and the user are cached as well
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['total_challenges'], 1)
+
+    def test_submissions_wait_for_the_cache_to_expire(self):
+        self.client.get(self.url)
+        Submission.objects.create(user=self.student, challenge=self.challenge, submitted_code='print(2)')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).context['total_submissions'], 0)
+
+        cache.delete(CACHE_KEY)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['total_submissions'], 1)
+        self.assertEqual(response.context['weekly_stats'][0]['submission_count'], 1)
+        self.assertEqual(response.context['recent_submissions'][0]['username'], 'student')
+
+    def test_login_does_not_invalidate(self):
+        self.client.get(self.url)
+        self.client.login(username='student', password='pass')
+        self.client.force_login(self.admin)
+        # Logging in saved last_login, so only the user is reloaded
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_recompute_now(self):
+        before = self.client.get(self.url).context['total_users']
+        # Queryset updates bypass signals, so the cached numbers go stale
+        CustomUser.objects.filter(pk=self.student.pk).update(user_type='admin')
+        self.assertEqual(self.client.get(self.url).context['total_users'], before)
 
-# Create your tests here.
+        response = self.client.post(reverse('dashboard:refresh_admin_stats'), follow=True)
+        self.assertEqual(response.context['total_users'], before - 1)
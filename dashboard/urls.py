@@ -6,4 +6,5 @@ app_name = 'dashboard'
 urlpatterns = [
     path('user/', views.user_dashboard, name='user_dashboard'),
     path('admin/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin/refresh-stats/', views.refresh_admin_stats, name='refresh_admin_stats'),
 ]
\ No newline at end of file
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import LeaderboardEntry
+
+@admin.register(LeaderboardEntry)
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = ['board', 'user', 'score', 'updated_at']
+    list_filter = ['board']
+    search_fields = ['user__username']
+    readonly_fields = ['board', 'user', 'score', 'updated_at']
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from challenges.models import Week
+from leaderboard import ranking
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized leaderboards from user scores and weekly progress'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--week', type=int, help='Only rebuild this week number')
+        parser.add_argument('--global-only', action='store_true', help='Only rebuild the all-time board')
+
+    def handle(self, *args, **options):
+        boards = []
+        if options['week'] is None:
+            boards.append(ranking.GLOBAL_BOARD)
+        if not options['global_only']:
+            weeks = Week.objects.all()
+            if options['week'] is not None:
+                weeks = weeks.filter(week_number=options['week'])
+            boards.extend(ranking.week_board(week_id) for week_id in weeks.values_list('id', flat=True))
+
+        for board in boards:
+            entries = ranking.rebuild(board)
+            self.stdout.write(f'{board}: {entries} entries')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(boards)} leaderboards'))
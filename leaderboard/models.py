@@ -0,0 +1,30 @@
+from django.db import models
+from django.conf import settings
+
+class LeaderboardEntry(models.Model):
+    """A user's current score on one board ('global' or 'week:<id>')"""
+    board = models.CharField(max_length=20)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    score = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['board', 'user']
+        indexes = [
+            models.Index(fields=['board', '-score', 'user'], name='leaderboard_top_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.board}: {self.user.username} ({self.score})"
+
+class ScoreCount(models.Model):
+    """One node of a board's Fenwick tree counting users per score"""
+    board = models.CharField(max_length=20)
+    node = models.IntegerField()
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['board', 'node']
+    
+    def __str__(self):
+        return f"{self.board} node {self.node}: {self.count}"
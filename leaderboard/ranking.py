@@ -0,0 +1,256 @@
+"""
+Materialized leaderboards.
+
+Every board ('global' for ``CustomUser.total_score``, 'week:<id>' for
+``UserProgress.points_earned``) keeps one LeaderboardEntry per user, indexed
+on (board, -score, user) so the top N is a single index range scan, and a
+Fenwick tree over scores stored as ScoreCount rows. A user's rank is one plus
+the number of users with a higher score, which the tree answers by reading
+O(log MAX_SCORE) rows in one query no matter how many users are on the board.
+
+Score changes are applied as they happen (see ``grading.update_scores``),
+all of a user's boards at once: one read of their entries, one UPDATE of the
+entries and one of the tree nodes. ``manage.py rebuild_leaderboard`` rebuilds
+a board from the source tables.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F, Q, Case, When, Value, IntegerField
+from django.utils import timezone
+
+from authentication.models import CustomUser
+from challenges.models import UserProgress
+from .models import LeaderboardEntry, ScoreCount
+
+GLOBAL_BOARD = 'global'
+
+# Scores are bucketed into 0..MAX_SCORE; higher scores share the top bucket
+TREE_SIZE = 1 << 16
+MAX_SCORE = TREE_SIZE - 1
+
+
+def week_board(week_id):
+    return f'week:{week_id}'
+
+
+def _position(score):
+    """Fenwick tree position (1-based) of a score"""
+    return min(max(score, 0), MAX_SCORE) + 1
+
+
+def _update_path(position):
+    while position <= TREE_SIZE:
+        yield position
+        position += position & -position
+
+
+def _prefix_path(position):
+    while position > 0:
+        yield position
+        position -= position & -position
+
+
+def _source_score(board, user_id):
+    """Read a user's score for a board from the table it mirrors"""
+    if board == GLOBAL_BOARD:
+        scores = CustomUser.objects.filter(pk=user_id)
+        field = 'total_score'
+    else:
+        scores = UserProgress.objects.filter(user_id=user_id, week_id=int(board.split(':', 1)[1]))
+        field = 'points_earned'
+    return scores.values_list(field, flat=True).first() or 0
+
+
+def _nodes(node_deltas):
+    """Filter for the (board, node) keys of node_deltas"""
+    by_board = defaultdict(list)
+    for board, node in node_deltas:
+        by_board[board].append(node)
+    condition = Q()
+    for board, nodes in by_board.items():
+        condition |= Q(board=board, node__in=nodes)
+    return condition
+
+
+def _add_to_nodes(node_deltas):
+    return ScoreCount.objects.filter(_nodes(node_deltas)).update(
+        count=F('count') + Case(
+            *[When(board=board, node=node, then=Value(delta)) for (board, node), delta in node_deltas.items()],
+            default=Value(0),
+            output_field=IntegerField()
+        )
+    )
+
+
+def _adjust_counts(changes):
+    """Apply {board: {score: change in user count}} to the boards' trees, in one query once their nodes exist"""
+    node_deltas = defaultdict(int)
+    for board, counts in changes.items():
+        for score, delta in counts.items():
+            for node in _update_path(_position(score)):
+                node_deltas[board, node] += delta
+    node_deltas = {key: delta for key, delta in node_deltas.items() if delta}
+    if not node_deltas or _add_to_nodes(node_deltas) == len(node_deltas):
+        return
+
+    # Create the nodes these scores have never reached, then add to just those
+    present = set(ScoreCount.objects.filter(_nodes(node_deltas)).values_list('board', 'node'))
+    missing = {key: delta for key, delta in node_deltas.items() if key not in present}
+    ScoreCount.objects.bulk_create(
+        [ScoreCount(board=board, node=node) for board, node in missing],
+        ignore_conflicts=True
+    )
+    _add_to_nodes(missing)
+
+
+def _move(entry, score, counted):
+    changes = Counter()
+    if counted:
+        changes[entry.score] -= 1
+    changes[score] += 1
+    entry.score = score
+    entry.save(update_fields=['score', 'updated_at'])
+    _adjust_counts({entry.board: changes})
+
+
+def apply_score_deltas(user_id, deltas):
+    """Move a user on each board in {board: delta} by the change just applied to its source score"""
+    deltas = {board: delta for board, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic(savepoint=False):
+        entries = {
+            entry.board: entry
+            for entry in LeaderboardEntry.objects.select_for_update().filter(user_id=user_id, board__in=deltas)
+        }
+        changes = defaultdict(Counter)
+        for board, delta in deltas.items():
+            entry = entries.get(board)
+            if entry is None:
+                # A user's first entry takes the source score, which already includes delta
+                entry, created = LeaderboardEntry.objects.select_for_update().get_or_create(
+                    board=board,
+                    user_id=user_id,
+                    defaults={'score': _source_score(board, user_id)}
+                )
+                if created:
+                    changes[board][entry.score] += 1
+                    continue
+                entries[board] = entry
+            changes[board][entry.score] -= 1
+            changes[board][entry.score + delta] += 1
+
+        moved = {board: deltas[board] for board in entries}
+        if moved:
+            LeaderboardEntry.objects.filter(user_id=user_id, board__in=moved).update(
+                score=F('score') + Case(
+                    *[When(board=board, then=Value(delta)) for board, delta in moved.items()],
+                    default=Value(0),
+                    output_field=IntegerField()
+                ),
+                updated_at=timezone.now()
+            )
+        _adjust_counts(changes)
+
+
+def apply_score_delta(board, user_id, delta):
+    """Move a user on a board by the change just applied to the source score"""
+    apply_score_deltas(user_id, {board: delta})
+
+
+def set_score(board, user_id, score):
+    """Put a user on a board with an absolute score"""
+    with transaction.atomic(savepoint=False):
+        entry, created = LeaderboardEntry.objects.select_for_update().get_or_create(
+            board=board,
+            user_id=user_id,
+            defaults={'score': score}
+        )
+        if created:
+            _adjust_counts({board: {score: 1}})
+        elif entry.score != score:
+            _move(entry, score, counted=True)
+
+
+def remove_user(board, user_id):
+    """Take a user off a board"""
+    with transaction.atomic(savepoint=False):
+        entry = LeaderboardEntry.objects.select_for_update().filter(board=board, user_id=user_id).first()
+        if entry is not None:
+            entry.delete()
+            _adjust_counts({board: {entry.score: -1}})
+
+
+def count_above(board, score):
+    """Return (users with a higher score, users on the board)"""
+    position = _position(score)
+    prefix = list(_prefix_path(position))
+    counts = dict(
+        ScoreCount.objects.filter(board=board, node__in=prefix + [TREE_SIZE]).values_list('node', 'count')
+    )
+    total = counts.get(TREE_SIZE, 0)
+    at_or_below = sum(counts.get(node, 0) for node in prefix)
+    return total - at_or_below, total
+
+
+def rank_of(board, user_id):
+    """Return the user's {'rank', 'score', 'total'} on a board, or None if absent"""
+    score = LeaderboardEntry.objects.filter(board=board, user_id=user_id).values_list('score', flat=True).first()
+    if score is None:
+        return None
+    above, total = count_above(board, score)
+    return {'rank': above + 1, 'score': score, 'total': total}
+
+
+def top(board, limit=10):
+    """Return the board's first limit entries as dicts with rank, tied users sharing one"""
+    entries = LeaderboardEntry.objects.filter(board=board).select_related('user').order_by('-score', 'user_id')[:limit]
+    rows = []
+    for position, entry in enumerate(entries, 1):
+        # Ties are decided by bucket, as in rank_of()
+        tied = rows and _position(rows[-1]['score']) == _position(entry.score)
+        rank = rows[-1]['rank'] if tied else position
+        rows.append({
+            'rank': rank,
+            'user_id': entry.user_id,
+            'username': entry.user.username,
+            'score': entry.score,
+        })
+    return rows
+
+
+def rebuild(board):
+    """Recreate a board from its source table; return the number of entries"""
+    if board == GLOBAL_BOARD:
+        scores = CustomUser.objects.filter(is_superuser=False).values_list('id', 'total_score')
+    else:
+        scores = UserProgress.objects.filter(week_id=int(board.split(':', 1)[1])).values_list('user_id', 'points_earned')
+
+    with transaction.atomic(savepoint=False):
+        LeaderboardEntry.objects.filter(board=board).delete()
+        ScoreCount.objects.filter(board=board).delete()
+
+        tree = [0] * (TREE_SIZE + 1)
+        batch = []
+        entries = 0
+        for user_id, score in scores.iterator(chunk_size=5000):
+            tree[_position(score)] += 1
+            batch.append(LeaderboardEntry(board=board, user_id=user_id, score=score))
+            if len(batch) >= 5000:
+                LeaderboardEntry.objects.bulk_create(batch)
+                entries += len(batch)
+                batch = []
+        LeaderboardEntry.objects.bulk_create(batch)
+        entries += len(batch)
+
+        # Build the tree from per-score counts in linear time
+        for node in range(1, TREE_SIZE + 1):
+            parent = node + (node & -node)
+            if parent <= TREE_SIZE:
+                tree[parent] += tree[node]
+        ScoreCount.objects.bulk_create(
+            [ScoreCount(board=board, node=node, count=count) for node, count in enumerate(tree) if count],
+            batch_size=5000
+        )
+    return entries
@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from authentication.models import CustomUser
+from challenges.models import UserProgress, Week
+from . import ranking
+from .models import LeaderboardEntry, ScoreCount
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the global board in step with scores set outside of grading"""
+    if update_fields is not None and 'total_score' not in update_fields:
+        return
+    if instance.is_superuser:
+        ranking.remove_user(ranking.GLOBAL_BOARD, instance.pk)
+    else:
+        ranking.set_score(ranking.GLOBAL_BOARD, instance.pk, instance.total_score)
+
+
+@receiver(pre_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    """Uncount the user's scores before their entries cascade away"""
+    for entry in LeaderboardEntry.objects.filter(user=instance):
+        ranking.remove_user(entry.board, instance.pk)
+
+
+@receiver(post_save, sender=UserProgress)
+def progress_saved(sender, instance, **kwargs):
+    """Recounted progress rows carry absolute weekly scores"""
+    ranking.set_score(ranking.week_board(instance.week_id), instance.user_id, instance.points_earned)
+
+
+@receiver(post_delete, sender=Week)
+def week_deleted(sender, instance, **kwargs):
+    board = ranking.week_board(instance.pk)
+    LeaderboardEntry.objects.filter(board=board).delete()
+    ScoreCount.objects.filter(board=board).delete()
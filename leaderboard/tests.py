@@ -0,0 +1,115 @@
+from datetime import date, timedelta
+import random
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from authentication.models import CustomUser
+from challenges.grading import grade_submission
+from challenges.models import Week, Challenge
+from . import ranking
+from .models import LeaderboardEntry
+
+
+def naive_rank(scores, user_id):
+    return 1 + sum(1 for score in scores.values() if score > scores[user_id])
+
+
+class RankingTests(TestCase):
+    def test_ranks_match_a_full_sort(self):
+        rng = random.Random(7)
+        scores = {}
+        for i in range(60):
+            user = CustomUser.objects.create_user(f'user{i}', total_score=rng.randrange(0, 20))
+            scores[user.pk] = user.total_score
+
+        # Move some users around, including ties and scores past the top bucket
+        for user_id in rng.sample(sorted(scores), 20):
+            delta = rng.choice([-3, -1, 2, 5, ranking.MAX_SCORE])
+            CustomUser.objects.filter(pk=user_id).update(total_score=scores[user_id] + delta)
+            ranking.apply_score_delta(ranking.GLOBAL_BOARD, user_id, delta)
+            scores[user_id] += delta
+
+        capped = {user_id: min(score, ranking.MAX_SCORE) for user_id, score in scores.items()}
+        for user_id in scores:
+            result = ranking.rank_of(ranking.GLOBAL_BOARD, user_id)
+            self.assertEqual(result['score'], scores[user_id])
+            self.assertEqual(result['rank'], naive_rank(capped, user_id))
+            self.assertEqual(result['total'], len(scores))
+
+        top = ranking.top(ranking.GLOBAL_BOARD, 10)
+        self.assertEqual([row['score'] for row in top], sorted(scores.values(), reverse=True)[:10])
+        for row in top:
+            self.assertEqual(row['rank'], naive_rank(capped, row['user_id']))
+
+    def test_rank_lookup_is_two_queries(self):
+        users = [CustomUser.objects.create_user(f'user{i}', total_score=i % 7) for i in range(30)]
+        with self.assertNumQueries(2):
+            ranking.rank_of(ranking.GLOBAL_BOARD, users[3].pk)
+
+    def test_rebuild_matches_incremental_updates(self):
+        for i in range(25):
+            CustomUser.objects.create_user(f'user{i}', total_score=(i * 7) % 11)
+        before = {
+            user_id: ranking.rank_of(ranking.GLOBAL_BOARD, user_id)
+            for user_id in CustomUser.objects.values_list('id', flat=True)
+        }
+        call_command('rebuild_leaderboard', stdout=open('/dev/null', 'w'))
+        for user_id, result in before.items():
+            self.assertEqual(ranking.rank_of(ranking.GLOBAL_BOARD, user_id), result)
+
+    def test_deleted_user_leaves_the_board(self):
+        first = CustomUser.objects.create_user('first', total_score=5)
+        second = CustomUser.objects.create_user('second', total_score=9)
+        second.delete()
+        self.assertEqual(ranking.rank_of(ranking.GLOBAL_BOARD, first.pk), {'rank': 1, 'score': 5, 'total': 1})
+
+
+class GradingLeaderboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        cls.alice = CustomUser.objects.create_user('alice', password='pass')
+        cls.bob = CustomUser.objects.create_user('bob', password='pass')
+        cls.week = Week.objects.create(
+            week_number=1, title='Loops', description='Week one',
+            start_date=date.today() - timedelta(days=1),
+            end_date=date.today() + timedelta(days=5)
+        )
+        cls.challenge = Challenge.objects.create(
+            week=cls.week, title='Sum', description='Fix the sum', buggy_code='print(3)',
+            expected_output='2', points=3, order=1, created_by=cls.admin
+        )
+
+    def grade(self, user, output):
+        with mock.patch('challenges.grading.execute_python_code', return_value={'output': output, 'error': None}):
+            grade_submission(user, self.challenge, 'print(2)')
+
+    def test_grading_moves_both_boards(self):
+        self.grade(self.bob, '2\n')
+        weekly = ranking.week_board(self.week.pk)
+        self.assertEqual(ranking.rank_of(ranking.GLOBAL_BOARD, self.bob.pk)['rank'], 1)
+        self.assertEqual(ranking.rank_of(weekly, self.bob.pk), {'rank': 1, 'score': 3, 'total': 1})
+
+        self.grade(self.alice, '2\n')
+        self.grade(self.bob, 'wrong')
+        self.assertEqual(ranking.rank_of(ranking.GLOBAL_BOARD, self.alice.pk)['rank'], 1)
+        self.assertEqual(ranking.rank_of(ranking.GLOBAL_BOARD, self.bob.pk), {'rank': 2, 'score': 0, 'total': 2})
+        self.assertEqual(ranking.rank_of(weekly, self.bob.pk), {'rank': 2, 'score': 0, 'total': 2})
+        self.assertFalse(LeaderboardEntry.objects.filter(user=self.admin).exists())
+
+    def test_api_and_page(self):
+        self.grade(self.alice, '2\n')
+        self.client.force_login(self.bob)
+
+        data = self.client.get(reverse('leaderboard:leaderboard_api'), {'week': 1}).json()
+        self.assertEqual(data['top'], [{'rank': 1, 'username': 'alice', 'score': 3}])
+        self.assertIsNone(data['me'])
+        data = self.client.get(reverse('leaderboard:leaderboard_api')).json()
+        self.assertEqual(data['me'], {'rank': 2, 'score': 0, 'total': 2})
+        self.assertEqual(self.client.get(reverse('leaderboard:leaderboard_api'), {'limit': 'x'}).status_code, 400)
+
+        response = self.client.get(reverse('leaderboard:week_leaderboard', args=[1]))
+        self.assertContains(response, 'alice')
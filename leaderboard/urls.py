@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+app_name = 'leaderboard'
+
+urlpatterns = [
+    path('', views.leaderboard, name='leaderboard'),
+    path('week/<int:week_number>/', views.leaderboard, name='week_leaderboard'),
+    path('api/', views.leaderboard_api, name='leaderboard_api'),
+]
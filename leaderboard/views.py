@@ -0,0 +1,50 @@
+from django.shortcuts import render, get_object_or_404
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from challenges import schedule
+from challenges.models import Week
+from monitoring.query_budget import query_budget
+from . import ranking
+
+MAX_LIMIT = 100
+
+
+def _board_data(request, week=None, limit=10):
+    board = ranking.week_board(week.pk) if week else ranking.GLOBAL_BOARD
+    return {
+        'board': board,
+        'top': ranking.top(board, limit),
+        'me': ranking.rank_of(board, request.user.pk),
+    }
+
+
+@login_required
+@query_budget(6)
+def leaderboard(request, week_number=None):
+    week = get_object_or_404(Week, week_number=week_number) if week_number is not None else None
+    context = _board_data(request, week, limit=50)
+    context.update({
+        'week': week,
+        'all_weeks': schedule.all_weeks(),
+    })
+    return render(request, 'leaderboard/leaderboard.html', context)
+
+
+@login_required
+@query_budget(4)
+def leaderboard_api(request):
+    week = None
+    if request.GET.get('week'):
+        try:
+            week = get_object_or_404(Week, week_number=int(request.GET['week']))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid week'}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit'}, status=400)
+
+    data = _board_data(request, week, limit)
+    for row in data['top']:
+        del row['user_id']
+    return JsonResponse(data)
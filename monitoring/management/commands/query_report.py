@@ -0,0 +1,86 @@
+import os
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+from challenges import loadtest
+from monitoring import query_plans
+from monitoring.query_budget import budget_of
+
+
+class Command(BaseCommand):
+    help = (
+        'Request the main pages on a freshly seeded SQLite database and report queries per view '
+        'against their budgets, plus every query that scans a whole table. '
+        'Run with --settings=code_debugging_app.bench_settings'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Students to seed')
+        parser.add_argument('--weeks', type=int, default=8, help='Weeks to seed')
+        parser.add_argument('--challenges', type=int, default=5, help='Challenges per week')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per scenario, the first ones seed submissions')
+        parser.add_argument('--strict', action='store_true', help='Fail if any view is over budget or any query scans a table')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The report recreates its database; run it with --settings=code_debugging_app.bench_settings')
+
+        database = connection.settings_dict['NAME']
+        connection.close()
+        if os.path.exists(database):
+            os.remove(database)
+        call_command('migrate', verbosity=0)
+        admin, students = loadtest.seed(options['users'], options['weeks'], options['challenges'])
+        scenarios = loadtest.build_scenarios(admin, students)
+
+        clients = {}
+        statements = {}
+        over_budget = []
+        self.stdout.write(f'{"scenario":<18} {"view":<36} {"max queries":>11} {"budget":>7}')
+        for name, factory in scenarios.items():
+            most = 0
+            for i in range(options['requests']):
+                method, path, body, user = factory(i)
+                if user.pk not in clients:
+                    clients[user.pk] = Client(HTTP_HOST='localhost')
+                    clients[user.pk].force_login(user)
+                # Measure the uncached path
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    if method == 'POST':
+                        clients[user.pk].post(path, data=body, content_type='application/json')
+                    else:
+                        clients[user.pk].get(path)
+                most = max(most, len(queries))
+                for query in queries.captured_queries:
+                    statements.setdefault(query_plans.normalize(query['sql']), (name, query['sql']))
+
+            match = resolve(path)
+            budget = budget_of(match)
+            if budget is not None and most > budget:
+                over_budget.append(name)
+            self.stdout.write(f'{name:<18} {match.view_name:<36} {most:>11} {budget if budget is not None else "-":>7}')
+
+        scans = []
+        for name, sql in statements.values():
+            for line in query_plans.full_scans(connection, sql):
+                scans.append((name, line, sql))
+
+        self.stdout.write('')
+        if scans:
+            self.stdout.write(self.style.WARNING(f'{len(scans)} full table scans:'))
+            for name, line, sql in scans:
+                self.stdout.write(f'  [{name}] {line}\n      {sql[:300]}')
+        else:
+            self.stdout.write(self.style.SUCCESS('No full table scans'))
+
+        if over_budget:
+            self.stdout.write(self.style.WARNING(f'Over budget: {", ".join(over_budget)}'))
+        if options['strict'] and (scans or over_budget):
+            raise CommandError('Query report found problems')
@@ -0,0 +1,323 @@
+"""
+A small in-process metrics registry with Prometheus text exposition.
+
+Metrics are declared once at import time::
+
+    RUNS = metrics.counter('execution_runs_total', 'Programs run', ['outcome'])
+    RUNS.inc(outcome='ok')
+
+Every process keeps its own values in memory and, at most every
+``METRICS_FLUSH_INTERVAL`` seconds, writes a snapshot to
+``METRICS_DIR/<pid>.json``, and once more at exit. ``render()`` merges the
+snapshots of all processes that share the directory: counters and
+histograms are summed over every process that ever wrote one, gauges only
+over processes still alive. Snapshots of finished processes are folded into
+``retired.json`` and deleted. Clear the directory when deploying, as
+counters from earlier processes are otherwise kept. The directory must
+belong to the server's user and be writable by no one else, or only the
+current process is reported; the same goes for ``METRICS_DIR = None``.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    def __init__(self, registry, kind, name, documentation, labelnames, buckets=None):
+        self.registry = registry
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if buckets else None
+        self.values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def track(self, **labels):
+        """Context manager that counts the block as in progress"""
+        return _InProgress(self, labels)
+
+
+class _InProgress:
+    def __init__(self, gauge, labels):
+        self.gauge = gauge
+        self.labels = labels
+
+    def __enter__(self):
+        self.gauge.inc(**self.labels)
+
+    def __exit__(self, *exc_info):
+        self.gauge.dec(**self.labels)
+
+
+class Histogram(Metric):
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            state = self.values.get(key)
+            if state is None:
+                # Per-bucket (not cumulative) counts plus one for +Inf, sum
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.last_flush = 0.0
+
+    def register(self, cls, name, documentation, labelnames=(), **kwargs):
+        with self.lock:
+            if name in self.metrics:
+                return self.metrics[name]
+            metric = self.metrics[name] = cls(self, cls.__name__.lower(), name, documentation, labelnames, **kwargs)
+            return metric
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: {
+                    'type': metric.kind,
+                    'help': metric.documentation,
+                    'labels': metric.labelnames,
+                    'buckets': metric.buckets,
+                    'values': [[list(key), value] for key, value in metric.values.items()],
+                }
+                for name, metric in self.metrics.items()
+            }
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter, name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge, name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram, name, documentation, labelnames, buckets=sorted(buckets))
+
+
+# Threads of one process take turns writing its snapshot
+_flush_lock = threading.Lock()
+
+
+RETIRED = 'retired.json'
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def _write_snapshot(directory, filename, data):
+    """Replace directory/filename with data in one step"""
+    fd, temp = tempfile.mkstemp(dir=directory, prefix=f'{os.getpid()}-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp, os.path.join(directory, filename))
+    except OSError:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+
+
+def flush(force=False):
+    """Write this process's snapshot if the flush interval has passed
+
+    Never raises: a failed export is logged and retried on the next flush.
+    """
+    directory = metrics_dir()
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - REGISTRY.last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0):
+        return
+    REGISTRY.last_flush = now
+
+    with _flush_lock:
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            _write_snapshot(directory, f'{os.getpid()}.json', {'pid': os.getpid(), 'metrics': REGISTRY.snapshot()})
+        except OSError:
+            logger.exception('Could not write metrics to %s', directory)
+
+
+def _flush_at_exit():
+    if settings.configured:
+        flush(force=True)
+
+
+atexit.register(_flush_at_exit)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _is_private(directory):
+    """Whether only this user can have written the snapshots in directory"""
+    try:
+        info = os.stat(directory)
+    except OSError:
+        return False
+    return info.st_uid == os.getuid() and not info.st_mode & 0o022
+
+
+def _read_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(merged, snapshot, alive):
+    for name, data in snapshot.items():
+        if data['type'] == 'gauge' and not alive:
+            continue
+        target = merged.setdefault(name, dict(data, values={}))
+        for key, value in data['values']:
+            key = tuple(key)
+            if data['type'] == 'histogram':
+                counts, total = target['values'].get(key, [[0] * len(value[0]), 0.0])
+                target['values'][key] = [[a + b for a, b in zip(counts, value[0])], total + value[1]]
+            else:
+                target['values'][key] = target['values'].get(key, 0) + value
+
+
+def _as_snapshot(merged):
+    return {
+        name: dict(data, values=[[list(key), value] for key, value in data['values'].items()])
+        for name, data in merged.items()
+    }
+
+
+def _snapshots():
+    """(snapshot, alive) pairs for the live processes and one for all finished ones"""
+    directory = metrics_dir()
+    flush(force=True)
+    if not directory or not _is_private(directory):
+        if directory:
+            logger.error('Not reading metrics from %s: it must be owned by this user and not writable by others', directory)
+        return [(REGISTRY.snapshot(), True)]
+
+    snapshots = []
+    retired = {}
+    # Processes fold finished snapshots one at a time, so none is counted twice
+    with _flush_lock, open(os.path.join(directory, '.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        data = _read_snapshot(os.path.join(directory, RETIRED))
+        if data is not None:
+            _merge(retired, data['metrics'], alive=False)
+        finished = []
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json') or filename == RETIRED:
+                continue
+            data = _read_snapshot(os.path.join(directory, filename))
+            if data is None:
+                continue
+            if _pid_alive(data['pid']):
+                snapshots.append((data['metrics'], True))
+            else:
+                _merge(retired, data['metrics'], alive=False)
+                finished.append(filename)
+        if finished:
+            try:
+                _write_snapshot(directory, RETIRED, {'metrics': _as_snapshot(retired)})
+                for filename in finished:
+                    os.remove(os.path.join(directory, filename))
+            except OSError:
+                logger.exception('Could not retire metrics snapshots in %s', directory)
+    snapshots.append((_as_snapshot(retired), False))
+    return snapshots
+
+
+def collect():
+    """Merge the snapshots of all processes into {name: metric data}"""
+    merged = {}
+    for snapshot, alive in _snapshots():
+        _merge(merged, snapshot, alive)
+    return merged
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for name, data in sorted(collect().items()):
+        lines.append(f'# HELP {name} {data["help"]}')
+        lines.append(f'# TYPE {name} {data["type"]}')
+        for key, value in sorted(data['values'].items()):
+            if data['type'] != 'histogram':
+                lines.append(f'{name}{_labels(data["labels"], key)} {_number(value)}')
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(list(data['buckets']) + [float('inf')], counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(data["labels"], key, [("le", _number(float(bound)))])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(data["labels"], key)} {_number(float(total))}')
+            lines.append(f'{name}_count{_labels(data["labels"], key)} {cumulative}')
+    return '\n'.join(lines) + '\n'
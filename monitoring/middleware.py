@@ -0,0 +1,126 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connection
+
+from . import metrics, query_budget
+
+REQUESTS = metrics.counter('http_requests_total', 'HTTP requests by view, method and status', ['view', 'method', 'status'])
+LATENCY = metrics.histogram('http_request_duration_seconds', 'Time to produce a response, by view', ['view'])
+IN_FLIGHT = metrics.gauge('http_requests_in_flight', 'Requests currently being handled')
+QUERIES = metrics.histogram(
+    'db_queries_per_request', 'Database queries run by one request, by view', ['view'],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+)
+QUERY_TIME = metrics.counter('db_query_seconds_total', 'Time spent in database queries, by view', ['view'])
+
+
+class QueryCounter:
+    """Database wrapper counting the queries and query time of one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """Record latency and database work of every request, labelled by view name
+
+    Also checks each request against its view's query budget (see query_budget.py).
+    Works in both sync and async stacks, so async views stay async under ASGI.
+    A streamed response is measured once its body has been sent, since the
+    body runs queries of its own.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        counter = QueryCounter()
+        started = time.perf_counter()
+        IN_FLIGHT.inc()
+        try:
+            with connection.execute_wrapper(counter):
+                response = self.get_response(request)
+        finally:
+            IN_FLIGHT.dec()
+        return self.finish(request, response, started, counter)
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        IN_FLIGHT.inc()
+        # The ORM runs in the request's thread-sensitive thread, whose
+        # connection is not the event loop's, so the wrapper goes on there
+        wrappers = ExitStack()
+        try:
+            await sync_to_async(lambda: wrappers.enter_context(connection.execute_wrapper(counter)))()
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(wrappers.close)()
+        finally:
+            IN_FLIGHT.dec()
+        return self.finish(request, response, started, counter)
+
+    def finish(self, request, response, started, counter):
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.acount_body(response.streaming_content, request, response, started, counter)
+            else:
+                response.streaming_content = self.count_body(response.streaming_content, request, response, started, counter)
+            return response
+        return self.record(request, response, started, counter)
+
+    def count_body(self, content, request, response, started, counter):
+        sent = False
+        try:
+            with connection.execute_wrapper(counter):
+                yield from content
+            sent = True
+        finally:
+            # A body closed early is recorded but not held to the budget
+            self.record(request, response, started, counter, check_budget=sent)
+
+    async def acount_body(self, content, request, response, started, counter):
+        wrappers = ExitStack()
+        sent = False
+        try:
+            await sync_to_async(lambda: wrappers.enter_context(connection.execute_wrapper(counter)))()
+            try:
+                async for chunk in content:
+                    yield chunk
+            finally:
+                await sync_to_async(wrappers.close)()
+            sent = True
+        finally:
+            self.record(request, response, started, counter, check_budget=sent)
+
+    def record(self, request, response, started, counter, check_budget=True):
+        # View names, not paths, keep the number of label values bounded
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        LATENCY.observe(time.perf_counter() - started, view=view)
+        REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        QUERIES.observe(counter.count, view=view)
+        QUERY_TIME.inc(counter.seconds, view=view)
+        metrics.flush()
+        if check_budget:
+            query_budget.enforce(match, view, counter.count)
+        return response
@@ -0,0 +1,61 @@
+"""
+Per-view limits on database queries.
+
+Hot views declare the most queries one request may run::
+
+    @login_required
+    @query_budget(4)
+    def challenge_detail(request, challenge_id):
+        ...
+
+A budget is the count measured on the view's costliest path (a first visit
+or first correct answer, on boards whose tree nodes do not exist yet) plus
+one for loading a session that is not in this process's cache.
+
+``MetricsMiddleware`` counts every request's queries (session and user
+loading included) and checks them against the view's budget. With
+``QUERY_BUDGET_ACTION = 'raise'``, which ``QueryBudgetTestRunner`` sets for
+the test suite, an overrun raises QueryBudgetExceeded so the test that made
+the request fails; with ``'log'``, the default, it is logged and counted in
+``query_budget_exceeded_total``. Streamed responses are checked once their
+body has been sent.
+"""
+import logging
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+EXCEEDED = metrics.counter('query_budget_exceeded_total', 'Requests that ran more queries than their view allows', ['view'])
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(max_queries):
+    """Declare the most database queries a view may run per request"""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def budget_of(resolver_match):
+    if resolver_match is None:
+        return None
+    return getattr(resolver_match.func, 'query_budget', None)
+
+
+def enforce(resolver_match, view_name, queries):
+    """Report a request that went over its view's budget"""
+    budget = budget_of(resolver_match)
+    if budget is None or queries <= budget:
+        return
+    EXCEEDED.inc(view=view_name)
+    message = f'{view_name} ran {queries} queries, over its budget of {budget}'
+    if getattr(settings, 'QUERY_BUDGET_ACTION', 'log') == 'raise':
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
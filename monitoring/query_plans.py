@@ -0,0 +1,45 @@
+"""
+Spotting queries that read a whole table, from the database's own plan.
+
+Used by ``manage.py query_report``. Only SQLite, MySQL and PostgreSQL plans
+are understood; on other backends nothing is flagged.
+"""
+import re
+
+# Statements worth explaining; transaction control and inserts never scan
+EXPLAINABLE = re.compile(r'^\s*(SELECT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+
+def normalize(sql):
+    """SQL with literals replaced, so repeated queries group together"""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    sql = re.sub(r'\(\?(?:, \?)+\)', '(?...)', sql)
+    return ' '.join(sql.split())
+
+
+def full_scans(connection, sql):
+    """Return the plan lines of sql that scan a whole table"""
+    if not EXPLAINABLE.match(sql):
+        return []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            # SEARCH uses an index to find rows; SCAN visits all of them, in
+            # index order if USING INDEX, which a LIMIT cuts short. A
+            # covering-index scan, as COUNT(*) uses, leaves the table alone
+            limited = re.search(r'\bLIMIT\b', sql, re.IGNORECASE)
+            return [
+                detail for _, _, _, detail in cursor.fetchall()
+                if detail.startswith('SCAN ') and detail != 'SCAN CONSTANT ROW'
+                and 'COVERING INDEX' not in detail and not (limited and 'USING INDEX' in detail)
+            ]
+        if connection.vendor == 'mysql':
+            cursor.execute(f'EXPLAIN {sql}')
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            return [f'full scan of {row["table"]} (~{row["rows"]} rows)' for row in rows if row.get('type') == 'ALL']
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN {sql}')
+            return [row[0].strip() for row in cursor.fetchall() if 'Seq Scan' in row[0]]
+    return []
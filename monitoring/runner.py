@@ -0,0 +1,15 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+    """Test runner that fails any request going over its view's query budget"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.budget_settings = override_settings(QUERY_BUDGET_ACTION='raise')
+        self.budget_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.budget_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from datetime import date
+from unittest import mock
+
+from django.db import connection
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import ResolverMatch, resolve, reverse
+
+from authentication.models import CustomUser
+from challenges.executor import execute_python_code
+from challenges.models import Week, Submission
+from . import metrics, query_plans
+from .middleware import MetricsMiddleware
+from .query_budget import EXCEEDED, QueryBudgetExceeded, query_budget
+
+
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings_override = override_settings(METRICS_DIR=self.directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.staff = CustomUser.objects.create_user('staff', 'staff@example.com', 'pass', is_staff=True)
+        self.student = CustomUser.objects.create_user('student', 'student@example.com', 'pass')
+        self.url = reverse('monitoring:metrics')
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    @override_settings(METRICS_BEARER_TOKEN='secret')
+    def test_bearer_token(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_requests_and_executions_are_reported(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse('dashboard:admin_dashboard'))
+        execute_python_code('print("hi")')
+        body = self.client.get(self.url).content.decode()
+        self.assertIn('http_request_duration_seconds_bucket{view="dashboard:admin_dashboard",le="+Inf"}', body)
+        self.assertIn('db_queries_per_request_count{view="dashboard:admin_dashboard"}', body)
+        self.assertIn('execution_runs_total{outcome="completed"}', body)
+        self.assertIn('execution_phase_seconds_count{backend="subprocess",phase="spawn"}', body)
+        self.assertIn('execution_exit_codes_total{backend="subprocess",code="0"}', body)
+
+    def test_other_processes_are_summed(self):
+        metrics.counter('test_jobs_total', 'Jobs').inc(2)
+        metrics.gauge('test_busy', 'Busy').inc()
+        snapshot = metrics.REGISTRY.snapshot()
+        # One finished process, whose gauges no longer count
+        dead_pid = 2 ** 22 + 1
+        with open(os.path.join(self.directory.name, f'{dead_pid}.json'), 'w') as f:
+            json.dump({'pid': dead_pid, 'metrics': snapshot}, f)
+
+        collected = metrics.collect()
+        self.assertEqual(collected['test_jobs_total']['values'][()], 4)
+        self.assertEqual(collected['test_busy']['values'][()], 1)
+
+        # The finished process's snapshot is folded away and still counted once
+        self.assertNotIn(f'{dead_pid}.json', os.listdir(self.directory.name))
+        self.assertIn(metrics.RETIRED, os.listdir(self.directory.name))
+        self.assertEqual(metrics.collect()['test_jobs_total']['values'][()], 4)
+
+    def test_shared_directories_are_not_read(self):
+        metrics.counter('test_shared_total', 'Shared').inc()
+        forged = {'test_shared_total': {'type': 'counter', 'help': 'Shared', 'labels': [], 'buckets': None, 'values': [[[], 1000]]}}
+        with open(os.path.join(self.directory.name, '1.json'), 'w') as f:
+            json.dump({'pid': 1, 'metrics': forged}, f)
+        os.chmod(self.directory.name, 0o777)
+        with self.assertLogs('monitoring.metrics', 'ERROR'):
+            collected = metrics.collect()
+        self.assertLess(collected['test_shared_total']['values'][()], 1000)
+
+
+class MetricsFlushTests(SimpleTestCase):
+    def test_concurrent_flushes_and_write_errors_never_raise(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        errors = []
+
+        def flush_repeatedly():
+            try:
+                for _ in range(50):
+                    metrics.flush(force=True)
+            except Exception as e:
+                errors.append(e)
+
+        with override_settings(METRICS_DIR=directory.name):
+            threads = [threading.Thread(target=flush_repeatedly) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(os.listdir(directory.name), [f'{os.getpid()}.json'])
+
+        created = os.path.join(directory.name, 'created')
+        with override_settings(METRICS_DIR=created):
+            metrics.flush(force=True)
+        self.assertEqual(os.stat(created).st_mode & 0o777, 0o700)
+
+        with override_settings(METRICS_DIR=os.path.join(directory.name, f'{os.getpid()}.json', 'nested')):
+            with self.assertLogs('monitoring.metrics', 'ERROR'):
+                metrics.flush(force=True)
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('student', 'student@example.com', 'pass')
+        self.client.force_login(self.user)
+        self.url = reverse('leaderboard:leaderboard_api')
+
+    @override_settings(QUERY_BUDGET_ACTION='raise')
+    def test_overrun_fails_the_request(self):
+        with mock.patch.object(resolve(self.url).func, 'query_budget', 1):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(self.url)
+
+    @override_settings(QUERY_BUDGET_ACTION='log')
+    def test_overrun_is_counted_when_logging(self):
+        before = EXCEEDED.values.get(('leaderboard:leaderboard_api',), 0)
+        with mock.patch.object(resolve(self.url).func, 'query_budget', 1), self.assertLogs('monitoring.query_budget'):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(EXCEEDED.values[('leaderboard:leaderboard_api',)], before + 1)
+
+    @override_settings(QUERY_BUDGET_ACTION='raise')
+    async def test_async_views_are_counted(self):
+        @query_budget(0)
+        async def view(request):
+            await CustomUser.objects.acount()
+            return HttpResponse()
+
+        middleware = MetricsMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        request = AsyncRequestFactory().get('/')
+        request.resolver_match = ResolverMatch(view, (), {}, url_name='async_view')
+        with self.assertRaises(QueryBudgetExceeded):
+            await middleware(request)
+
+    def test_test_runner_raises(self):
+        self.assertEqual(settings.QUERY_BUDGET_ACTION, 'raise')
+
+    def test_streamed_bodies_are_counted(self):
+        @query_budget(0)
+        def view(request):
+            def body():
+                yield str(CustomUser.objects.count()).encode()
+            return StreamingHttpResponse(body())
+
+        request = RequestFactory().get('/')
+        request.resolver_match = ResolverMatch(view, (), {}, url_name='streaming_view')
+        response = MetricsMiddleware(view)(request)
+        with self.assertRaises(QueryBudgetExceeded):
+            b''.join(response.streaming_content)
+
+    async def test_async_streamed_bodies_are_counted(self):
+        @query_budget(0)
+        async def view(request):
+            async def body():
+                yield str(await CustomUser.objects.acount()).encode()
+            return StreamingHttpResponse(body())
+
+        middleware = MetricsMiddleware(view)
+        request = AsyncRequestFactory().get('/')
+        request.resolver_match = ResolverMatch(view, (), {}, url_name='async_streaming_view')
+        response = await middleware(request)
+        with self.assertRaises(QueryBudgetExceeded):
+            [chunk async for chunk in response.streaming_content]
+
+
+class QueryPlanTests(TestCase):
+    def captured_sql(self, queryset):
+        with CaptureQueriesContext(connection) as queries:
+            list(queryset)
+        return queries.captured_queries[-1]['sql']
+
+    def test_hot_paths_use_indexes(self):
+        today = date.today()
+        hot_paths = [
+            Week.objects.filter(start_date__lte=today, end_date__gte=today).order_by('-start_date')[:1],
+            Submission.objects.filter(user_id=1, status='correct', challenge__week_id=1),
+            Submission.objects.filter(user_id=1).order_by('-submitted_at')[:5],
+            CustomUser.objects.filter(user_type='user'),
+        ]
+        for queryset in hot_paths:
+            sql = self.captured_sql(queryset)
+            self.assertEqual(query_plans.full_scans(connection, sql), [], sql)
+
+    def test_unindexed_filter_is_flagged(self):
+        sql = self.captured_sql(Week.objects.filter(title='Loops'))
+        self.assertTrue(query_plans.full_scans(connection, sql))
+
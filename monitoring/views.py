@@ -0,0 +1,22 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from . import metrics
+
+
+def _authorized(request):
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    # Lets a Prometheus server scrape without a login session
+    token = getattr(settings, 'METRICS_BEARER_TOKEN', None)
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(header, f'Bearer {token}')
+
+
+def metrics_view(request):
+    """Expose the metrics of every process in the Prometheus text format"""
+    if not _authorized(request):
+        return HttpResponseForbidden('Staff only')
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
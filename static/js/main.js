@@ -118,7 +118,7 @@ async function executeCode(code) {
     outputPanel.className = 'output-panel';
     
     try {
-        const response = await fetch('/challenges/execute/', {
+        const response = await fetch('/challenges/execute/stream/', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -127,7 +127,8 @@ async function executeCode(code) {
             body: JSON.stringify({ code: code })
         });
         
-        const result = await response.json();
+        // Output is shown as the program prints it, then replaced by the final result
+        const result = await readEventStream(response, outputContent);
         
         // Display results
         displayExecutionResult(result);
@@ -142,6 +143,57 @@ async function executeCode(code) {
     }
 }
 
+// Read a streamed run: append each output event to the panel and return the final result.
+// Responses that are not event streams (errors, queued submissions) are plain JSON.
+async function readEventStream(response, outputContent) {
+    const contentType = response.headers.get('Content-Type') || '';
+    if (!contentType.startsWith('text/event-stream') || !response.body) {
+        return await response.json();
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let started = false;
+    let result = null;
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const message = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            let data = '';
+            for (const line of message.split('\n')) {
+                if (line.startsWith('event: ')) {
+                    event = line.slice(7);
+                } else if (line.startsWith('data: ')) {
+                    data += line.slice(6);
+                }
+            }
+            if (!data) continue;
+            
+            const payload = JSON.parse(data);
+            if (event === 'output' && outputContent) {
+                if (!started) {
+                    outputContent.textContent = '';
+                    started = true;
+                }
+                outputContent.textContent += payload.text;
+            } else if (event === 'result') {
+                result = payload;
+            }
+        }
+    }
+    
+    return result || { output: '', error: 'The connection closed before the program finished' };
+}
+
 function displayExecutionResult(result) {
     const outputPanel = document.getElementById('output-panel');
     const outputContent = document.getElementById('output-content');
@@ -184,7 +236,7 @@ async function submitSolution(challengeId, code) {
     showLoadingState(true);
     
     try {
-        const response = await fetch(`/challenges/submit/${challengeId}/`, {
+        const response = await fetch(`/challenges/submit/${challengeId}/stream/`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -193,7 +245,18 @@ async function submitSolution(challengeId, code) {
             body: JSON.stringify({ code: code })
         });
         
-        const result = await response.json();
+        const outputPanel = document.getElementById('output-panel');
+        const outputContent = document.getElementById('output-content');
+        if (outputPanel && outputContent && response.ok && response.status !== 202) {
+            outputPanel.style.display = 'block';
+            outputContent.textContent = 'Running your solution...';
+        }
+        let result = await readEventStream(response, outputContent);
+        
+        // Queued grading answers 202 with a job to poll
+        if (response.status === 202 && result.status_url) {
+            result = await pollSubmissionResult(result.status_url);
+        }
         
         if (response.ok) {
             displaySubmissionResult(result);
@@ -208,6 +271,28 @@ async function submitSolution(challengeId, code) {
     }
 }
 
+async function pollSubmissionResult(statusUrl) {
+    const finishedStates = ['done', 'superseded', 'failed'];
+    
+    for (let attempt = 0; attempt < 120; attempt++) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        
+        const response = await fetch(statusUrl, {
+            headers: { 'Accept': 'application/json' }
+        });
+        const job = await response.json();
+        
+        if (!response.ok) {
+            return { status: 'error', error: job.error || 'Could not check submission status' };
+        }
+        if (finishedStates.includes(job.state)) {
+            return job;
+        }
+    }
+    
+    return { status: 'pending', error: 'Your submission is still being graded. Check back shortly.' };
+}
+
 function displaySubmissionResult(result) {
     const outputPanel = document.getElementById('output-panel');
     const outputContent = document.getElementById('output-content');